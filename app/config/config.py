@@ -10,16 +10,60 @@ class Config:
     BASE_DIR = Path(__file__).resolve().parent.parent.parent
     
     # Database settings
-    DATABASE_URL = f"sqlite:///{BASE_DIR / 'attendance.db'}"
+    # DATABASE_URL can be overridden from the environment, e.g. by the benchmarks
+    DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{BASE_DIR / 'attendance.db'}")
+    DB_POOL_SIZE = 8
+    DB_MAX_OVERFLOW = 8
+    DB_BUSY_TIMEOUT = 30  # seconds to wait for a lock before failing
+    DB_CACHE_SIZE_KB = 16384
+
+    # Background attendance writer: flush every interval (seconds) or batch size
+    ATTENDANCE_FLUSH_INTERVAL = 1.0
+    ATTENDANCE_BATCH_SIZE = 64
+    ATTENDANCE_FLUSH_TIMEOUT = 10.0  # seconds the Stop button waits for pending marks
     
     # Model paths
     MODELS_DIR = BASE_DIR / "models" / "buffalo_l"
     DET_MODEL_PATH = str(MODELS_DIR / "det_10g.onnx")
     REC_MODEL_PATH = str(MODELS_DIR / "w600k_r50.onnx")
+    # INT8 models written by `python -m app.services.model_quantization`
+    DET_MODEL_INT8_PATH = str(MODELS_DIR / "det_10g.int8.onnx")
+    REC_MODEL_INT8_PATH = str(MODELS_DIR / "w600k_r50.int8.onnx")
+    MODEL_PRECISION = "fp32"  # or "int8"
+
+    # ONNX Runtime session options; 0 threads lets ONNX Runtime decide
+    ORT_PROVIDERS = ["CUDAExecutionProvider", "CPUExecutionProvider"]  # first available wins
+    ORT_INTRA_OP_THREADS = 0
+    ORT_INTER_OP_THREADS = 0
+    ORT_EXECUTION_MODE = "sequential"  # or "parallel"
+    ORT_GRAPH_OPTIMIZATION = "all"  # "disable", "basic", "extended" or "all"
+    ORT_ENABLE_MEM_ARENA = True
     
-    # Face embeddings
+    # Face embeddings: memory-mapped gallery store, one subdirectory per recognition model
+    GALLERY_DIR = BASE_DIR / "uploads" / "gallery"
+    GALLERY_DTYPE = "float32"  # or "float16" to halve disk and page cache size
+
+    # Legacy npy + pickle gallery, imported into the store on first start
     EMBEDDINGS_PATH = BASE_DIR / "uploads" / "known_embeddings.npy"
     NAMES_PATH = BASE_DIR / "uploads" / "known_names.pkl"
+    # Per-file manifest used for incremental enrollment updates
+    MANIFEST_PATH = BASE_DIR / "uploads" / "embeddings_manifest.json"
+
+    # Gallery search index: "flat" (exact brute force) or "ivf" (approximate)
+    GALLERY_INDEX = "flat"
+    INDEX_PATH = BASE_DIR / "uploads" / "gallery_index.npz"
+    IVF_NLIST = 256
+    IVF_NPROBE = 8
+    # Retrain the clusters once the gallery grew by this factor since training,
+    # or when one list holds this many times the average list size
+    IVF_RETRAIN_GROWTH = 2.0
+    IVF_MAX_IMBALANCE = 8.0
+
+    # Gallery mode: "full" matches against every enrollment image, "mean" and
+    # "kmeans" match against up to PROTOTYPES_PER_PERSON prototypes per person
+    GALLERY_MODE = "full"
+    PROTOTYPES_PER_PERSON = 3
+    PROTOTYPES_PATH = BASE_DIR / "uploads" / "known_prototypes.npz"
     
     # Dataset path
     DATASET_PATH = BASE_DIR / "dataset"
@@ -27,8 +71,88 @@ class Config:
     # Face detection thresholds
     DETECTION_THRESHOLD = 0.5
     RECOGNITION_THRESHOLD = 0.5
+
+    # Detector input size: with ADAPTIVE_DET_SIZE each image is scaled so its
+    # smallest expected face reaches DET_TARGET_FACE_PX pixels, otherwise
+    # every image is letterboxed into DET_INPUT_SIZE
+    ADAPTIVE_DET_SIZE = True
+    DET_INPUT_SIZE = (640, 640)
+    DET_TARGET_FACE_PX = 32
+    DET_MIN_INPUT_SIDE = 160
+    DET_MAX_INPUT_SIDE = 1280
+    EXPECTED_MIN_FACE_PX = 32  # smallest face expected in camera frames
+    ENROLLMENT_FACE_FRACTION = 0.2  # smallest enrollment face, relative to the shorter image side
+    ENROLLMENT_TARGET_FACE_PX = 64  # larger than for video, for precise landmarks
+
+    # Region-of-interest detection for tracked video: detection frames only
+    # search around tracked faces and moving areas, with a full-frame sweep
+    # every ROI_FULL_SWEEP_INTERVAL detections
+    ROI_DETECTION = True
+    ROI_FULL_SWEEP_INTERVAL = 10
+    ROI_MARGIN = 0.5  # fraction of a box's size added on every side
+    ROI_MOTION_THRESHOLD = 25  # gray level change that counts as motion
+    ROI_MAX_COVERAGE = 0.5  # search the full frame when regions cover more
+
+    # Maximum number of aligned faces sent to the recognition model per run
+    REC_BATCH_SIZE = 32
+
+    # Dataset embedding: images are sharded in chunks across worker processes
+    EMBEDDING_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+    EMBEDDING_WORKER_THREADS = 2
+    EMBEDDING_CHUNK_SIZE = 64
+
+    # Enrollment quality gate: faces below these thresholds are not embedded,
+    # near-duplicate rows of a person are dropped and outliers are reported
+    ENROLLMENT_QUALITY_GATE = True
+    ENROLLMENT_MIN_DET_SCORE = 0.7
+    ENROLLMENT_MIN_FACE_PX = 64  # shorter side of the face box in the original image
+    ENROLLMENT_MIN_BLUR = 40.0  # variance of the Laplacian of the aligned crop
+    ENROLLMENT_MAX_YAW = 0.5  # 0 frontal, 1 profile
+    ENROLLMENT_PITCH_RANGE = (0.25, 0.8)  # nose position between eye line and mouth
+    ENROLLMENT_DUPLICATE_SIMILARITY = 0.95
+    ENROLLMENT_OUTLIER_SIMILARITY = 0.4  # to the mean of the person's other rows
+    ENROLLMENT_DROP_OUTLIERS = False
+
+    # Face tracking: full detection every DETECT_INTERVAL frames, IoU tracking in between
+    TRACKING_ENABLED = True
+    DETECT_INTERVAL = 5
+    TRACK_IDENTITY_TTL = 30  # frames before a recognized track is embedded again
+    TRACK_MAX_MISSED = 1  # detections a track may miss before it is dropped
+    TRACK_IOU_THRESHOLD = 0.3
+
+    # Attendance confirmation: a face needs VOTE_MIN_HITS recognitions of the
+    # same name within VOTE_WINDOW_SECONDS before attendance is marked
+    VOTE_WINDOW_SECONDS = 5.0
+    VOTE_MIN_HITS = 3
+    VOTE_MAX_KEYS = 1024
     
+    # Metrics: per-stage timings, faces per frame, queue depths and drops,
+    # served at http://127.0.0.1:METRICS_PORT/metrics and logged as JSON
+    METRICS_ENABLED = False
+    METRICS_PREFIX = "attendance"
+    METRICS_PORT = 9108  # 0 disables the endpoint
+    METRICS_LOG_INTERVAL = 10.0  # seconds between JSON log lines, 0 disables them
+
+    # Recognition server (python -m app.services.recognition_server)
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8600
+    SERVER_WORKERS = 4  # threads for decoding, detection and recognition
+    SERVER_MAX_CONCURRENCY = 64  # in-flight requests before answering 503
+    SERVER_MAX_BODY_MB = 16
+    SERVER_BATCH_DELAY_MS = 5  # wait for more faces before running a partial recognition batch
+
+    # Frame buffers and preview
+    FRAME_POOL_SIZE = 4  # captured frame arrays recycled per camera
+    PREVIEW_MAX_WIDTH = 640  # the live preview is downscaled to this width
+    PREVIEW_JPEG_QUALITY = 75
+    PREVIEW_MAX_FPS = 10  # frames sent to the browser per second and camera
+
     # Video settings
     CAMERA_INDEX = 0
+    # Cameras used together for one session: indices, file paths or stream URLs
+    CAMERA_SOURCES = [CAMERA_INDEX]
+    CAMERA_PRIORITIES = None  # optional list, higher is served first; None is round-robin
+    CAMERA_QUEUE_SIZE = 2  # frames buffered per camera before the oldest is dropped
+    INFERENCE_WORKERS = 2
     FRAME_WIDTH = 640
     FRAME_HEIGHT = 480
@@ -2,36 +2,74 @@
 Database models initialization
 """
 
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker
 
 from app.config.config import Config
 
-# Create SQLAlchemy engine
-engine = create_engine(Config.DATABASE_URL)
+# Create SQLAlchemy engine; connections are shared between the Streamlit
+# sessions, the video pipeline and the attendance writer threads
+engine = create_engine(
+    Config.DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": Config.DB_BUSY_TIMEOUT},
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL journaling so readers never block the writer and vice versa"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA cache_size=-{Config.DB_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT * 1000)}")
+    cursor.close()
 
-# Create session factory
-session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-SessionLocal = scoped_session(session_factory)
+# Create session factory; objects stay usable after commit without a reload
+session_factory = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create declarative base
 Base = declarative_base()
 
 def init_db():
-    """Initialize the database by creating all tables"""
-    # Import all models to ensure they are registered with the Base
-    from app.models.user import User
-    from app.models.session import Session
-    from app.models.attendance import Attendance
-    
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    """Initialize the database by applying all Alembic migrations"""
+    from alembic import command
+    from alembic.config import Config as AlembicConfig
+
+    # Existing databases are adopted by the initial migration and upgraded in place
+    alembic_cfg = AlembicConfig(str(Config.BASE_DIR / "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", str(Config.BASE_DIR / "migrations"))
+    alembic_cfg.attributes["configure_logger"] = False
+    command.upgrade(alembic_cfg, "head")
 
 def get_db():
-    """Get database session"""
-    db = SessionLocal()
+    """
+    Get a new database session; the caller must close it
+
+    Prefer session_scope, which also commits and rolls back.
+    """
+    return session_factory()
+
+@contextmanager
+def session_scope():
+    """
+    Provide a transactional scope around a series of operations
+
+    Commits when the block succeeds, rolls back when it raises and always
+    returns the connection to the pool.
+    """
+    db = session_factory()
     try:
-        return db
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
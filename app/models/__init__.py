@@ -2,7 +2,7 @@
 Models package initialization
 """
 
-from app.db.base import Base, init_db, get_db
+from app.db.base import Base, init_db, get_db, session_scope
 from app.models.user import User
 from app.models.session import Session
 from app.models.attendance import Attendance
@@ -11,6 +11,7 @@ __all__ = [
     "Base", 
     "init_db", 
     "get_db",
+    "session_scope",
     "User", 
     "Session", 
     "Attendance"
@@ -2,8 +2,9 @@
 SQLAlchemy model for Attendance
 """
 
-from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 
 from app.db.base import Base
 
@@ -12,7 +13,8 @@ class Attendance(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False, index=True)
+    marked_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Create a unique constraint to ensure a student is only marked once per session
     __table_args__ = (
@@ -0,0 +1,386 @@
+"""
+Adaptive detector input sizes and region-of-interest detection for video
+"""
+
+import os
+import time
+import argparse
+from glob import glob
+
+import cv2
+import numpy as np
+
+from app.config.config import Config
+
+# Detector input sides must be multiples of the largest feature stride
+STRIDE = 32
+
+
+def choose_input_size(height, width, min_face_px=None, target_face_px=None):
+    """
+    Pick the detector input size for an image.
+
+    The image is scaled so that the smallest face expected in it reaches
+    `target_face_px` pixels at detector resolution: upscaled when faces are
+    small and distant, downscaled when they are close-ups. The aspect ratio
+    is kept, so no input pixels are spent on letterbox padding.
+
+    Args:
+        height: Image height
+        width: Image width
+        min_face_px: Side of the smallest expected face in image pixels;
+            defaults to Config.EXPECTED_MIN_FACE_PX
+        target_face_px: Face side the detector should see; defaults to
+            Config.DET_TARGET_FACE_PX
+
+    Returns:
+        tuple: (width, height) for RetinaFace.detect, multiples of STRIDE
+    """
+    min_face_px = min_face_px or Config.EXPECTED_MIN_FACE_PX
+    target_face_px = target_face_px or Config.DET_TARGET_FACE_PX
+
+    long_side = max(height, width) * target_face_px / float(min_face_px)
+    long_side = min(max(long_side, Config.DET_MIN_INPUT_SIDE), Config.DET_MAX_INPUT_SIDE)
+    scale = long_side / max(height, width)
+    return _round_to_stride(width * scale), _round_to_stride(height * scale)
+
+
+def _round_to_stride(side):
+    return max(STRIDE, int(round(side / STRIDE)) * STRIDE)
+
+
+def letterbox(img, input_size, buffers):
+    """
+    Resize an image into a detector input the way RetinaFace.detect does,
+    writing into reused buffers instead of allocating new arrays
+
+    Args:
+        img: BGR image
+        input_size: (width, height) detector input size
+        buffers: BufferCache the input and the resize output are taken from
+
+    Returns:
+        tuple: (det_img, det_scale) - the zero padded input and the scale
+            from image to input coordinates
+    """
+    width, height = input_size
+    im_ratio = img.shape[0] / img.shape[1]
+    if im_ratio > height / width:
+        new_height, new_width = height, max(1, int(height / im_ratio))
+    else:
+        new_width, new_height = width, max(1, int(width * im_ratio))
+    det_scale = new_height / img.shape[0]
+
+    det_img = buffers.get((height, width, 3))
+    if (new_width, new_height) == (width, height):
+        cv2.resize(img, (width, height), dst=det_img)
+    else:
+        resized = buffers.get((new_height, new_width, 3))
+        cv2.resize(img, (new_width, new_height), dst=resized)
+        det_img[:new_height, :new_width] = resized
+        det_img[new_height:] = 0
+        det_img[:new_height, new_width:] = 0
+    return det_img, det_scale
+
+
+def detect_letterboxed(det_model, img, input_size, buffers):
+    """
+    Equivalent of RetinaFace.detect(img, input_size, max_num=0) with the
+    input letterboxed into a reused buffer
+
+    Returns:
+        tuple: (bboxes, kpss) - (N, 5) boxes with scores and (N, 5, 2) landmarks
+    """
+    det_img, det_scale = letterbox(img, input_size, buffers)
+    scores_list, bboxes_list, kpss_list = det_model.forward(det_img, det_model.det_thresh)
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    pre_det = np.hstack((np.vstack(bboxes_list) / det_scale, scores)).astype(np.float32, copy=False)[order]
+    keep = det_model.nms(pre_det)
+
+    kpss = (np.vstack(kpss_list) / det_scale)[order][keep] if det_model.use_kps else None
+    return pre_det[keep], kpss
+
+
+def merge_detections(results, nms_threshold=0.4):
+    """
+    Merge detections from overlapping regions, dropping duplicates by NMS
+
+    Args:
+        results: List of (bboxes, kpss) in frame coordinates, as returned by RetinaFace.detect
+        nms_threshold: IoU above which the lower scoring box is dropped
+
+    Returns:
+        tuple: (bboxes, kpss) - (N, 5) boxes with scores and (N, 5, 2) landmarks
+    """
+    results = [(bboxes, kpss) for bboxes, kpss in results if len(bboxes)]
+    if not results:
+        return np.empty((0, 5), dtype=np.float32), np.empty((0, 5, 2), dtype=np.float32)
+
+    bboxes = np.concatenate([bboxes for bboxes, _ in results])
+    kpss = np.concatenate([kpss for _, kpss in results])
+    if len(results) == 1:
+        return bboxes, kpss
+
+    xywh = np.column_stack([bboxes[:, :2], bboxes[:, 2:4] - bboxes[:, :2]])
+    keep = cv2.dnn.NMSBoxes(xywh.tolist(), bboxes[:, 4].tolist(), 0.0, nms_threshold)
+    keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+    keep = keep[np.argsort(-bboxes[keep, 4])]
+    return bboxes[keep], kpss[keep]
+
+
+class RegionProposer:
+    """
+    Chooses where to run detection in the frames of one video stream.
+
+    Regions are the boxes of the faces tracked so far, enlarged by `margin`,
+    plus the areas that changed since the previous detection frame, found by
+    differencing downscaled grayscale frames. Every `full_sweep_interval`
+    detections, and whenever the regions would cover most of the frame
+    anyway, the whole frame is searched so faces that appear without moving
+    are still found.
+    """
+
+    def __init__(self, full_sweep_interval=None, margin=None, motion_threshold=None, max_coverage=None,
+                 motion_scale=0.25, min_motion_area=16):
+        """
+        Initialize the proposer
+
+        Args:
+            full_sweep_interval: Detections between full-frame sweeps
+            margin: Fraction of a box's size added on every side
+            motion_threshold: Gray level change that counts as motion
+            max_coverage: Fraction of the frame above which the full frame is searched
+            motion_scale: Downscale factor of the motion mask
+            min_motion_area: Smallest changed area, in motion mask pixels
+        """
+        self.full_sweep_interval = full_sweep_interval or Config.ROI_FULL_SWEEP_INTERVAL
+        self.margin = margin if margin is not None else Config.ROI_MARGIN
+        self.motion_threshold = motion_threshold or Config.ROI_MOTION_THRESHOLD
+        self.max_coverage = max_coverage or Config.ROI_MAX_COVERAGE
+        self.motion_scale = motion_scale
+        self.min_motion_area = min_motion_area
+
+        self.previous = None
+        self.detections = 0
+
+    def reset(self):
+        """Forget the previous frame, so the next detection searches the full frame"""
+        self.previous = None
+        self.detections = 0
+
+    def propose(self, frame, boxes):
+        """
+        Regions of a detection frame to search for faces
+
+        Args:
+            frame: BGR frame about to be searched
+            boxes: x1, y1, x2, y2 boxes of the faces currently tracked
+
+        Returns:
+            list: Integer (x1, y1, x2, y2) regions, possibly empty, or None to
+                search the full frame
+        """
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, None, fx=self.motion_scale, fy=self.motion_scale, interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        previous, self.previous = self.previous, small
+        sweep = (previous is None or previous.shape != small.shape
+                 or self.detections % self.full_sweep_interval == 0)
+        self.detections += 1
+        if sweep:
+            return None
+
+        regions = [self._pad(box) for box in boxes]
+
+        # Changed areas since the previous detection frame
+        _, mask = cv2.threshold(cv2.absdiff(small, previous), self.motion_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, None, iterations=2)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+        for x, y, w, h, area in stats[1:]:
+            if area >= self.min_motion_area:
+                regions.append(self._pad(np.array([x, y, x + w, y + h]) / self.motion_scale))
+
+        regions = _merge_regions([
+            (max(0, int(x1)), max(0, int(y1)), min(width, int(np.ceil(x2))), min(height, int(np.ceil(y2))))
+            for x1, y1, x2, y2 in regions
+        ])
+        regions = [(x1, y1, x2, y2) for x1, y1, x2, y2 in regions if x2 > x1 and y2 > y1]
+
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if covered > self.max_coverage * width * height:
+            return None
+        return regions
+
+    def _pad(self, box):
+        x1, y1, x2, y2 = box[:4]
+        pad_x, pad_y = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+        return x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+
+
+def _merge_regions(regions):
+    """Replace overlapping regions by their bounding box until none overlap"""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def evaluate_detection(det_model, images, input_size_fn, references=None):
+    """
+    Measure detector throughput and recall at one input size setting
+
+    Args:
+        det_model: Prepared RetinaFace model
+        images: List of BGR images
+        input_size_fn: Callable(image) returning the (width, height) input size
+        references: Optional per-image reference boxes; recall is the fraction
+            of them found with IoU >= 0.5
+
+    Returns:
+        dict: images_per_s, faces_per_s, found (fraction of images with a face),
+            recall (None without references), mean_input_px and the boxes
+    """
+    from app.services.face_tracker import iou_matrix
+
+    boxes, pixels, elapsed = [], 0, 0.0
+    for img in images:
+        input_size = input_size_fn(img)
+        pixels += input_size[0] * input_size[1]
+        start = time.perf_counter()
+        bboxes, _ = det_model.detect(img, input_size=input_size, max_num=0, metric='default')
+        elapsed += time.perf_counter() - start
+        boxes.append(bboxes[:, :4])
+
+    recall = None
+    if references is not None:
+        total = sum(len(ref) for ref in references)
+        hits = sum(int((iou_matrix(ref, found).max(axis=1) >= 0.5).sum())
+                   for ref, found in zip(references, boxes) if len(ref) and len(found))
+        recall = hits / total if total else 1.0
+
+    faces = sum(len(found) for found in boxes)
+    return {
+        "images_per_s": len(images) / elapsed if elapsed else 0.0,
+        "faces_per_s": faces / elapsed if elapsed else 0.0,
+        "found": sum(1 for found in boxes if len(found)) / len(images) if images else 0.0,
+        "recall": recall,
+        "mean_input_px": pixels / len(images) if images else 0.0,
+        "boxes": boxes,
+    }
+
+
+def evaluate_regions(face_service, video_path, max_frames):
+    """
+    Compare full-frame and region-of-interest detection on a video
+
+    Returns:
+        dict: full_fps and roi_fps over the detection frames, and the recall
+            of ROI detection against full-frame detection on the same frames
+    """
+    from app.services.face_tracker import FaceTracker, iou_matrix
+
+    def run(use_regions):
+        cap = cv2.VideoCapture(video_path)
+        tracker = FaceTracker(detect_interval=1)
+        tracker.regions = RegionProposer() if use_regions else None
+        detections, elapsed = [], 0.0
+        while len(detections) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            tracker.next_frame()
+            start = time.perf_counter()
+            faces = face_service.detect_faces(frame, regions=tracker.detection_regions(frame))
+            elapsed += time.perf_counter() - start
+            tracker.update(faces)
+            detections.append(np.array([face.bbox for face in faces]).reshape(-1, 4))
+        cap.release()
+        return detections, elapsed
+
+    full, full_elapsed = run(False)
+    roi, roi_elapsed = run(True)
+
+    total = sum(len(ref) for ref in full)
+    hits = sum(int((iou_matrix(ref, found).max(axis=1) >= 0.5).sum())
+               for ref, found in zip(full, roi) if len(ref) and len(found))
+    return {
+        "frames": len(full),
+        "full_fps": len(full) / full_elapsed if full_elapsed else 0.0,
+        "roi_fps": len(roi) / roi_elapsed if roi_elapsed else 0.0,
+        "recall": hits / total if total else 1.0,
+    }
+
+
+def main():
+    """Print detections per second and recall on the dataset images per input size setting"""
+    parser = argparse.ArgumentParser(description="Face detection input size benchmark")
+    parser.add_argument("--fixed", type=int, nargs="+", default=[320, 480, 640, 960],
+                        help="Square input sizes used for every image")
+    parser.add_argument("--target-face", type=int, nargs="+", default=[32, 48, 64, 96],
+                        help="Face sizes at detector resolution tried in adaptive mode")
+    parser.add_argument("--face-fraction", type=float, default=Config.ENROLLMENT_FACE_FRACTION,
+                        help="Expected face size relative to the shorter image side")
+    parser.add_argument("--shrink", type=float, nargs="+", default=[1.0, 0.25],
+                        help="Downscale factors applied to the images to simulate distant faces")
+    parser.add_argument("--reference", type=int, default=1280,
+                        help="Square input size whose detections count as ground truth")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of images; 0 uses all")
+    parser.add_argument("--video", help="Also compare full-frame and ROI detection on this video")
+    parser.add_argument("--frames", type=int, default=300, help="Frames of --video to process")
+    args = parser.parse_args()
+
+    from app.services.face_service import FaceService
+    face_service = FaceService()
+    face_service.load_models()
+
+    img_paths = sorted(p for ext in ("jpg", "jpeg", "png")
+                       for p in glob(os.path.join(str(Config.DATASET_PATH), "**", f"*.{ext}"), recursive=True))
+    if args.limit:
+        img_paths = img_paths[:args.limit]
+    originals = [img for img in (cv2.imread(p) for p in img_paths) if img is not None]
+    if not originals:
+        raise SystemExit(f"No images found in {Config.DATASET_PATH}")
+
+    for shrink in args.shrink:
+        images = originals if shrink == 1.0 else [
+            cv2.resize(img, None, fx=shrink, fy=shrink, interpolation=cv2.INTER_AREA) for img in originals
+        ]
+        reference = evaluate_detection(face_service.det_model, images,
+                                       lambda img: (args.reference, args.reference))["boxes"]
+
+        settings = [(f"fixed {size}", lambda img, size=size: (size, size)) for size in args.fixed]
+        settings += [(f"adaptive {target}px",
+                      lambda img, target=target: choose_input_size(
+                          img.shape[0], img.shape[1], args.face_fraction * min(img.shape[:2]), target))
+                     for target in args.target_face]
+
+        print(f"\nimages={len(images)} shrink={shrink} reference=fixed {args.reference}")
+        print(f"{'setting':>14} {'img/s':>8} {'faces/s':>8} {'found':>6} {'recall':>7} {'input kpx':>9}")
+        for label, input_size_fn in settings:
+            report = evaluate_detection(face_service.det_model, images, input_size_fn, reference)
+            print(f"{label:>14} {report['images_per_s']:>8.1f} {report['faces_per_s']:>8.1f} "
+                  f"{report['found']:>6.3f} {report['recall']:>7.3f} {report['mean_input_px'] / 1000:>9.1f}")
+
+    if args.video:
+        report = evaluate_regions(face_service, args.video, args.frames)
+        print(f"\nvideo={args.video} frames={report['frames']}")
+        print(f"full-frame {report['full_fps']:.1f} FPS, ROI {report['roi_fps']:.1f} FPS, "
+              f"ROI recall {report['recall']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
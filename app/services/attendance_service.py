@@ -2,35 +2,39 @@
 Service for managing attendance records
 """
 
+import threading
+import numpy as np
 import pandas as pd
-from sqlalchemy import func
+from datetime import datetime, time, timedelta
 from sqlalchemy.exc import IntegrityError
 
-from app.models import get_db, User, Session, Attendance
-from app.utils.constants import DEFAULT_STUDENTS
+from app.models import session_scope, User, Session, Attendance
+from app.utils.constants import DEFAULT_STUDENTS, PRESENT_MARK, ABSENT_MARK
+from app.utils.metrics import metrics
 
 class AttendanceService:
     def __init__(self):
         """Initialize the attendance service and ensure default students exist"""
+        # Cached dashboard view, see get_attendance_view
+        self._view_lock = threading.Lock()
+        self._view = None
+        self._view_rows = {}
+        self._view_columns = {}
+        self.version = 0
+
         self._ensure_default_students()
     
     def _ensure_default_students(self):
         """Ensure that the default student records exist in the database"""
-        db = get_db()
         try:
-            # Check if each default student exists, create if not
-            for student_name in DEFAULT_STUDENTS:
-                student = db.query(User).filter(User.name == student_name).first()
-                if not student:
-                    new_student = User(name=student_name)
-                    db.add(new_student)
-            
-            db.commit()
+            with session_scope() as db:
+                # Create the default students that do not exist yet
+                existing = {name for (name,) in db.query(User.name).filter(User.name.in_(DEFAULT_STUDENTS))}
+                for student_name in DEFAULT_STUDENTS:
+                    if student_name not in existing:
+                        db.add(User(name=student_name))
         except Exception as e:
-            db.rollback()
             print(f"Error ensuring default students: {str(e)}")
-        finally:
-            db.close()
     
     def create_session(self, session_name):
         """
@@ -42,24 +46,23 @@ class AttendanceService:
         Returns:
             int: ID of the created session
         """
-        db = get_db()
         try:
-            # Check if session already exists
-            existing_session = db.query(Session).filter(Session.name == session_name).first()
-            if existing_session:
-                return existing_session.id
-            
-            # Create new session
-            new_session = Session(name=session_name)
-            db.add(new_session)
-            db.commit()
-            
-            return new_session.id
+            with session_scope() as db:
+                # Check if session already exists
+                existing_session = db.query(Session).filter(Session.name == session_name).first()
+                if existing_session:
+                    return existing_session.id
+
+                # Create new session
+                new_session = Session(name=session_name)
+                db.add(new_session)
+                db.flush()
+                session_id = new_session.id
         except Exception as e:
-            db.rollback()
             raise Exception(f"Failed to create session: {str(e)}")
-        finally:
-            db.close()
+
+        self.invalidate_view()
+        return session_id
     
     def mark_attendance(self, session_id, student_name):
         """
@@ -72,82 +75,186 @@ class AttendanceService:
         Returns:
             bool: True if attendance was marked successfully
         """
-        db = get_db()
+        created_user, created_attendance = False, False
         try:
-            # Get user by name
-            user = db.query(User).filter(User.name == student_name).first()
-            if not user:
-                # Create user if not exists
-                user = User(name=student_name)
-                db.add(user)
-                db.commit()
-            
-            # Check if attendance already exists
-            existing_attendance = db.query(Attendance).filter(
-                Attendance.user_id == user.id,
-                Attendance.session_id == session_id
-            ).first()
-            
-            if not existing_attendance:
-                # Create attendance record
-                attendance = Attendance(user_id=user.id, session_id=session_id)
-                db.add(attendance)
-                db.commit()
-            
-            return True
+            with metrics.timer("db_mark_attendance"), session_scope() as db:
+                # Get user by name
+                user = db.query(User).filter(User.name == student_name).first()
+                if not user:
+                    # Create user if not exists
+                    user = User(name=student_name)
+                    db.add(user)
+                    db.flush()
+                    created_user = True
+
+                # Check if attendance already exists
+                existing_attendance = db.query(Attendance.id).filter(
+                    Attendance.user_id == user.id,
+                    Attendance.session_id == session_id
+                ).first()
+
+                if not existing_attendance:
+                    # Create attendance record
+                    db.add(Attendance(user_id=user.id, session_id=session_id))
+                    created_attendance = True
         except IntegrityError:
             # Skip if already marked (unique constraint violation)
-            db.rollback()
             return True
         except Exception as e:
-            db.rollback()
             print(f"Error marking attendance: {str(e)}")
             return False
-        finally:
-            db.close()
+
+        if created_user:
+            self.invalidate_view()
+        if created_attendance:
+            self.patch_view(student_name, session_id)
+        return True
     
-    def get_attendance_dataframe(self):
+    def get_attendance_dataframe(self, start_date=None, end_date=None, student_names=None):
         """
         Get attendance data as a pandas DataFrame
-        
+
+        The matrix is built from a single query for all (user_id, session_id)
+        attendance pairs, pivoted with NumPy.
+
+        Args:
+            start_date: Optional first session date to include (date or datetime)
+            end_date: Optional last session date to include; a datetime is an exclusive bound
+            student_names: Optional list of student names to include
+
         Returns:
             DataFrame: Attendance data with students as rows and sessions as columns
         """
-        db = get_db()
         try:
-            # Get all users and sessions
-            users = db.query(User).order_by(User.name).all()
-            sessions = db.query(Session).order_by(Session.created_at).all()
-            
-            if not users or not sessions:
-                return None
-            
-            # Create empty dataframe
-            columns = ["Student"] + [session.name for session in sessions]
-            data = []
-            
-            # Fill data for each user
-            for user in users:
-                row = [user.name]
-                
-                # Query attendance for each session
-                for session in sessions:
-                    attendance = db.query(Attendance).filter(
-                        Attendance.user_id == user.id,
-                        Attendance.session_id == session.id
-                    ).first()
-                    
-                    # Mark 1 for present, 0 for absent
-                    row.append(1 if attendance else 0)
-                
-                data.append(row)
-            
-            # Create DataFrame
-            df = pd.DataFrame(data, columns=columns)
-            
-            return df
+            with metrics.timer("db_attendance_dataframe"), session_scope() as db:
+                users, sessions, matrix = self._query_attendance(db, start_date, end_date, student_names)
         except Exception as e:
             print(f"Error getting attendance dataframe: {str(e)}")
             return None
-        finally:
-            db.close()
+
+        if matrix is None:
+            return None
+
+        # Create DataFrame
+        df = pd.DataFrame(matrix, columns=[name for _, name in sessions])
+        df.insert(0, "Student", [name for _, name in users])
+
+        return df
+
+    def _query_attendance(self, db, start_date=None, end_date=None, student_names=None):
+        """
+        Query the attendance matrix
+
+        Returns:
+            tuple: (users, sessions, matrix) - (id, name) rows for users and
+                sessions and a users x sessions 0/1 array, or None if either is empty
+        """
+        user_filters = []
+        if student_names is not None:
+            user_filters.append(User.name.in_(list(student_names)))
+
+        session_filters = []
+        if start_date is not None:
+            session_filters.append(Session.created_at >= _day_start(start_date))
+        if end_date is not None:
+            session_filters.append(Session.created_at < _day_end(end_date))
+
+        # Get the selected users and sessions
+        users = db.query(User.id, User.name).filter(*user_filters).order_by(User.name).all()
+        sessions = db.query(Session.id, Session.name).filter(*session_filters) \
+            .order_by(Session.created_at).all()
+
+        if not users or not sessions:
+            return users, sessions, None
+
+        # Fetch every attendance pair in the selection at once
+        pairs = db.query(Attendance.user_id, Attendance.session_id) \
+            .join(User, User.id == Attendance.user_id) \
+            .join(Session, Session.id == Attendance.session_id) \
+            .filter(*user_filters, *session_filters) \
+            .all()
+
+        # Mark 1 for present, 0 for absent
+        user_pos = {user_id: i for i, (user_id, _) in enumerate(users)}
+        session_pos = {session_id: j for j, (session_id, _) in enumerate(sessions)}
+        matrix = np.zeros((len(users), len(sessions)), dtype=np.int64)
+        if pairs:
+            rows, cols = zip(*((user_pos[u], session_pos[sid]) for u, sid in pairs))
+            matrix[list(rows), list(cols)] = 1
+
+        return users, sessions, matrix
+
+    def get_attendance_view(self):
+        """
+        Get the dashboard attendance table with present/absent marks.
+
+        The table is cached and replaced by a patched copy when a single
+        attendance record is added, so a returned DataFrame never changes
+        while a session renders it; it is rebuilt only after
+        invalidate_view. Compare `version` with a previously rendered
+        version to skip re-rendering.
+
+        Returns:
+            tuple: (version, DataFrame) - the DataFrame is None if there are
+                no students or sessions yet
+        """
+        with self._view_lock:
+            if self._view is None:
+                self._build_view()
+            return self.version, self._view if self._view_columns else None
+
+    def _build_view(self):
+        """Rebuild the cached view from the database; caller holds the lock"""
+        try:
+            with metrics.timer("db_attendance_view"), session_scope() as db:
+                users, sessions, matrix = self._query_attendance(db)
+        except Exception as e:
+            print(f"Error getting attendance dataframe: {str(e)}")
+            return
+
+        columns = [name for _, name in sessions] if matrix is not None else []
+        marks = np.where(matrix == 1, PRESENT_MARK, ABSENT_MARK) if matrix is not None else None
+
+        view = pd.DataFrame(marks, columns=columns)
+        view.insert(0, "Student", [name for _, name in users] if matrix is not None else [])
+
+        self._view = view
+        self._view_rows = {name: i for i, name in enumerate(view["Student"])}
+        self._view_columns = {session_id: name for session_id, name in sessions} if columns else {}
+
+    def patch_view(self, student_name, session_id):
+        """Mark one cell of the cached view present, or invalidate it if the cell is missing"""
+        with self._view_lock:
+            if self._view is None:
+                self.version += 1
+                return
+
+            row = self._view_rows.get(student_name)
+            column = self._view_columns.get(session_id)
+            if row is None or column is None:
+                self._view = None
+            else:
+                # Readers may still hold the old frame, so patch a copy and swap it in
+                view = self._view.copy()
+                view.iat[row, view.columns.get_loc(column)] = PRESENT_MARK
+                self._view = view
+            self.version += 1
+
+    def invalidate_view(self):
+        """Drop the cached view, e.g. after students or sessions were added"""
+        with self._view_lock:
+            self._view = None
+            self.version += 1
+
+def _day_start(value):
+    """Start of the day for a date, or the datetime itself"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+def _day_end(value):
+    """Exclusive upper bound for an inclusive end date, or the datetime itself"""
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value + timedelta(days=1), time.min)
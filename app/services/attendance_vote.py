@@ -0,0 +1,100 @@
+"""
+Temporal confirmation of recognized faces before attendance is marked
+"""
+
+from collections import OrderedDict, deque
+
+from app.config.config import Config
+
+# Bound on the votes kept per key, in case many arrive within one window
+MAX_VOTES_PER_KEY = 64
+
+
+class AttendanceVoter:
+    """
+    Sliding-window, score-weighted vote over recent recognitions.
+
+    Recognitions are grouped by key: the face track id when tracking is on,
+    otherwise the recognized name. For each key the votes of the last
+    `window` seconds are tallied by name, weighted by match score. The
+    winning name is confirmed once it has at least `min_hits` votes. Each
+    name is confirmed at most once per voter, i.e. once per session.
+
+    Votes are windowed on the time the frame was captured rather than on a
+    frame counter: frames dropped under load and frames without recognition
+    would otherwise use up the window, and counters of different cameras
+    cannot be compared.
+    """
+
+    def __init__(self, window=None, min_hits=None, max_keys=None):
+        self.window = window or Config.VOTE_WINDOW_SECONDS
+        self.min_hits = min_hits or Config.VOTE_MIN_HITS
+        self.max_keys = max_keys or Config.VOTE_MAX_KEYS
+
+        # key -> deque of (timestamp, name, score), least recently seen first
+        self.votes = OrderedDict()
+        self.confirmed = set()
+
+    def update(self, observations):
+        """
+        Add recognitions and return the names that became confirmed
+
+        Args:
+            observations: Iterable of (timestamp, key, name, score); the
+                timestamp is the capture time of the frame in seconds on a
+                clock shared by all cameras, key is a track id, or None to
+                vote by name
+
+        Returns:
+            list: Names confirmed by these observations, in confirmation order
+        """
+        newly_confirmed = []
+        latest = None
+
+        for timestamp, key, name, score in observations:
+            latest = timestamp if latest is None else max(latest, timestamp)
+            if key is None:
+                if name == 'Unknown':
+                    continue
+                key = name
+
+            votes = self.votes.pop(key, None) or deque(maxlen=MAX_VOTES_PER_KEY)
+            self.votes[key] = votes
+            votes.append((timestamp, name, score))
+            while votes[0][0] <= timestamp - self.window:
+                votes.popleft()
+
+            winner = self._winner(votes)
+            if winner is not None and winner not in self.confirmed:
+                self.confirmed.add(winner)
+                newly_confirmed.append(winner)
+
+        if latest is not None:
+            self._expire(latest)
+
+        return newly_confirmed
+
+    def _winner(self, votes):
+        """Name with the highest total score, if it has enough hits"""
+        weights, hits = {}, {}
+        for _, name, score in votes:
+            weights[name] = weights.get(name, 0.0) + score
+            hits[name] = hits.get(name, 0) + 1
+
+        name = max(weights, key=weights.get)
+        if name == 'Unknown' or hits[name] < self.min_hits:
+            return None
+        return name
+
+    def _expire(self, timestamp):
+        """Drop keys not seen within the window and cap the number of keys"""
+        while self.votes:
+            key, votes = next(iter(self.votes.items()))
+            if votes[-1][0] > timestamp - self.window and len(self.votes) <= self.max_keys:
+                break
+            self.votes.popitem(last=False)
+
+    def reset(self):
+        """Forget all votes and confirmations, e.g. when a new session starts"""
+        self.votes.clear()
+        self.confirmed.clear()
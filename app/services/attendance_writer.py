@@ -0,0 +1,247 @@
+"""
+Background writer that batches attendance marks into single transactions
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from app.config.config import Config
+from app.db.base import engine
+from app.models import User, Attendance
+from app.utils.metrics import metrics
+
+# Sessions whose written marks are remembered when end_session is never called
+MAX_OPEN_SESSIONS = 16
+# Failed writes of the pending marks before they are given up, so flush returns
+MAX_WRITE_ATTEMPTS = 5
+# Attempts to write the last batch when stopping before the marks are given up
+STOP_RETRIES = 3
+
+
+class _EndSession:
+    """Queue event: forget the written marks of a finished session"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+class AttendanceWriter:
+    """
+    Accepts attendance marks from the video loop and writes them on a
+    background thread.
+
+    Marks are coalesced and written with one `INSERT ... ON CONFLICT DO
+    NOTHING` transaction every `flush_interval` seconds or every
+    `batch_size` marks, whichever comes first. Student names are resolved
+    through an in-memory name -> id map, and unknown students are created in
+    the same transaction. `flush` and `stop` block until every mark submitted
+    before them is written; `stop` also runs at interpreter exit. Marks
+    already written are skipped until the session is ended with
+    `end_session`. Marks that still fail after MAX_WRITE_ATTEMPTS writes,
+    or whose last batch fails when stopping, are logged and given up.
+    """
+
+    def __init__(self, attendance_service=None, flush_interval=None, batch_size=None):
+        """
+        Initialize the writer
+
+        Args:
+            attendance_service: Optional AttendanceService whose cached view is
+                patched after every flush
+            flush_interval: Maximum seconds a mark waits before being written
+            batch_size: Number of marks that triggers an early flush
+        """
+        self.attendance_service = attendance_service
+        self.flush_interval = flush_interval or Config.ATTENDANCE_FLUSH_INTERVAL
+        self.batch_size = batch_size or Config.ATTENDANCE_BATCH_SIZE
+
+        self.events = queue.Queue()
+        self.thread = None
+        self.user_ids = {}
+        # session_id -> names already written, for sessions not yet ended
+        self.written = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Load the name -> id map and start the writer thread"""
+        with self.lock:
+            if self.thread is not None:
+                return
+
+            with engine.connect() as conn:
+                self.user_ids = dict(conn.execute(select(User.name, User.id)).all())
+
+            self.thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def submit(self, session_id, student_name):
+        """
+        Queue an attendance mark; returns immediately
+
+        Args:
+            session_id: ID of the session
+            student_name: Name of the student
+        """
+        self.events.put((session_id, student_name))
+        metrics.set_gauge("queue_depth", self.events.qsize(), queue="attendance_writer")
+
+    def end_session(self, session_id):
+        """
+        Forget the marks written for a finished session, once its pending
+        marks are written
+
+        Args:
+            session_id: ID of the session
+        """
+        self.events.put(_EndSession(session_id))
+
+    def flush(self, timeout=None):
+        """
+        Block until every mark submitted so far has been written
+
+        Returns:
+            bool: True if the flush completed within the timeout
+        """
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        self.events.put(done)
+        return done.wait(timeout)
+
+    def stop(self):
+        """Write all pending marks and stop the writer thread"""
+        with self.lock:
+            if self.thread is None:
+                return
+            self.events.put(None)
+            self.thread.join()
+            self.thread = None
+            atexit.unregister(self.stop)
+
+    def _run(self):
+        """Collect marks into batches and write them"""
+        pending = []
+        waiters = []
+        ended = []
+        deadline = None
+        failures = 0
+        stopping = False
+
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                event = self.events.get(timeout=timeout)
+            except queue.Empty:
+                event = ()
+
+            if event is None:
+                stopping = True
+            elif isinstance(event, threading.Event):
+                waiters.append(event)
+            elif isinstance(event, _EndSession):
+                ended.append(event.session_id)
+            elif event:
+                pending.append(event)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            due = deadline is not None and time.monotonic() >= deadline
+            if pending and (stopping or waiters or due or len(pending) >= self.batch_size):
+                # Failed batches stay pending and are retried on the next flush
+                written = self._write(pending)
+                failures = 0 if written else failures + 1
+                if not written and stopping:
+                    self._retry_last(pending)
+                elif not written and failures >= MAX_WRITE_ATTEMPTS:
+                    self._log_lost(pending)
+                if written or stopping or failures >= MAX_WRITE_ATTEMPTS:
+                    pending = []
+                    deadline = None
+                    failures = 0
+                else:
+                    deadline = time.monotonic() + self.flush_interval
+
+            # Release flush callers once everything before them is written
+            if not pending:
+                deadline = None
+                for session_id in ended:
+                    self.written.pop(session_id, None)
+                ended = []
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+
+    def _retry_last(self, events):
+        """Retry the last batch a few times when stopping, then log the marks that are lost"""
+        for attempt in range(1, STOP_RETRIES + 1):
+            time.sleep(0.5 * attempt)
+            if self._write(events):
+                return
+        self._log_lost(events)
+
+    def _log_lost(self, events):
+        """Log and count marks that are given up"""
+        lost = sorted(set(events))
+        metrics.inc("attendance_marks_lost_total", len(lost))
+        for session_id, name in lost:
+            print(f"Attendance mark lost: session {session_id}, {name}")
+
+    def _write(self, events):
+        """
+        Write a batch of marks in one transaction
+
+        Returns:
+            bool: True if the batch was committed
+        """
+        marks = {(session_id, name) for session_id, name in events
+                 if name not in self.written.get(session_id, ())}
+        if not marks:
+            return True
+
+        try:
+            with metrics.timer("db_write_batch"), engine.begin() as conn:
+                # Create unknown students, then resolve their ids
+                missing = sorted({name for _, name in marks if name not in self.user_ids})
+                if missing:
+                    conn.execute(
+                        insert(User.__table__).on_conflict_do_nothing(index_elements=["name"]),
+                        [{"name": name} for name in missing],
+                    )
+                    rows = conn.execute(select(User.name, User.id).where(User.name.in_(missing))).all()
+                    new_ids = dict(rows)
+                else:
+                    new_ids = {}
+
+                user_ids = {**self.user_ids, **new_ids}
+                conn.execute(
+                    insert(Attendance.__table__).on_conflict_do_nothing(
+                        index_elements=["user_id", "session_id"]
+                    ),
+                    [{"user_id": user_ids[name], "session_id": session_id} for session_id, name in marks],
+                )
+        except Exception as e:
+            print(f"Error writing attendance batch: {str(e)}")
+            metrics.inc("attendance_write_errors_total")
+            return False
+
+        metrics.inc("attendance_marks_written_total", len(marks))
+
+        self.user_ids.update(new_ids)
+        for session_id, name in marks:
+            self.written.setdefault(session_id, set()).add(name)
+        while len(self.written) > MAX_OPEN_SESSIONS:
+            del self.written[next(iter(self.written))]
+
+        if self.attendance_service is not None:
+            if missing:
+                self.attendance_service.invalidate_view()
+            for session_id, name in marks:
+                self.attendance_service.patch_view(name, session_id)
+
+        return True
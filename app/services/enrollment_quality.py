@@ -0,0 +1,192 @@
+"""
+Quality gate for enrollment images
+
+Every enrollment face is scored on its detection score, size, sharpness and
+pose before it is embedded, and faces below the Config.ENROLLMENT_*
+thresholds are skipped. Once embedded, new rows that nearly duplicate a row
+already kept for the same person are dropped. Rows far from the rest of the
+person's images are flagged as possible outliers, for example a photo of
+somebody else.
+"""
+
+from collections import Counter, defaultdict
+
+import cv2
+import numpy as np
+
+from app.config.config import Config
+
+
+def face_quality(face, crop):
+    """
+    Measure the quality of an enrollment face
+
+    Args:
+        face: Detected Face with `bbox`, `det_score` and `kps`
+        crop: Aligned crop of the face from FaceService.align_face
+
+    Returns:
+        dict: det_score, size (shorter bbox side in pixels), blur (variance
+            of the Laplacian of the aligned crop, higher is sharper), yaw
+            (0 frontal, 1 profile) and pitch (nose position between eyes and
+            mouth, about 0.5 frontal)
+    """
+    x1, y1, x2, y2 = face.bbox[:4]
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    yaw, pitch = estimate_pose(face.kps)
+    return {
+        "det_score": float(face.det_score),
+        "size": float(min(x2 - x1, y2 - y1)),
+        "blur": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "yaw": yaw,
+        "pitch": pitch,
+    }
+
+
+def estimate_pose(kps):
+    """
+    Rough head pose from the five landmarks, measured along the eye line so
+    that in-plane rotation does not count
+
+    Args:
+        kps: (5, 2) landmarks: eyes, nose, mouth corners
+
+    Returns:
+        tuple: (yaw, pitch) - yaw is 0 when the nose is centred between the
+            eyes and 1 when it is level with one of them; pitch is the
+            nose's distance below the eye line relative to the mouth's
+    """
+    left_eye, right_eye, nose, left_mouth, right_mouth = np.asarray(kps, dtype=np.float64)
+    eye_line = right_eye - left_eye
+    eye_distance = max(np.linalg.norm(eye_line), 1e-6)
+    across = eye_line / eye_distance
+    down = np.array([-across[1], across[0]])
+
+    position = np.dot(nose - left_eye, across) / eye_distance
+    yaw = min(1.0, abs(2.0 * position - 1.0))
+
+    eye_center = (left_eye + right_eye) / 2
+    mouth_depth = np.dot((left_mouth + right_mouth) / 2 - eye_center, down)
+    pitch = np.dot(nose - eye_center, down) / mouth_depth if mouth_depth > 1e-6 else 0.0
+    return float(yaw), float(pitch)
+
+
+def quality_issue(quality):
+    """
+    Check a face against the enrollment thresholds
+
+    Returns:
+        str: The first failed check ("low_score", "small", "blurry" or
+            "pose"), or None if the face is good enough to enroll
+    """
+    pitch_low, pitch_high = Config.ENROLLMENT_PITCH_RANGE
+    if quality["det_score"] < Config.ENROLLMENT_MIN_DET_SCORE:
+        return "low_score"
+    if quality["size"] < Config.ENROLLMENT_MIN_FACE_PX:
+        return "small"
+    if quality["blur"] < Config.ENROLLMENT_MIN_BLUR:
+        return "blurry"
+    if quality["yaw"] > Config.ENROLLMENT_MAX_YAW or not pitch_low <= quality["pitch"] <= pitch_high:
+        return "pose"
+    return None
+
+
+def quality_score(quality):
+    """
+    Single score used to prefer one of several near-duplicate faces:
+    sharper, larger, more frontal and more confident faces score higher
+    """
+    sharpness = min(1.0, quality["blur"] / (2 * Config.ENROLLMENT_MIN_BLUR))
+    size = min(1.0, quality["size"] / (2 * Config.ENROLLMENT_MIN_FACE_PX))
+    return quality["det_score"] * sharpness * size * (1.0 - quality["yaw"])
+
+
+def select_rows(embeddings, names, scores, known_embeddings, known_names):
+    """
+    Decide which newly embedded rows go into the gallery
+
+    Rows are taken per person from best to worst quality score. A row is a
+    duplicate when its cosine similarity to a row already kept for the same
+    person reaches Config.ENROLLMENT_DUPLICATE_SIMILARITY. A row is an
+    outlier when its similarity to the mean of the person's other rows is
+    below Config.ENROLLMENT_OUTLIER_SIMILARITY; this is only checked for
+    people with at least three rows. Outliers are kept unless
+    Config.ENROLLMENT_DROP_OUTLIERS is set.
+
+    Args:
+        embeddings: (N, D) normalized embeddings of the new rows
+        names: List of N person names
+        scores: N quality scores from quality_score
+        known_embeddings: (M, D) rows already in the gallery
+        known_names: List of M names of those rows
+
+    Returns:
+        tuple: (keep, status) - boolean mask over the new rows, and "ok",
+            "duplicate" or "outlier" for each of them
+    """
+    keep = np.ones(len(names), dtype=bool)
+    status = ["ok"] * len(names)
+
+    new_rows = defaultdict(list)
+    for i, name in enumerate(names):
+        new_rows[name].append(i)
+    old_rows = defaultdict(list)
+    for i, name in enumerate(known_names):
+        if name in new_rows:
+            old_rows[name].append(i)
+
+    for name, rows in new_rows.items():
+        kept = [known_embeddings[i] for i in old_rows[name]]
+        kept_rows = []
+        for i in sorted(rows, key=lambda i: -scores[i]):
+            if kept and max(np.dot(kept, embeddings[i])) >= Config.ENROLLMENT_DUPLICATE_SIMILARITY:
+                keep[i] = False
+                status[i] = "duplicate"
+                continue
+            kept.append(embeddings[i])
+            kept_rows.append(i)
+
+        if len(kept) < 3:
+            continue
+
+        # Leave-one-out: compare each new row with the mean of all the others
+        total = np.sum(kept, axis=0)
+        for i in kept_rows:
+            others = total - embeddings[i]
+            similarity = np.dot(others, embeddings[i]) / max(np.linalg.norm(others), 1e-12)
+            if similarity < Config.ENROLLMENT_OUTLIER_SIMILARITY:
+                status[i] = "outlier"
+                keep[i] = not Config.ENROLLMENT_DROP_OUTLIERS
+
+    return keep, status
+
+
+def is_enrolled(status):
+    """Whether an image with this status got a row in the gallery"""
+    return status == "ok" or (status == "outlier" and not Config.ENROLLMENT_DROP_OUTLIERS)
+
+
+def print_report(rows):
+    """
+    Print a per-person summary of an enrollment run
+
+    Args:
+        rows: (person_name, source path, status) for every image processed,
+            where status is "ok", "no_face", a quality_issue or a
+            select_rows status
+    """
+    per_person = defaultdict(Counter)
+    flagged = defaultdict(list)
+    for name, source, status in rows:
+        per_person[name][status] += 1
+        if status != "ok":
+            flagged[name].append(f"{source} ({status})")
+
+    columns = ["ok", "outlier", "duplicate", "no_face", "low_score", "small", "blurry", "pose"]
+    print(f"{'person':<24} {'images':>6} " + " ".join(f"{column:>9}" for column in columns))
+    for name in sorted(per_person):
+        counts = per_person[name]
+        print(f"{name:<24} {sum(counts.values()):>6} " + " ".join(f"{counts[column]:>9}" for column in columns))
+
+    for name in sorted(flagged):
+        print(f"{name}: " + ", ".join(flagged[name]))
@@ -4,35 +4,68 @@ Service for face detection and recognition
 
 import os
 import cv2
-import pickle
+import argparse
+import threading
+import multiprocessing
+import onnxruntime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import hashlib
 import numpy as np
 from glob import glob
-from app.models import get_db, User
+from app.models import session_scope, User
 from insightface.app.common import Face
-from insightface.model_zoo import model_zoo
+from insightface.utils import face_align
+from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+from insightface.model_zoo.retinaface import RetinaFace
 from datetime import datetime
 from app.config.config import Config
+from app.services.gallery_store import GalleryStore
+from app.services.gallery_index import create_index, load_index, exact_search
+from app.services.gallery_prototypes import build_prototypes, save_prototypes, load_prototypes
+from app.services.adaptive_detection import choose_input_size, merge_detections, detect_letterboxed
+from app.services.enrollment_quality import (face_quality, quality_issue, quality_score, select_rows,
+                                             is_enrolled, print_report)
+from app.utils.frame_buffers import BufferCache
+from app.utils.metrics import metrics, FACES_BUCKETS
 
 class FaceService:
     def __init__(self):
         """Initialize the face service"""
         self.det_model = None
         self.rec_model = None
+        self.gallery_index = None
+        self.gallery_store = GalleryStore()
+        # (person_name, image path, status) of the images embedded by the last update
+        self.enrollment_report = []
+        # Detector input buffers, one cache per inference thread
+        self._buffers = threading.local()
+
+    def load_models(self, num_threads=None, precision=None):
+        """
+        Load the detection and recognition models
 
-    def load_models(self):
-        """Load the detection and recognition models"""
+        Args:
+            num_threads: Optional cap on ONNX Runtime threads per model, which
+                also restricts inference to the CPU (used by worker processes)
+            precision: "fp32" or "int8"; defaults to Config.MODEL_PRECISION
+        """
         # Check if models are already loaded
         if self.det_model is not None and self.rec_model is not None:
             return
 
         try:
-            # Load detection model
-            self.det_model = model_zoo.get_model(Config.DET_MODEL_PATH)
-            self.det_model.prepare(ctx_id=0, input_size=(640, 640), det_thres=Config.DETECTION_THRESHOLD)
+            det_path, rec_path = model_paths(precision)
+            self.det_model = RetinaFace(det_path, session=_create_session(det_path, num_threads))
+            self.rec_model = ArcFaceONNX(rec_path, session=_create_session(rec_path, num_threads))
+            # Providers are set on the sessions, a negative ctx_id would reset them to CPU
+            ctx_id = -1 if num_threads else 0
+
+            # Prepare detection model
+            self.det_model.prepare(ctx_id=ctx_id, input_size=Config.DET_INPUT_SIZE, det_thres=Config.DETECTION_THRESHOLD)
 
-            # Load recognition model
-            self.rec_model = model_zoo.get_model(Config.REC_MODEL_PATH)
-            self.rec_model.prepare(ctx_id=0, input_size=(640, 640), det_thres=Config.DETECTION_THRESHOLD)
+            # Prepare recognition model
+            self.rec_model.prepare(ctx_id=ctx_id, input_size=(640, 640), det_thres=Config.DETECTION_THRESHOLD)
         except Exception as e:
             raise Exception(f"Failed to load face models: {str(e)}")
 
@@ -43,21 +76,37 @@ class FaceService:
         Args:
             person_name (str): Name of the person.
             image_bytes (bytes): Image content in bytes.
+
+        Returns:
+            list: The enrollment status of the image, see save_face_images
         """
-        db = get_db()
-        try:
-            existing_user = db.query(User).filter_by(name=person_name).first()
+        return self.save_face_images(person_name, [image_bytes])
+
+    def save_face_images(self, person_name, images):
+        """
+        Enroll a new person from uploaded images.
+
+        The uploads are decoded in memory with cv2.imdecode and embedded in
+        one batch. They are still written to the dataset directory, but
+        registered in the manifest with their hash, so they are never read
+        back from disk. The person is only added if at least one image
+        passes the enrollment quality gate; otherwise the images are removed
+        again.
+
+        Args:
+            person_name (str): Name of the person.
+            images: List of image contents in bytes.
+
+        Returns:
+            list: Status of each image in input order: "unreadable", "no_face",
+                a failed quality check, "duplicate", "outlier" or "ok", see
+                enrollment_quality.is_enrolled; None if the person already exists
+        """
+        with session_scope() as db:
+            existing_user = db.query(User.id).filter_by(name=person_name).first()
             if existing_user:
                 # User exists - do NOT save image or extract embeddings
-                return False
-
-            # User does not exist - save user to DB
-            new_user = User(name=person_name)
-            db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
-        finally:
-            db.close()
+                return None
 
         # Create a safe folder name
         safe_name = person_name.strip().replace(" ", "_")
@@ -66,87 +115,465 @@ class FaceService:
         person_folder = os.path.join(Config.DATASET_PATH, safe_name)
         os.makedirs(person_folder, exist_ok=True)
 
-        # Unique filename using timestamp
+        # Unique filenames using timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        filename = f"{timestamp}.jpg"
-        file_path = os.path.join(person_folder, filename)
-
-        # Save image to disk
-        with open(file_path, "wb") as f:
-            f.write(image_bytes)
-
-
-        # immediately extract updated embeddings after adding image
-        self.extract_face_embeddings()
+        uploads = {}
+        rel_paths = []
+        for i, image_bytes in enumerate(images):
+            img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                rel_paths.append(None)
+                continue
+
+            file_path = os.path.join(person_folder, f"{timestamp}_{i}.jpg")
+            with open(file_path, "wb") as f:
+                f.write(image_bytes)
+
+            stat = os.stat(file_path)
+            signature = {"mtime": stat.st_mtime_ns, "size": stat.st_size,
+                         "sha1": hashlib.sha1(image_bytes).hexdigest()}
+            rel_path = os.path.relpath(file_path, Config.DATASET_PATH)
+            uploads[rel_path] = (signature, img)
+            rel_paths.append(rel_path)
+
+        # immediately embed the new images into the stored gallery
+        self.update_face_embeddings(uploads=uploads)
+        report = {rel_path: status for _, rel_path, status in self.enrollment_report}
+        statuses = [report.get(rel_path, "ok") if rel_path else "unreadable" for rel_path in rel_paths]
+
+        if not any(is_enrolled(status) for status in statuses):
+            # Nothing usable: do not leave a person without gallery rows
+            for rel_path in uploads:
+                os.remove(os.path.join(Config.DATASET_PATH, rel_path))
+            if not os.listdir(person_folder):
+                os.rmdir(person_folder)
+            self.update_face_embeddings()
+            return statuses
+
+        with session_scope() as db:
+            db.add(User(name=person_name))
+        return statuses
 
     def extract_face_embeddings(self):
         """
-        Extract face embeddings from images in the dataset directory
+        Extract face embeddings from all images in the dataset directory,
+        regenerating the stored gallery from scratch
 
         Returns:
             tuple: (known_embeddings, known_names) - the extracted embeddings and corresponding names
         """
-        embeddings_path = Config.EMBEDDINGS_PATH
-        names_path = Config.NAMES_PATH
+        return self.update_face_embeddings(rebuild=True)
 
-        # Initialize empty arrays for embeddings and names
-        known_embeddings = np.array([]).reshape(0, 512)
-        known_names = []
+    def update_face_embeddings(self, rebuild=False, progress=None, uploads=None):
+        """
+        Bring the stored gallery in sync with the dataset directory.
+
+        Only images that are new or whose content changed since the last run
+        are embedded; rows of changed or deleted images are dropped. The
+        manifest at Config.MANIFEST_PATH records every image seen together
+        with its mtime, size and content hash. With
+        Config.ENROLLMENT_QUALITY_GATE, low-quality faces and near-duplicate
+        rows are left out and a per-person report is printed.
+
+        Args:
+            rebuild (bool): Ignore the manifest and re-embed every image
+            progress: Optional callable(done, total) called as images are embedded
+            uploads: Optional dict of dataset-relative path -> (manifest entry,
+                decoded image) for images just written, embedded from memory
+
+        Returns:
+            tuple: (known_embeddings, known_names) - the updated embeddings and corresponding names
+        """
+        uploads = uploads or {}
+        self.enrollment_report = []
 
         # Check if dataset directory exists
         if not os.path.exists(Config.DATASET_PATH):
             os.makedirs(Config.DATASET_PATH)
+
+        known_embeddings, known_names, manifest = None, None, None
+        if not rebuild:
+            manifest = self._load_manifest()
+            known_embeddings, known_names = self._read_gallery()
+
+        # Fall back to a full rebuild if the gallery and manifest disagree
+        if (manifest is None or known_embeddings is None
+                or len(manifest["sources"]) != len(known_names)):
+            manifest = {"files": {}, "sources": []}
+            known_embeddings = np.empty((0, 512), dtype=np.float32)
+            known_names = []
+
+        old_files = manifest["files"]
+        files = {}
+        stale = set(old_files)
+        pending = []
+
+        for rel_path, (person_name, img_path) in self._scan_dataset().items():
+            previous = old_files.get(rel_path)
+            if rel_path in uploads:
+                signature = uploads[rel_path][0]
+            else:
+                signature = self._file_signature(img_path, previous)
+            files[rel_path] = signature
+
+            if previous is not None and previous["sha1"] == signature["sha1"]:
+                stale.discard(rel_path)
+            else:
+                pending.append((rel_path, person_name, img_path))
+
+        if not pending and not stale and files == old_files:
             return known_embeddings, known_names
 
-        # List all directories in the dataset folder
-        person_dirs = [d for d in os.listdir(Config.DATASET_PATH)
-                      if os.path.isdir(os.path.join(Config.DATASET_PATH, d))]
+        # Keep rows whose source image is unchanged
+        removed = [i for i, src in enumerate(manifest["sources"]) if src in stale]
+        keep = [i for i, src in enumerate(manifest["sources"]) if src not in stale]
+        sources = [manifest["sources"][i] for i in keep]
+        known_names = [known_names[i] for i in keep]
+        known_embeddings = known_embeddings[keep]
+
+        if pending:
+            # Uploads are already decoded; everything else is read from disk
+            in_memory = [item for item in pending if item[0] in uploads]
+            pending = in_memory + [item for item in pending if item[0] not in uploads]
+            memory_embeddings, memory_found, memory_info = self.embed_images(
+                uploads[rel_path][1] for rel_path, _, _ in in_memory
+            )
+            file_embeddings, file_found, file_info = self.embed_image_files(
+                [img_path for _, _, img_path in pending[len(in_memory):]], progress
+            )
+            new_embeddings = np.vstack([memory_embeddings, file_embeddings])
+            found = np.concatenate([memory_found, file_found])
+            info = memory_info + file_info
+
+            embedded = [item for item, has_face in zip(pending, found) if has_face]
+            new_names = [person_name for _, person_name, _ in embedded]
+            if Config.ENROLLMENT_QUALITY_GATE:
+                scores = [score for (_, score), has_face in zip(info, found) if has_face]
+                accepted, status = select_rows(new_embeddings, new_names, scores, known_embeddings, known_names)
+            else:
+                accepted, status = np.ones(len(embedded), dtype=bool), ["ok"] * len(embedded)
+
+            for (rel_path, person_name, _), kept in zip(embedded, accepted):
+                if kept:
+                    known_names.append(person_name)
+                    sources.append(rel_path)
+            known_embeddings = np.vstack([known_embeddings, new_embeddings[accepted]])
+
+            status = iter(status)
+            self.enrollment_report = [(person_name, rel_path, next(status) if has_face else image_status)
+                                      for (rel_path, person_name, _), has_face, (image_status, _)
+                                      in zip(pending, found, info)]
+            if Config.ENROLLMENT_QUALITY_GATE:
+                print_report(self.enrollment_report)
+
+        self._write_gallery(known_embeddings, known_names)
+        self._save_manifest({"files": files, "sources": sources})
+        self._sync_index(known_embeddings, removed, len(known_names) - len(keep), rebuild)
+        if Config.GALLERY_MODE != "full":
+            save_prototypes(Config.PROTOTYPES_PATH,
+                            *build_prototypes(known_embeddings, known_names), len(known_names))
+
+        return known_embeddings, known_names
+
+    def _sync_index(self, known_embeddings, removed=(), num_added=0, rebuild=False):
+        """
+        Keep the approximate gallery index aligned with the gallery rows.
+
+        The persisted index is patched with the removed and appended rows
+        when it matches the previous gallery, and rebuilt otherwise or when
+        its clusters went stale (see IVFIndex.needs_retraining). Nothing is
+        kept for the default exact "flat" search.
+
+        Args:
+            known_embeddings: The current gallery
+            removed: Row ids dropped from the previous gallery
+            num_added: Number of rows appended at the end of the gallery
+            rebuild: Retrain the index from scratch
+        """
+        if Config.GALLERY_INDEX == "flat" or Config.GALLERY_MODE != "full":
+            self.gallery_index = None
+            return
+
+        index = None if rebuild else (self.gallery_index or load_index(Config.INDEX_PATH))
+        previous_total = len(known_embeddings) - num_added + len(removed)
+
+        if index is None or index.kind != Config.GALLERY_INDEX or index.ntotal != previous_total:
+            index = create_index(dim=known_embeddings.shape[1]).build(known_embeddings)
+        elif removed or num_added:
+            index.remove(removed)
+            index.add(known_embeddings[len(known_embeddings) - num_added:])
+            if index.needs_retraining():
+                index = create_index(dim=known_embeddings.shape[1]).build(known_embeddings)
+        else:
+            self.gallery_index = index
+            return
+
+        index.save(Config.INDEX_PATH)
+        self.gallery_index = index
+
+    def embed_image_files(self, img_paths, progress=None):
+        """
+        Embed the enrollment face of each image file.
+
+        Large batches are sharded across a process pool of
+        Config.EMBEDDING_WORKERS workers, each with its own ONNX sessions
+        limited to Config.EMBEDDING_WORKER_THREADS threads. Results are
+        written into a preallocated buffer as shards complete.
+
+        Args:
+            img_paths: List of image paths
+            progress: Optional callable(done, total), e.g. print_progress
+
+        Returns:
+            tuple: (embeddings, found, info) - (M, 512) embeddings of the
+                images in which a face was found, in input order, a boolean
+                mask of those images and (status, quality score) per image
+                as returned by embed_images
+        """
+        total = len(img_paths)
+        progress = progress or (lambda done, total: None)
+        embeddings = np.empty((total, 512), dtype=np.float32)
+        found = np.zeros(total, dtype=bool)
+        info = [None] * total
+        chunk_size = max(1, Config.EMBEDDING_CHUNK_SIZE)
+        chunks = [(start, img_paths[start:start + chunk_size]) for start in range(0, total, chunk_size)]
+
+        if Config.EMBEDDING_WORKERS > 1 and len(chunks) > 1:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(
+                max_workers=min(Config.EMBEDDING_WORKERS, len(chunks)),
+                mp_context=context,
+                initializer=_init_embedding_worker,
+                initargs=(Config.EMBEDDING_WORKER_THREADS,),
+            ) as executor:
+                futures = {executor.submit(_embed_chunk, paths): (start, len(paths)) for start, paths in chunks}
+                done = 0
+                for future in as_completed(futures):
+                    start, count = futures[future]
+                    chunk_embeddings, chunk_found, chunk_info = future.result()
+                    embeddings[start:start + count][chunk_found] = chunk_embeddings
+                    found[start:start + count] = chunk_found
+                    info[start:start + count] = chunk_info
+                    done += count
+                    progress(done, total)
+        elif chunks:
+            # Load face detection and recognition models if not already loaded
+            if self.det_model is None or self.rec_model is None:
+                self.load_models()
+
+            for start, paths in chunks:
+                chunk_embeddings, chunk_found, chunk_info = self._embed_chunk(paths)
+                embeddings[start:start + len(paths)][chunk_found] = chunk_embeddings
+                found[start:start + len(paths)] = chunk_found
+                info[start:start + len(paths)] = chunk_info
+                progress(start + len(paths), total)
+
+        return embeddings[found], found, info
+
+    def _embed_chunk(self, img_paths):
+        """
+        Detect, align and embed the enrollment faces of a few images
+
+        Returns:
+            tuple: (embeddings, found, info) for the images of the chunk
+        """
+        return self.embed_images(cv2.imread(img_path) for img_path in img_paths)
+
+    def embed_images(self, images):
+        """
+        Detect, align and embed the enrollment faces of decoded images
 
-        # Load face detection and recognition models if not already loaded
+        Args:
+            images: Iterable of BGR images, None for images that could not be
+                decoded; only the aligned crops are kept in memory
+
+        Returns:
+            tuple: (embeddings, found, info) - embeddings of the images with
+                an accepted face, a boolean mask over the images, and
+                (status, quality score) per image; status is "ok",
+                "no_face" or the failed enrollment_quality check
+        """
         if self.det_model is None or self.rec_model is None:
             self.load_models()
 
-        # Process each person's directory
-        for person_name in person_dirs:
+        crops, found, info = [], [], []
+        for img in images:
+            face = self._detect_enrollment_face(img)
+            if face is None:
+                found.append(False)
+                info.append(("no_face", 0.0))
+                continue
+
+            crop = self.align_face(img, face)
+            issue, score = None, 0.0
+            if Config.ENROLLMENT_QUALITY_GATE:
+                quality = face_quality(face, crop)
+                issue, score = quality_issue(quality), quality_score(quality)
+
+            found.append(issue is None)
+            info.append((issue or "ok", score))
+            if issue is None:
+                crops.append(crop)
+
+        return self.embed_crops(crops), np.array(found, dtype=bool), info
+
+    def _detect_enrollment_face(self, img):
+        """
+        Detect the face to enroll from an enrollment image
+
+        Args:
+            img: BGR image, or None if it could not be decoded
+
+        Returns:
+            Face: The largest detected face, or None if no face was found
+        """
+        if img is None:
+            return None
+
+        # Detect faces in the image; enrollment photos are close-ups, so the
+        # detector input is sized for a large face
+        faces = self.detect_faces(img, min_face_px=Config.ENROLLMENT_FACE_FRACTION * min(img.shape[:2]),
+                                  target_face_px=Config.ENROLLMENT_TARGET_FACE_PX)
+        if not faces:
+            return None
+
+        # The person being enrolled is the largest face, not bystanders
+        return max(faces, key=lambda face: (face.bbox[2] - face.bbox[0]) * (face.bbox[3] - face.bbox[1]))
+
+    def align_face(self, img, face):
+        """
+        Crop and align a face to the recognition model input using its landmarks
+
+        Args:
+            img: Image the face was detected in
+            face: Face with `kps` landmarks
+
+        Returns:
+            ndarray: Aligned BGR crop
+        """
+        return face_align.norm_crop(img, landmark=face.kps, image_size=self.rec_model.input_size[0])
+
+    def embed_crops(self, crops):
+        """
+        Run the recognition model on aligned face crops in batches.
+
+        The crops are stacked into NCHW batches of at most
+        Config.REC_BATCH_SIZE, so the ONNX session runs once per batch
+        instead of once per face.
+
+        Args:
+            crops: List of aligned crops from align_face
+
+        Returns:
+            ndarray: (N, 512) normalized embeddings
+        """
+        if not crops:
+            return np.empty((0, 512), dtype=np.float32)
+
+        batch_size = max(1, Config.REC_BATCH_SIZE)
+        with metrics.timer("embed"):
+            embeddings = np.vstack([
+                self.rec_model.get_feat(crops[i:i + batch_size])
+                for i in range(0, len(crops), batch_size)
+            ]).astype(np.float32)
+
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings
+
+    def embed_faces(self, img, faces):
+        """
+        Extract embeddings for all faces detected in an image
+
+        Args:
+            img: Image the faces were detected in
+            faces: List of Face objects
+
+        Returns:
+            ndarray: (N, 512) normalized embeddings, also stored on each Face
+        """
+        embeddings = self.embed_crops([self.align_face(img, face) for face in faces])
+
+        for face, embedding in zip(faces, embeddings):
+            face.embedding = embedding
+
+        return embeddings
+
+    def _scan_dataset(self):
+        """
+        List enrollment images in the dataset directory
+
+        Returns:
+            dict: Image path relative to the dataset -> (person_name, absolute path)
+        """
+        images = {}
+        for person_name in sorted(os.listdir(Config.DATASET_PATH)):
             directory = os.path.join(Config.DATASET_PATH, person_name)
-            img_paths = glob(f"{directory}/*.jpg")
-            new_embeddings = []
-
-            for img_path in img_paths:
-                img = cv2.imread(img_path)
-                if img is None:
-                    continue
-
-                # Detect faces in the image
-                bboxes, kpss = self.det_model.detect(img, max_num=0, metric='default')
-                if len(bboxes) == 0:
-                    continue
-
-                # Process the first face (assuming one face per image)
-                bbox = bboxes[0, :4]
-                det_score = bboxes[0, 4]
-                kps = kpss[0]
-                face = Face(bbox=bbox, kps=kps, det_score=det_score)
-
-                # Extract embedding for the face
-                self.rec_model.get(img, face)
-
-                if hasattr(face, 'normed_embedding'):
-                    new_embeddings.append(face.normed_embedding)
-
-            # Add embeddings to the collection if any were found
-            if new_embeddings:
-                new_embeddings = np.vstack(new_embeddings)
-                known_embeddings = np.vstack([known_embeddings, new_embeddings])
-                known_names.extend([person_name] * new_embeddings.shape[0])
-
-        # Save embeddings and names
-        os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
-        np.save(embeddings_path, known_embeddings)
-        with open(names_path, 'wb') as f:
-            pickle.dump(known_names, f)
+            if not os.path.isdir(directory):
+                continue
 
-        return known_embeddings, known_names
+            for img_path in sorted(glob(f"{directory}/*.jpg")):
+                rel_path = os.path.relpath(img_path, Config.DATASET_PATH)
+                images[rel_path] = (person_name, img_path)
+
+        return images
+
+    @staticmethod
+    def _file_signature(img_path, previous=None):
+        """
+        Build the manifest entry for an image, hashing it only when its
+        mtime or size differ from the previous entry
+
+        Args:
+            img_path: Path of the image
+            previous: Manifest entry from the last run, if any
+
+        Returns:
+            dict: {"mtime", "size", "sha1"} for the image
+        """
+        stat = os.stat(img_path)
+        if (previous is not None and previous.get("mtime") == stat.st_mtime_ns
+                and previous.get("size") == stat.st_size):
+            return previous
+
+        with open(img_path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+
+        return {"mtime": stat.st_mtime_ns, "size": stat.st_size, "sha1": digest}
+
+    def _load_manifest(self):
+        """Load the enrollment manifest, or None if missing or unreadable"""
+        try:
+            with open(Config.MANIFEST_PATH, 'r') as f:
+                manifest = json.load(f)
+            if "files" not in manifest or "sources" not in manifest:
+                return None
+            return manifest
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, manifest):
+        """Save the enrollment manifest next to the gallery"""
+        os.makedirs(os.path.dirname(Config.MANIFEST_PATH), exist_ok=True)
+        with open(Config.MANIFEST_PATH, 'w') as f:
+            json.dump(manifest, f)
+
+    def _read_gallery(self):
+        """
+        Read the stored gallery without triggering extraction
+
+        Returns:
+            tuple: (known_embeddings, known_names), or (None, None) if missing
+        """
+        try:
+            self.gallery_store.migrate_legacy(Config.EMBEDDINGS_PATH, Config.NAMES_PATH)
+            return self.gallery_store.read_gallery()
+        except Exception as e:
+            print(f"Error loading embeddings: {str(e)}")
+            return None, None
+
+    def _write_gallery(self, known_embeddings, known_names):
+        """Save embeddings and names"""
+        self.gallery_store.write_gallery(known_embeddings, known_names)
 
     def load_embeddings(self):
         """
@@ -155,21 +582,80 @@ class FaceService:
         Returns:
             tuple: (known_embeddings, known_names) - the loaded embeddings and corresponding names
         """
-        embeddings_path = Config.EMBEDDINGS_PATH
-        names_path = Config.NAMES_PATH
-
-        if os.path.exists(embeddings_path) and os.path.exists(names_path):
-            try:
-                known_embeddings = np.load(embeddings_path)
-                with open(names_path, 'rb') as f:
-                    known_names = pickle.load(f)
-                return known_embeddings, known_names
-            except Exception as e:
-                print(f"Error loading embeddings: {str(e)}")
-                return None, None
-        else:
-            # If no embeddings exist, extract them from dataset
-            return self.extract_face_embeddings()
+        known_embeddings, known_names = self._read_gallery()
+        if known_embeddings is None:
+            # If no usable embeddings exist, extract them from dataset
+            known_embeddings, known_names = self.extract_face_embeddings()
+
+        if Config.GALLERY_MODE == "full":
+            self._sync_index(known_embeddings)
+            return known_embeddings, known_names
+
+        return self._load_prototype_gallery(known_embeddings, known_names)
+
+    def _load_prototype_gallery(self, known_embeddings, known_names):
+        """
+        Load the prototype gallery for the current full gallery, building and
+        saving it if it is missing or stale
+
+        Returns:
+            tuple: (prototypes, prototype_names)
+        """
+        gallery = load_prototypes(Config.PROTOTYPES_PATH, len(known_names))
+        if gallery is None:
+            gallery = build_prototypes(known_embeddings, known_names)
+            save_prototypes(Config.PROTOTYPES_PATH, *gallery, len(known_names))
+        prototypes, labels, name_table = gallery
+
+        # Prototypes are few, so any approximate index is rebuilt in memory
+        self.gallery_index = None
+        if Config.GALLERY_INDEX != "flat" and len(prototypes):
+            self.gallery_index = create_index(dim=prototypes.shape[1]).build(prototypes)
+
+        return prototypes, [name_table[label] for label in labels]
+
+    def match_faces(self, embeddings, known_embeddings, known_names, top_k=1):
+        """
+        Match a batch of face embeddings against the gallery with a single
+        matmul, or through the approximate gallery index when one is enabled
+
+        Args:
+            embeddings: (F, 512) array of normalized face embeddings
+            known_embeddings: Array of known embeddings
+            known_names: List of corresponding names
+            top_k: Number of candidates to return per face
+
+        Returns:
+            list: For each face, up to top_k (name, score) pairs ordered best
+                first. Candidates not exceeding the threshold are named 'Unknown'.
+        """
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        num_faces = embeddings.shape[0]
+
+        if num_faces == 0:
+            return []
+        if known_embeddings is None or len(known_names) == 0:
+            return [[('Unknown', 0.0)] for _ in range(num_faces)]
+
+        # Search the index if it covers this gallery, otherwise score all rows in one matmul
+        top_k = min(top_k, len(known_names))
+        index = self.gallery_index
+        with metrics.timer("match"):
+            if index is not None and index.ntotal == len(known_names):
+                top_scores, top_idx = index.search(embeddings, top_k)
+            else:
+                top_scores, top_idx = exact_search(embeddings, known_embeddings, top_k)
+        np.clip(top_scores, 0., 1., out=top_scores)
+
+        # Keep names whose score exceeds the threshold, otherwise 'Unknown'
+        matches = []
+        for idx_row, score_row in zip(top_idx, top_scores):
+            matches.append([
+                (known_names[idx] if score > Config.RECOGNITION_THRESHOLD else 'Unknown', float(score))
+                for idx, score in zip(idx_row, score_row) if idx >= 0
+            ] or [('Unknown', 0.0)])
+
+        return matches
 
     def find_match(self, embedding, known_embeddings, known_names):
         """
@@ -183,18 +669,151 @@ class FaceService:
         Returns:
             str: The name of the closest match or 'Unknown'
         """
-        # Calculate cosine similarity between embeddings
-        scores = np.dot(embedding, known_embeddings.T)
-        scores = np.clip(scores, 0., 1.)
+        return self.match_faces(embedding, known_embeddings, known_names)[0][0][0]
+
+    def recognize_frame(self, frame, known_embeddings, known_names, tracker=None):
+        """
+        Detect and identify every face in a video frame
+
+        Args:
+            frame: The video frame to process
+            known_embeddings: Array of known embeddings
+            known_names: List of corresponding names
+            tracker: Optional FaceTracker of the video stream the frame belongs
+                to, used to skip detection and recognition on frames in between
+
+        Returns:
+            list: Face objects with `name` and `score` set from the best match;
+                `recognized_now` tells whether the identity was computed on this
+                frame or carried by the tracker, and `track_id` is set when tracking
+        """
+        # Ensure models are loaded
+        if self.det_model is None or self.rec_model is None:
+            self.load_models()
 
-        # Get the highest score and its index
-        idx = np.argmax(scores)
-        score = scores[idx]
+        with metrics.timer("recognize_frame"):
+            if tracker is not None:
+                faces = self._recognize_tracked(frame, known_embeddings, known_names, tracker)
+            else:
+                faces = self.detect_faces(frame)
+                self.identify_faces(frame, faces, known_embeddings, known_names)
 
-        # Return name if the score exceeds the threshold, otherwise 'Unknown'
-        return known_names[idx] if score > Config.RECOGNITION_THRESHOLD else 'Unknown'
+        metrics.inc("frames_processed_total")
+        metrics.observe("faces_per_frame", len(faces), FACES_BUCKETS)
+        return faces
 
-    def process_frame(self, frame, known_embeddings, known_names):
+    def _recognize_tracked(self, frame, known_embeddings, known_names, tracker):
+        """
+        Recognize faces using a tracker: detection only runs on the
+        tracker's schedule, and only new or expired tracks are embedded
+        """
+        if tracker.next_frame():
+            tracks = tracker.update(self.detect_faces(frame, regions=tracker.detection_regions(frame)))
+            self.identify_faces(frame, [t.face for t in tracks], known_embeddings, known_names)
+            tracker.mark_recognized(tracks)
+
+        return tracker.visible_faces()
+
+    def detect_faces(self, frame, regions=None, min_face_px=None, target_face_px=None):
+        """
+        Detect faces in a frame
+
+        Args:
+            frame: The video frame to process
+            regions: Optional (x1, y1, x2, y2) regions to search instead of the
+                full frame; boxes are returned in frame coordinates
+            min_face_px: Smallest expected face in pixels, used to size the
+                detector input; defaults to Config.EXPECTED_MIN_FACE_PX
+            target_face_px: Face size the detector should see; defaults to
+                Config.DET_TARGET_FACE_PX
+
+        Returns:
+            list: Face objects with bbox, kps and det_score
+        """
+        with metrics.timer("detect"):
+            if regions is None:
+                bboxes, kpss = self._detect(frame, min_face_px, target_face_px)
+            else:
+                results = []
+                for x1, y1, x2, y2 in regions:
+                    crop_bboxes, crop_kpss = self._detect(frame[y1:y2, x1:x2], min_face_px, target_face_px)
+                    crop_bboxes[:, :4] += (x1, y1, x1, y1)
+                    crop_kpss += (x1, y1)
+                    results.append((crop_bboxes, crop_kpss))
+                bboxes, kpss = merge_detections(results)
+
+        return [Face(bbox=bboxes[i, :4], kps=kpss[i], det_score=bboxes[i, 4])
+                for i in range(len(bboxes))]
+
+    def _detect(self, img, min_face_px=None, target_face_px=None):
+        """
+        Run the detector with an input size chosen for the image, or the
+        prepared one, letterboxing into this thread's reused buffers
+        """
+        input_size = self.det_model.input_size
+        if Config.ADAPTIVE_DET_SIZE:
+            input_size = choose_input_size(img.shape[0], img.shape[1], min_face_px, target_face_px)
+
+        buffers = getattr(self._buffers, "cache", None)
+        if buffers is None:
+            buffers = self._buffers.cache = BufferCache()
+        return detect_letterboxed(self.det_model, img, input_size, buffers)
+
+    def identify_faces(self, frame, faces, known_embeddings, known_names):
+        """
+        Embed faces in batches and set `name` and `score` from the best match
+
+        Args:
+            frame: The frame the faces were detected in
+            faces: Face objects to identify
+            known_embeddings: Array of known embeddings
+            known_names: List of corresponding names
+        """
+        if not faces:
+            return
+
+        # Extract embeddings for all faces in batched runs
+        embeddings = self.embed_faces(frame, faces)
+
+        # Find the closest match for all faces at once
+        matches = self.match_faces(embeddings, known_embeddings, known_names)
+        for face, candidates in zip(faces, matches):
+            face.name, face.score = candidates[0]
+            face.recognized_now = True
+
+    def draw_faces(self, frame, faces):
+        """
+        Draw bounding boxes and names of recognized faces onto a frame
+
+        Args:
+            frame: The video frame to draw on
+            faces: Face objects returned by recognize_frame
+
+        Returns:
+            ndarray: The same frame with overlays
+        """
+        for face in faces:
+            pred_name = face.name
+
+            # Draw bounding box and name
+            x1, y1, x2, y2 = map(int, face.bbox)
+
+            # Set color based on name
+            if pred_name == 'Unknown':
+                color = (0, 0, 255)  # Red for unknown
+            elif pred_name == 'sayan':
+                color = (215, 168, 150)  # Custom color for sayan
+            else:
+                color = (70, 255, 20)  # Green for other known people
+
+            # Draw rectangle and text
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, pred_name, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_DUPLEX, 0.6, color, 2)
+
+        return frame
+
+    def process_frame(self, frame, known_embeddings, known_names, tracker=None):
         """
         Process a video frame with face detection and recognition
 
@@ -202,50 +821,105 @@ class FaceService:
             frame: The video frame to process
             known_embeddings: Array of known embeddings
             known_names: List of corresponding names
+            tracker: Optional FaceTracker of the video stream
 
         Returns:
             tuple: (processed_frame, detected_names) - the frame with overlays and list of detected names
         """
-        # Ensure models are loaded
-        if self.det_model is None or self.rec_model is None:
-            self.load_models()
+        faces = self.recognize_frame(frame, known_embeddings, known_names, tracker)
+
+        # Add the names to the detected list if not Unknown
+        detected_names = [face.name for face in faces if face.name != 'Unknown']
+
+        return self.draw_faces(frame, faces), detected_names
+
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+_EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def model_paths(precision=None):
+    """
+    Model files for a precision
+
+    Args:
+        precision: "fp32" or "int8"; defaults to Config.MODEL_PRECISION
+
+    Returns:
+        tuple: (detection model path, recognition model path)
+    """
+    precision = precision or Config.MODEL_PRECISION
+    if precision == "int8":
+        return Config.DET_MODEL_INT8_PATH, Config.REC_MODEL_INT8_PATH
+    if precision == "fp32":
+        return Config.DET_MODEL_PATH, Config.REC_MODEL_PATH
+    raise ValueError(f"Unknown model precision: {precision}")
+
+
+def _create_session(model_path, num_threads=None):
+    """
+    Create an ONNX Runtime session with the session options from Config
+
+    Args:
+        model_path: ONNX model file
+        num_threads: Optional cap on intra-op threads, which also restricts
+            the session to the CPU with a single inter-op thread
+    """
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = num_threads or Config.ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = 1 if num_threads else Config.ORT_INTER_OP_THREADS
+    options.execution_mode = _EXECUTION_MODES[Config.ORT_EXECUTION_MODE]
+    options.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS[Config.ORT_GRAPH_OPTIMIZATION]
+    options.enable_cpu_mem_arena = Config.ORT_ENABLE_MEM_ARENA
+
+    if num_threads:
+        providers = ['CPUExecutionProvider']
+    else:
+        available = onnxruntime.get_available_providers()
+        providers = [p for p in Config.ORT_PROVIDERS if p in available] or ['CPUExecutionProvider']
+    return onnxruntime.InferenceSession(model_path, sess_options=options, providers=providers)
+
+
+def print_progress(done, total):
+    """Progress reporter for embedding extraction from the command line"""
+    print(f"Embedded {done}/{total} images", flush=True)
+
 
-        detected_names = []
+# FaceService of an embedding worker process, see FaceService.embed_image_files
+_worker_service = None
 
-        # Detect faces in the frame
-        bboxes, kpss = self.det_model.detect(frame, max_num=0, metric='default')
 
-        if len(bboxes) > 0:
-            for i in range(len(bboxes)):
-                bbox = bboxes[i, :4]
-                kps = kpss[i]
-                face = Face(bbox=bbox, kps=kps, det_score=bboxes[i, 4])
+def _init_embedding_worker(num_threads):
+    """Load the models once per worker process with limited threads"""
+    global _worker_service
+    cv2.setNumThreads(1)
+    _worker_service = FaceService()
+    _worker_service.load_models(num_threads=num_threads)
 
-                # Extract embedding for the face
-                self.rec_model.get(frame, face)
-                test_embedding = face.normed_embedding
 
-                # Find the closest match
-                pred_name = self.find_match(test_embedding, known_embeddings, known_names)
+def _embed_chunk(img_paths):
+    """Embed a shard of images in a worker process"""
+    return _worker_service._embed_chunk(img_paths)
 
-                # Add the name to the detected list if not Unknown
-                if pred_name != 'Unknown':
-                    detected_names.append(pred_name)
 
-                # Draw bounding box and name
-                x1, y1, x2, y2 = map(int, bbox)
+def main():
+    """Bring the stored gallery in sync with the dataset directory"""
+    parser = argparse.ArgumentParser(description="Update the face gallery from the dataset directory")
+    parser.add_argument("--rebuild", action="store_true", help="Re-embed every image, ignoring the manifest")
+    args = parser.parse_args()
 
-                # Set color based on name
-                if pred_name == 'Unknown':
-                    color = (0, 0, 255)  # Red for unknown
-                elif pred_name == 'sayan':
-                    color = (215, 168, 150)  # Custom color for sayan
-                else:
-                    color = (70, 255, 20)  # Green for other known people
+    embeddings, names = FaceService().update_face_embeddings(rebuild=args.rebuild, progress=print_progress)
+    print(f"Gallery: {len(names)} images of {len(set(names))} people")
 
-                # Draw rectangle and text
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, pred_name, (x1, y1 - 10),
-                            cv2.FONT_HERSHEY_DUPLEX, 0.6, color, 2)
 
-        return frame, detected_names
+if __name__ == "__main__":
+    main()
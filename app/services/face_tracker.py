@@ -0,0 +1,210 @@
+"""
+Lightweight IoU tracker used to carry faces between detection frames
+"""
+
+import numpy as np
+
+from app.config.config import Config
+from app.services.adaptive_detection import RegionProposer
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise intersection-over-union of two sets of boxes
+
+    Args:
+        boxes_a: (A, 4) array of x1, y1, x2, y2 boxes
+        boxes_b: (B, 4) array of x1, y1, x2, y2 boxes
+
+    Returns:
+        ndarray: (A, B) IoU values
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+
+    return inter / np.maximum(union, 1e-6)
+
+
+class Track:
+    """A face followed across frames"""
+
+    def __init__(self, track_id, face, frame_index):
+        self.track_id = track_id
+        self.face = face
+        self.face.track_id = track_id
+        self.velocity = np.zeros(2, dtype=np.float32)
+        # Center of the last detection; the box itself is moved by predict()
+        self.detected_center = _center(face.bbox)
+        self.last_detected = frame_index
+        self.recognized_at = None
+        self.recognitions = 0
+        self.missed = 0
+
+    def update(self, face, frame_index):
+        """Move the track to a new detection of the same face"""
+        elapsed = max(1, frame_index - self.last_detected)
+        center = _center(face.bbox)
+        self.velocity = (center - self.detected_center) / elapsed
+        self.detected_center = center
+
+        # Keep the identity, take the new geometry
+        self.face.bbox = face.bbox
+        self.face.kps = face.kps
+        self.face.det_score = face.det_score
+        self.last_detected = frame_index
+        self.missed = 0
+
+    def predict(self):
+        """Shift the box by the centroid velocity for a frame without detection"""
+        shift = np.tile(self.velocity, 2)
+        self.face.bbox = self.face.bbox + shift
+        if self.face.kps is not None:
+            self.face.kps = self.face.kps + self.velocity
+
+
+def _center(bbox):
+    return np.array([(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2], dtype=np.float32)
+
+
+class FaceTracker:
+    """
+    Decides when to run full detection and keeps face identities between
+    detections.
+
+    Detection runs every `detect_interval` frames, and on the frame after a
+    track is lost. Detections are matched to existing tracks greedily by IoU.
+    A new track is recognized on each detection until it has collected
+    `min_recognitions` votes for attendance confirmation; after that it keeps
+    its identity until `identity_ttl` frames after it was last recognized, so
+    only new or expired tracks need to be embedded. With ROI detection
+    enabled, detection frames only search around the tracked faces and
+    moving areas, see RegionProposer.
+    """
+
+    def __init__(self, detect_interval=None, identity_ttl=None, max_missed=None, iou_threshold=None,
+                 min_recognitions=None):
+        self.detect_interval = detect_interval or Config.DETECT_INTERVAL
+        self.identity_ttl = identity_ttl or Config.TRACK_IDENTITY_TTL
+        self.min_recognitions = min_recognitions or Config.VOTE_MIN_HITS
+        self.max_missed = max_missed if max_missed is not None else Config.TRACK_MAX_MISSED
+        self.iou_threshold = iou_threshold or Config.TRACK_IOU_THRESHOLD
+
+        self.tracks = []
+        self.frame_index = -1
+        self.next_track_id = 0
+        self.force_detection = True
+        self.last_detection = None
+        self.regions = RegionProposer() if Config.ROI_DETECTION else None
+
+    def reset(self):
+        """Forget all tracks, e.g. when the gallery changes"""
+        self.tracks = []
+        self.force_detection = True
+        if self.regions is not None:
+            self.regions.reset()
+
+    def next_frame(self):
+        """
+        Advance to the next frame
+
+        Returns:
+            bool: True if full detection should run on this frame
+        """
+        self.frame_index += 1
+        detect = (self.force_detection or self.last_detection is None
+                  or self.frame_index - self.last_detection >= self.detect_interval)
+
+        if not detect:
+            for track in self.tracks:
+                track.predict()
+                track.face.recognized_now = False
+        return detect
+
+    def detection_regions(self, frame):
+        """
+        Regions of the current frame to search for faces
+
+        Args:
+            frame: The frame about to be detected on
+
+        Returns:
+            list: (x1, y1, x2, y2) regions, or None to search the full frame
+        """
+        if self.regions is None:
+            return None
+        return self.regions.propose(frame, [track.face.bbox for track in self.tracks])
+
+    def update(self, faces):
+        """
+        Match the detections of the current frame to the tracks
+
+        Args:
+            faces: Face objects detected in the current frame
+
+        Returns:
+            list: Tracks whose identity must be (re)computed
+        """
+        self.last_detection = self.frame_index
+        self.force_detection = False
+
+        matched_tracks, matched_faces = set(), set()
+        if self.tracks and faces:
+            ious = iou_matrix([t.face.bbox for t in self.tracks], [f.bbox for f in faces])
+            for flat in np.argsort(-ious, axis=None):
+                t, f = np.unravel_index(flat, ious.shape)
+                if ious[t, f] < self.iou_threshold:
+                    break
+                if t in matched_tracks or f in matched_faces:
+                    continue
+                self.tracks[t].update(faces[f], self.frame_index)
+                matched_tracks.add(t)
+                matched_faces.add(f)
+
+        # Age unmatched tracks and detect again next frame if one disappears
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    self.force_detection = True
+                    continue
+            kept.append(track)
+
+        # Start tracks for new faces
+        for f, face in enumerate(faces):
+            if f not in matched_faces:
+                kept.append(Track(self.next_track_id, face, self.frame_index))
+                self.next_track_id += 1
+
+        self.tracks = kept
+        return [track for track in self.tracks
+                if track.missed == 0 and (track.recognitions < self.min_recognitions
+                                          or self.frame_index - track.recognized_at >= self.identity_ttl)]
+
+    def mark_recognized(self, tracks):
+        """Record that the given tracks were identified on the current frame"""
+        recognized = set(id(track) for track in tracks)
+        for track in self.tracks:
+            track.face.recognized_now = id(track) in recognized
+            if track.face.recognized_now:
+                track.recognized_at = self.frame_index
+                track.recognitions += 1
+
+    def visible_faces(self):
+        """
+        Faces of the tracks shown on the current frame
+
+        Returns:
+            list: Face objects with `track_id`, `name` and `score` set
+        """
+        return [track.face for track in self.tracks if track.missed == 0 and track.face.name is not None]
@@ -0,0 +1,383 @@
+"""
+Search indexes over the face gallery
+
+FlatIndex does exact brute-force search. IVFIndex is an approximate
+inverted-file index: the gallery is clustered with spherical k-means and a
+query is only scored against the members of its `nprobe` closest clusters.
+Both indexes address gallery rows by position, so ids always line up with
+`known_names`.
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+from app.config.config import Config
+
+
+def exact_search(queries, embeddings, k=1):
+    """
+    Exact top-k inner product search
+
+    Args:
+        queries: (Q, D) query embeddings
+        embeddings: (N, D) gallery embeddings
+        k: Number of neighbours to return
+
+    Returns:
+        tuple: (scores, ids) - (Q, k) arrays ordered best first
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    scores = queries @ np.asarray(embeddings, dtype=np.float32).T
+    return _top_k(scores, np.arange(scores.shape[1]), k)
+
+
+def _top_k(scores, ids, k):
+    """Select the k best columns of a score matrix, padding with id -1"""
+    num_queries, num_candidates = scores.shape
+    if num_candidates < k:
+        pad = k - num_candidates
+        scores = np.hstack([scores, np.full((num_queries, pad), -np.inf, dtype=scores.dtype)])
+        ids = np.concatenate([ids, np.full(pad, -1, dtype=np.int64)])
+
+    if k == 1:
+        top = np.argmax(scores, axis=1)[:, None]
+    else:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+
+    return np.take_along_axis(scores, top, axis=1), ids[top]
+
+
+def _remap_ids(ids, removed):
+    """Shift ids down to account for removed gallery rows"""
+    return ids - np.searchsorted(removed, ids)
+
+
+class FlatIndex:
+    """Exact search over a copy of the gallery"""
+
+    kind = "flat"
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.embeddings = np.empty((0, dim), dtype=np.float32)
+
+    @property
+    def ntotal(self):
+        return self.embeddings.shape[0]
+
+    def build(self, embeddings):
+        """Index the given gallery, replacing any previous content"""
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        return self
+
+    def add(self, embeddings):
+        """Append gallery rows; they receive ids ntotal, ntotal + 1, ..."""
+        self.embeddings = np.vstack([self.embeddings, np.asarray(embeddings, dtype=np.float32)])
+
+    def remove(self, ids):
+        """Remove gallery rows; ids of later rows shift down to stay aligned"""
+        self.embeddings = np.delete(self.embeddings, np.asarray(ids, dtype=np.int64), axis=0)
+
+    def needs_retraining(self):
+        """Exact search has nothing to train"""
+        return False
+
+    def search(self, queries, k=1):
+        """
+        Search the index
+
+        Args:
+            queries: (Q, D) query embeddings
+            k: Number of neighbours to return
+
+        Returns:
+            tuple: (scores, ids) - (Q, k) arrays ordered best first, id -1 when missing
+        """
+        return exact_search(queries, self.embeddings, k)
+
+    def save(self, path):
+        """Persist the index as an .npz archive"""
+        _save_npz(path, kind=self.kind, embeddings=self.embeddings)
+
+    @classmethod
+    def _from_archive(cls, archive):
+        index = cls(dim=archive["embeddings"].shape[1])
+        index.embeddings = archive["embeddings"]
+        return index
+
+
+class IVFIndex:
+    """Approximate inverted-file index with spherical k-means clusters"""
+
+    kind = "ivf"
+
+    def __init__(self, dim=512, nlist=None, nprobe=None):
+        self.dim = dim
+        self.nlist = nlist or Config.IVF_NLIST
+        self.nprobe = nprobe or Config.IVF_NPROBE
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.list_vectors = []
+        self.list_ids = []
+        # Gallery size the centroids were trained on
+        self.trained_size = 0
+
+    @property
+    def ntotal(self):
+        return sum(len(ids) for ids in self.list_ids)
+
+    def build(self, embeddings, iterations=10, seed=0):
+        """
+        Train the clusters on the gallery and index it
+
+        Args:
+            embeddings: (N, D) normalized gallery embeddings
+            iterations: Number of k-means iterations
+            seed: Random seed for centroid initialisation and sampling
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.centroids = self._train(embeddings, iterations, seed)
+        self.trained_size = embeddings.shape[0]
+        self.list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in self.centroids]
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in self.centroids]
+        self.add(embeddings)
+        return self
+
+    def _train(self, embeddings, iterations, seed):
+        """Run spherical k-means on a sample of the gallery"""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(self.nlist, embeddings.shape[0]))
+        if embeddings.shape[0] == 0:
+            return np.zeros((1, self.dim), dtype=np.float32)
+
+        # Train on at most 64 points per cluster
+        sample_size = min(embeddings.shape[0], nlist * 64)
+        sample = embeddings[rng.choice(embeddings.shape[0], sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+
+            # Re-seed empty clusters from random sample points
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        return centroids.astype(np.float32)
+
+    def add(self, embeddings):
+        """Append gallery rows; they receive ids ntotal, ntotal + 1, ..."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] == 0:
+            return
+
+        ids = np.arange(self.ntotal, self.ntotal + embeddings.shape[0], dtype=np.int64)
+        assign = np.argmax(embeddings @ self.centroids.T, axis=1)
+        for list_no in np.unique(assign):
+            members = assign == list_no
+            self.list_vectors[list_no] = np.vstack([self.list_vectors[list_no], embeddings[members]])
+            self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], ids[members]])
+
+    def remove(self, ids):
+        """Remove gallery rows; ids of later rows shift down to stay aligned"""
+        removed = np.unique(np.asarray(ids, dtype=np.int64))
+        if removed.size == 0:
+            return
+
+        for list_no, list_ids in enumerate(self.list_ids):
+            keep = ~np.isin(list_ids, removed)
+            self.list_vectors[list_no] = self.list_vectors[list_no][keep]
+            self.list_ids[list_no] = _remap_ids(list_ids[keep], removed)
+
+    def needs_retraining(self, growth=None, max_imbalance=None):
+        """
+        Check whether the clusters went stale as rows were added and removed
+
+        Args:
+            growth: Retrain once ntotal exceeds this factor times the size
+                at training time; defaults to Config.IVF_RETRAIN_GROWTH
+            max_imbalance: Retrain when the largest list holds more than this
+                factor times the average list size; defaults to Config.IVF_MAX_IMBALANCE
+
+        Returns:
+            bool: True if the index should be rebuilt from the gallery
+        """
+        growth = growth or Config.IVF_RETRAIN_GROWTH
+        max_imbalance = max_imbalance or Config.IVF_MAX_IMBALANCE
+        ntotal = self.ntotal
+        if ntotal > max(self.trained_size, 1) * growth:
+            return True
+
+        # Ignore imbalance while lists are too small for it to cost much
+        largest = max((len(ids) for ids in self.list_ids), default=0)
+        return largest >= 64 and largest > max_imbalance * ntotal / max(len(self.list_ids), 1)
+
+    def search(self, queries, k=1):
+        """
+        Search the `nprobe` closest clusters of each query
+
+        Args:
+            queries: (Q, D) query embeddings
+            k: Number of neighbours to return
+
+        Returns:
+            tuple: (scores, ids) - (Q, k) arrays ordered best first, id -1 when missing
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        all_scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        all_ids = np.empty((queries.shape[0], k), dtype=np.int64)
+        for q, lists in enumerate(probes):
+            vectors = np.vstack([self.list_vectors[l] for l in lists])
+            ids = np.concatenate([self.list_ids[l] for l in lists])
+            scores, top_ids = _top_k((queries[q] @ vectors.T)[None, :], ids, k)
+            all_scores[q], all_ids[q] = scores[0], top_ids[0]
+
+        return all_scores, all_ids
+
+    def save(self, path):
+        """Persist the index as an .npz archive"""
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        _save_npz(
+            path,
+            kind=self.kind,
+            trained_size=self.trained_size,
+            centroids=self.centroids,
+            sizes=sizes,
+            vectors=np.vstack(self.list_vectors) if self.list_vectors else self.centroids[:0],
+            ids=np.concatenate(self.list_ids) if self.list_ids else np.empty(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def _from_archive(cls, archive):
+        # Only the trained state is stored; nprobe is a search setting read from Config
+        centroids = archive["centroids"]
+        index = cls(dim=centroids.shape[1], nlist=len(centroids))
+        index.centroids = centroids
+        bounds = np.cumsum(archive["sizes"])[:-1]
+        index.list_vectors = np.split(archive["vectors"], bounds)
+        index.list_ids = np.split(archive["ids"], bounds)
+        # Archives written before retraining was tracked count from now
+        index.trained_size = int(archive["trained_size"]) if "trained_size" in archive else index.ntotal
+        return index
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (FlatIndex, IVFIndex)}
+
+
+def _save_npz(path, **arrays):
+    """Write an .npz archive atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def create_index(kind=None, dim=512):
+    """
+    Create an empty index of the given kind
+
+    Args:
+        kind: "flat" or "ivf"; defaults to Config.GALLERY_INDEX
+        dim: Embedding dimension
+
+    Returns:
+        FlatIndex | IVFIndex: The new index
+    """
+    kind = kind or Config.GALLERY_INDEX
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown gallery index type: {kind}")
+    return INDEX_TYPES[kind](dim=dim)
+
+
+def load_index(path):
+    """
+    Load an index saved with `save`
+
+    Returns:
+        FlatIndex | IVFIndex: The loaded index, or None if missing or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            return INDEX_TYPES[str(archive["kind"])]._from_archive(archive)
+    except Exception as e:
+        print(f"Error loading gallery index: {str(e)}")
+        return None
+
+
+def evaluate_index(index, embeddings, queries, k=1):
+    """
+    Compare an index against exact search
+
+    Args:
+        index: Index built over `embeddings`
+        embeddings: (N, D) gallery embeddings
+        queries: (Q, D) query embeddings
+        k: Number of neighbours to compare
+
+    Returns:
+        dict: recall@k and mean per-query latency (ms) for exact and indexed search
+    """
+    start = time.perf_counter()
+    _, exact_ids = exact_search(queries, embeddings, k)
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    _, index_ids = index.search(queries, k)
+    index_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = sum(len(set(a) & set(b)) for a, b in zip(exact_ids.tolist(), index_ids.tolist()))
+    return {
+        "recall": hits / exact_ids.size,
+        "exact_ms": exact_ms,
+        "index_ms": index_ms,
+    }
+
+
+def main():
+    """Print a recall-vs-latency report for the IVF index over a range of nprobe values"""
+    parser = argparse.ArgumentParser(description="Gallery index recall vs. latency report")
+    parser.add_argument("--size", type=int, default=0,
+                        help="Synthetic gallery size; 0 uses the saved gallery")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=Config.IVF_NLIST)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--k", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.size:
+        embeddings = rng.standard_normal((args.size, 512)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    else:
+        from app.services.face_service import FaceService
+        embeddings, _ = FaceService()._read_gallery()
+        if embeddings is None:
+            raise SystemExit("No saved gallery found")
+
+    # Queries are perturbed gallery rows, like new photos of enrolled people
+    picks = rng.choice(len(embeddings), args.queries)
+    queries = embeddings[picks] + 0.05 * rng.standard_normal((args.queries, embeddings.shape[1]))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+    index = IVFIndex(dim=embeddings.shape[1], nlist=args.nlist).build(embeddings)
+    print(f"gallery={len(embeddings)} nlist={len(index.centroids)} k={args.k}")
+    print(f"{'nprobe':>6} {'recall':>8} {'exact ms':>9} {'ivf ms':>8}")
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        report = evaluate_index(index, embeddings, queries, args.k)
+        print(f"{nprobe:>6} {report['recall']:>8.3f} {report['exact_ms']:>9.3f} {report['index_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
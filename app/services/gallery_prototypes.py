@@ -0,0 +1,182 @@
+"""
+Per-person prototype galleries
+
+Instead of one row per enrollment image, a prototype gallery keeps at most K
+embeddings per person: the normalized mean ("mean") or k-means centroids
+("kmeans"). Names are stored once in a table and rows refer to them through
+an int32 label array.
+"""
+
+import os
+import argparse
+import numpy as np
+from sklearn.cluster import KMeans
+
+from app.config.config import Config
+
+
+def build_prototypes(embeddings, names, k=None, method=None):
+    """
+    Compress a gallery to at most k prototypes per person
+
+    Args:
+        embeddings: (N, D) normalized gallery embeddings
+        names: List of N names
+        k: Prototypes per person; defaults to Config.PROTOTYPES_PER_PERSON
+        method: "mean" (one prototype per person) or "kmeans"; defaults to Config.GALLERY_MODE
+
+    Returns:
+        tuple: (prototypes, labels, name_table) - (M, D) float32 prototypes,
+            (M,) int32 labels indexing into name_table
+    """
+    k = k or Config.PROTOTYPES_PER_PERSON
+    method = method or Config.GALLERY_MODE
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+
+    name_table, row_labels = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+    prototypes, labels = [], []
+
+    for label in range(len(name_table)):
+        rows = embeddings[row_labels == label]
+
+        if method == "mean":
+            centers = rows.mean(axis=0, keepdims=True)
+        elif len(rows) <= k:
+            centers = rows
+        else:
+            centers = KMeans(n_clusters=k, n_init=4, random_state=0).fit(rows).cluster_centers_
+
+        centers = centers / np.maximum(np.linalg.norm(centers, axis=1, keepdims=True), 1e-12)
+        prototypes.append(centers.astype(np.float32))
+        labels.extend([label] * len(centers))
+
+    if not prototypes:
+        return np.empty((0, embeddings.shape[1]), dtype=np.float32), np.empty(0, dtype=np.int32), []
+
+    return np.vstack(prototypes), np.asarray(labels, dtype=np.int32), name_table.tolist()
+
+
+def save_prototypes(path, prototypes, labels, name_table, source_rows):
+    """
+    Save a prototype gallery
+
+    Args:
+        path: Destination .npz file
+        prototypes: (M, D) prototype embeddings
+        labels: (M,) int32 labels
+        name_table: List of person names
+        source_rows: Size of the full gallery the prototypes were built from
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        method=Config.GALLERY_MODE,
+        k=Config.PROTOTYPES_PER_PERSON,
+        prototypes=prototypes,
+        labels=labels,
+        names=np.asarray(name_table, dtype=str),
+        source_rows=source_rows,
+    )
+    os.replace(tmp_path, path)
+
+
+def load_prototypes(path, source_rows):
+    """
+    Load a prototype gallery if it was built with the current settings from
+    a full gallery of `source_rows` rows
+
+    Returns:
+        tuple: (prototypes, labels, name_table), or None if missing or stale
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as archive:
+            if (str(archive["method"]) != Config.GALLERY_MODE
+                    or int(archive["k"]) != Config.PROTOTYPES_PER_PERSON
+                    or int(archive["source_rows"]) != source_rows):
+                return None
+            return archive["prototypes"], archive["labels"], archive["names"].tolist()
+    except Exception as e:
+        print(f"Error loading prototypes: {str(e)}")
+        return None
+
+
+def _accuracy(queries, true_names, gallery, gallery_names):
+    """Top-1 identification accuracy with the recognition threshold applied"""
+    if len(queries) == 0 or len(gallery) == 0:
+        return 0.0
+    scores = queries @ gallery.T
+    best = np.argmax(scores, axis=1)
+    predicted = [gallery_names[i] if scores[q, i] > Config.RECOGNITION_THRESHOLD else 'Unknown'
+                 for q, i in enumerate(best)]
+    return float(np.mean([p == t for p, t in zip(predicted, true_names)]))
+
+
+def evaluate_prototypes(embeddings, names, ks=(1, 2, 3, 5), folds=5):
+    """
+    Compare prototype galleries with the full gallery by cross-validation.
+
+    Each fold holds out every `folds`-th enrollment image, builds the gallery
+    from the rest and identifies the held-out images.
+
+    Args:
+        embeddings: (N, D) full gallery embeddings
+        names: List of N names
+        ks: Prototype counts to evaluate with k-means ("mean" is always included)
+        folds: Number of folds
+
+    Returns:
+        list: Dicts with mode, k, accuracy and average gallery rows
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    names = np.asarray(names, dtype=str)
+    settings = [("full", None), ("mean", 1)] + [("kmeans", k) for k in ks]
+    results = {setting: {"accuracy": [], "rows": []} for setting in settings}
+
+    for fold in range(folds):
+        test = np.arange(len(names)) % folds == fold
+        if not test.any() or test.all():
+            continue
+
+        for mode, k in settings:
+            if mode == "full":
+                gallery, gallery_names = embeddings[~test], names[~test].tolist()
+            else:
+                gallery, labels, table = build_prototypes(embeddings[~test], names[~test], k, mode)
+                gallery_names = [table[label] for label in labels]
+
+            results[(mode, k)]["accuracy"].append(
+                _accuracy(embeddings[test], names[test].tolist(), gallery, gallery_names)
+            )
+            results[(mode, k)]["rows"].append(len(gallery))
+
+    return [
+        {"mode": mode, "k": k,
+         "accuracy": float(np.mean(r["accuracy"])) if r["accuracy"] else 0.0,
+         "rows": float(np.mean(r["rows"])) if r["rows"] else 0.0}
+        for (mode, k), r in results.items()
+    ]
+
+
+def main():
+    """Print prototype gallery accuracy against the full saved gallery"""
+    parser = argparse.ArgumentParser(description="Prototype gallery accuracy report")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 2, 3, 5])
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.services.face_service import FaceService
+    embeddings, names = FaceService()._read_gallery()
+    if embeddings is None:
+        raise SystemExit("No saved gallery found")
+
+    print(f"{'mode':>6} {'k':>3} {'rows':>8} {'accuracy':>9}")
+    for result in evaluate_prototypes(embeddings, names, args.k, args.folds):
+        k = result["k"] if result["k"] is not None else "-"
+        print(f"{result['mode']:>6} {k:>3} {result['rows']:>8.1f} {result['accuracy']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
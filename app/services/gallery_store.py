@@ -0,0 +1,257 @@
+"""
+Memory-mapped, versioned on-disk gallery
+
+Every recognition model has its own directory under Config.GALLERY_DIR,
+laid out as:
+
+    header.json             format, model ID, dimension, dtype, row count,
+                            version, names table and data file names
+    embeddings.v<N>.bin     (count, dim) raw float32 or float16 embeddings
+    labels.v<N>.bin         (count,) raw int32 indexes into the names table
+
+Data files are written under a new version number and the header is replaced
+last with os.replace, so readers always see a complete gallery. The data
+files of the previous version are kept until the next write, for readers
+that opened the old header just before the swap. Embeddings are opened with
+np.memmap, so every process shares the page-cached file.
+"""
+
+import os
+import json
+import pickle
+from collections.abc import Sequence
+
+import numpy as np
+
+from app.config.config import Config
+
+FORMAT_VERSION = 1
+HEADER_NAME = "header.json"
+EMBEDDING_DIM = 512  # dimension recorded for a gallery written without rows
+
+
+def current_model_id():
+    """ID of the recognition model selected by Config.MODEL_PRECISION, read at call time"""
+    path = Config.REC_MODEL_INT8_PATH if Config.MODEL_PRECISION == "int8" else Config.REC_MODEL_PATH
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class RowNames(Sequence):
+    """
+    Read-only list of the name of every gallery row, looked up from the
+    int32 labels and the names table instead of being expanded into a
+    Python list of one string per row
+    """
+
+    def __init__(self, labels, names):
+        self.labels = labels
+        self.names = names
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.names[label] for label in self.labels[i]]
+        return self.names[self.labels[i]]
+
+    def __iter__(self):
+        return (self.names[label] for label in self.labels)
+
+
+class GalleryStore:
+    def __init__(self, directory=None, model_id=None, dtype=None):
+        """
+        Initialize the store
+
+        Args:
+            directory: Gallery directory; defaults to the model's
+                subdirectory of Config.GALLERY_DIR
+            model_id: ID of the recognition model the embeddings come from;
+                defaults to current_model_id() whenever the store is used
+            dtype: On-disk embedding dtype, "float32" or "float16"
+        """
+        self._directory = directory
+        self._model_id = model_id
+        self.dtype = np.dtype(dtype or Config.GALLERY_DTYPE)
+
+    @property
+    def model_id(self):
+        return self._model_id or current_model_id()
+
+    @property
+    def directory(self):
+        return str(self._directory or os.path.join(Config.GALLERY_DIR, self.model_id))
+
+    @property
+    def header_path(self):
+        return os.path.join(self.directory, HEADER_NAME)
+
+    def exists(self):
+        """Check whether a gallery has been written"""
+        return os.path.exists(self.header_path)
+
+    def read_header(self):
+        """
+        Read the gallery header
+
+        Returns:
+            dict: The header, or None if missing, unreadable or built with another model
+        """
+        header = self._read_any_header()
+        if header is None or header.get("model_id") != self.model_id:
+            return None
+        return header
+
+    def _read_any_header(self):
+        """Read the header whichever model wrote it, or None if missing or unreadable"""
+        try:
+            with open(self.header_path, 'r') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return header if header.get("format") == FORMAT_VERSION else None
+
+    def read(self):
+        """
+        Open the gallery without copying it into memory
+
+        Returns:
+            tuple: (embeddings, labels, names) - read-only memmaps of shape
+                (count, dim) and (count,) plus the names table, or None if missing
+        """
+        header = self.read_header()
+        if header is None:
+            return None
+
+        count, dim = header["count"], header["dim"]
+        if count == 0:
+            return (np.empty((0, dim), dtype=header["dtype"]),
+                    np.empty(0, dtype=np.int32), header["names"])
+
+        embeddings = np.memmap(os.path.join(self.directory, header["embeddings_file"]),
+                               dtype=header["dtype"], mode='r', shape=(count, dim))
+        labels = np.memmap(os.path.join(self.directory, header["labels_file"]),
+                           dtype=np.int32, mode='r', shape=(count,))
+        return embeddings, labels, header["names"]
+
+    def write(self, embeddings, labels, names):
+        """
+        Atomically replace the gallery
+
+        Args:
+            embeddings: (count, dim) embeddings
+            labels: (count,) indexes into names
+            names: Names table
+
+        Returns:
+            int: Version of the written gallery
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=self.dtype)
+        labels = np.ascontiguousarray(labels, dtype=np.int32)
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Versions keep counting across models, so no data file name is reused
+        previous = self._read_any_header()
+        version = (previous["version"] if previous else 0) + 1
+        header = {
+            "format": FORMAT_VERSION,
+            "model_id": self.model_id,
+            "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 else EMBEDDING_DIM,
+            "dtype": self.dtype.name,
+            "count": int(embeddings.shape[0]),
+            "version": version,
+            "names": list(names),
+            "embeddings_file": f"embeddings.v{version}.bin",
+            "labels_file": f"labels.v{version}.bin",
+        }
+
+        # Data files first, header last: the header rename publishes the version
+        self._write_file(header["embeddings_file"], embeddings.tobytes())
+        self._write_file(header["labels_file"], labels.tobytes())
+        self._write_file(HEADER_NAME, json.dumps(header).encode("utf-8"))
+
+        self._remove_old_versions(header, previous)
+        return version
+
+    def read_gallery(self):
+        """
+        Read the gallery in the (known_embeddings, known_names) form used for matching
+
+        Returns:
+            tuple: (known_embeddings, known_names) with the names as RowNames,
+                or (None, None) if missing
+        """
+        gallery = self.read()
+        if gallery is None:
+            return None, None
+
+        embeddings, labels, names = gallery
+        return embeddings, RowNames(labels, names)
+
+    def write_gallery(self, known_embeddings, known_names):
+        """
+        Write a gallery given as one name per row
+
+        Returns:
+            int: Version of the written gallery
+        """
+        if isinstance(known_names, RowNames):
+            names, labels = known_names.names, known_names.labels
+        else:
+            names = sorted(set(known_names))
+            index = {name: i for i, name in enumerate(names)}
+            labels = np.array([index[name] for name in known_names], dtype=np.int32)
+
+        # An empty gallery may come as a flat empty array or list
+        embeddings = np.asarray(known_embeddings)
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else EMBEDDING_DIM
+        return self.write(embeddings.reshape(len(labels), dim), labels, names)
+
+    def migrate_legacy(self, embeddings_path, names_path):
+        """
+        Import a gallery saved as known_embeddings.npy + known_names.pkl
+
+        Returns:
+            bool: True if a legacy gallery was imported
+        """
+        if self.exists() or not (os.path.exists(embeddings_path) and os.path.exists(names_path)):
+            return False
+
+        try:
+            known_embeddings = np.load(embeddings_path)
+            with open(names_path, 'rb') as f:
+                known_names = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading legacy embeddings: {str(e)}")
+            return False
+
+        self.write_gallery(known_embeddings, known_names)
+        return True
+
+    def _write_file(self, name, data):
+        """Write a file next to its destination, then rename it into place"""
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove_old_versions(self, header, previous=None):
+        """
+        Delete data files older than the previous version. Open memmaps keep
+        working on POSIX; the previous version is kept for readers that read
+        its header before the swap and have not opened its files yet.
+        """
+        current = {HEADER_NAME, header["embeddings_file"], header["labels_file"]}
+        if previous is not None:
+            current.update((previous["embeddings_file"], previous["labels_file"]))
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin") and name not in current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # Still mapped by a reader on platforms that lock open files
+                    pass
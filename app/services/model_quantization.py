@@ -0,0 +1,180 @@
+"""
+INT8 dynamic quantization of the detection and recognition models
+
+Usage:
+    python -m app.services.model_quantization            # quantize, then compare
+    python -m app.services.model_quantization --compare  # compare existing files
+
+Weights are quantized to 8 bits ahead of time and activations at run time,
+so no calibration data is needed. The comparison runs the FP32 and INT8
+models over the dataset images and reports detection recall against FP32,
+embedding agreement, leave-one-out identification accuracy and latency.
+Set Config.MODEL_PRECISION = "int8" to use the quantized models.
+"""
+
+import os
+import time
+import argparse
+from glob import glob
+
+import cv2
+import numpy as np
+
+from app.config.config import Config
+
+DEFAULT_OP_TYPES = ["Conv", "MatMul", "Gemm"]
+
+
+def quantize_model(src_path, dst_path, op_types=None, per_channel=True, preprocess=False):
+    """
+    Write a dynamically quantized INT8 copy of an ONNX model
+
+    Args:
+        src_path: FP32 model file
+        dst_path: Output file
+        op_types: Operator types to quantize; defaults to DEFAULT_OP_TYPES
+        per_channel: Quantize weights per output channel, which keeps
+            convolution accuracy much closer to FP32
+        preprocess: Run shape inference and graph optimization first. This can
+            rename the leading Sub/Mul nodes that insightface inspects to pick
+            the input normalization, so check the comparison before using it.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    src = src_path
+    tmp_path = None
+    if preprocess:
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+        tmp_path = f"{dst_path}.pre.onnx"
+        quant_pre_process(src_path, tmp_path)
+        src = tmp_path
+
+    try:
+        quantize_dynamic(src, dst_path, op_types_to_quantize=op_types or DEFAULT_OP_TYPES,
+                         per_channel=per_channel, weight_type=QuantType.QUInt8)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return dst_path
+
+
+def _accuracy(embeddings, names):
+    """Leave-one-out nearest neighbour accuracy over people with several images"""
+    names = np.asarray(names)
+    sims = embeddings @ embeddings.T
+    np.fill_diagonal(sims, -np.inf)
+    nearest = sims.argmax(axis=1)
+    counts = {name: int((names == name).sum()) for name in set(names.tolist())}
+    testable = np.array([counts[name] > 1 for name in names.tolist()])
+    if not testable.any():
+        return None
+    return float((names[nearest] == names)[testable].mean())
+
+
+def _run(face_service, images, crops=None):
+    """Detect the enrollment face in each image and embed the crops, timing both"""
+    faces, det_time = [], 0.0
+    for img in images:
+        start = time.perf_counter()
+        faces.append(face_service._detect_enrollment_face(img))
+        det_time += time.perf_counter() - start
+
+    if crops is None:
+        crops = [face_service.align_face(img, face) for img, face in zip(images, faces) if face is not None]
+
+    start = time.perf_counter()
+    embeddings = face_service.embed_crops(crops)
+    rec_time = time.perf_counter() - start
+    return faces, crops, embeddings, det_time, rec_time
+
+
+def compare_models(images, names):
+    """
+    Compare the FP32 and INT8 models on enrollment images
+
+    Recognition is compared on the same aligned crops (from FP32 detections),
+    so the embedding metrics only reflect the recognition model.
+
+    Args:
+        images: List of BGR images
+        names: Person name of each image
+
+    Returns:
+        dict: fp32 and int8 reports with det_ms, rec_ms per image and face,
+            found and accuracy, plus det_recall and the mean/min cosine
+            similarity between FP32 and INT8 embeddings
+    """
+    from app.services.face_service import FaceService
+    from app.services.face_tracker import iou_matrix
+
+    fp32, int8 = FaceService(), FaceService()
+    fp32.load_models(precision="fp32")
+    int8.load_models(precision="int8")
+
+    fp32_faces, crops, fp32_emb, fp32_det, fp32_rec = _run(fp32, images)
+    int8_faces, _, int8_emb, int8_det, int8_rec = _run(int8, images, crops)
+    face_names = [name for name, face in zip(names, fp32_faces) if face is not None]
+
+    hits = sum(1 for a, b in zip(fp32_faces, int8_faces)
+               if a is not None and b is not None and iou_matrix([a.bbox], [b.bbox])[0, 0] >= 0.5)
+    cosine = (fp32_emb * int8_emb).sum(axis=1) if len(crops) else np.ones(1)
+
+    def report(faces, embeddings, det_time, rec_time):
+        return {
+            "det_ms": det_time * 1000 / len(images),
+            "rec_ms": rec_time * 1000 / max(1, len(crops)),
+            "found": sum(1 for face in faces if face is not None) / len(images),
+            "accuracy": _accuracy(embeddings, face_names),
+        }
+
+    return {
+        "fp32": report(fp32_faces, fp32_emb, fp32_det, fp32_rec),
+        "int8": report(int8_faces, int8_emb, int8_det, int8_rec),
+        "det_recall": hits / max(1, len(crops)),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+    }
+
+
+def main():
+    """Quantize the models and print an FP32 vs INT8 comparison on the dataset"""
+    parser = argparse.ArgumentParser(description="INT8 dynamic quantization of the face models")
+    parser.add_argument("--compare", action="store_true", help="Only compare already quantized models")
+    parser.add_argument("--op-types", nargs="+", default=DEFAULT_OP_TYPES, help="Operator types to quantize")
+    parser.add_argument("--per-tensor", action="store_true", help="Quantize weights per tensor")
+    parser.add_argument("--preprocess", action="store_true", help="Run quantization pre-processing first")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of images; 0 uses all")
+    args = parser.parse_args()
+
+    if not args.compare:
+        for src, dst in ((Config.DET_MODEL_PATH, Config.DET_MODEL_INT8_PATH),
+                         (Config.REC_MODEL_PATH, Config.REC_MODEL_INT8_PATH)):
+            quantize_model(src, dst, args.op_types, not args.per_tensor, args.preprocess)
+            print(f"{os.path.basename(src)}: {os.path.getsize(src) / 2**20:.1f} MB -> "
+                  f"{os.path.basename(dst)}: {os.path.getsize(dst) / 2**20:.1f} MB")
+
+    img_paths = sorted(p for ext in ("jpg", "jpeg", "png")
+                       for p in glob(os.path.join(str(Config.DATASET_PATH), "*", f"*.{ext}")))
+    if args.limit:
+        img_paths = img_paths[:args.limit]
+    loaded = [(cv2.imread(p), os.path.basename(os.path.dirname(p))) for p in img_paths]
+    loaded = [(img, name) for img, name in loaded if img is not None]
+    if not loaded:
+        raise SystemExit(f"No images found in {Config.DATASET_PATH}")
+
+    images, names = zip(*loaded)
+    report = compare_models(list(images), list(names))
+
+    print(f"\nimages={len(images)} people={len(set(names))}")
+    print(f"{'model':>6} {'det ms':>8} {'rec ms':>8} {'found':>6} {'accuracy':>9}")
+    for precision in ("fp32", "int8"):
+        r = report[precision]
+        accuracy = "n/a" if r["accuracy"] is None else f"{r['accuracy']:.3f}"
+        print(f"{precision:>6} {r['det_ms']:>8.2f} {r['rec_ms']:>8.2f} {r['found']:>6.3f} {accuracy:>9}")
+    print(f"INT8 detection recall vs FP32: {report['det_recall']:.3f}")
+    print(f"FP32/INT8 embedding cosine: mean {report['cosine_mean']:.4f}, min {report['cosine_min']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
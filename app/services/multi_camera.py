@@ -0,0 +1,292 @@
+"""
+Multi-camera capture feeding a shared pool of inference workers
+"""
+
+import threading
+import time
+from collections import deque
+
+from app.config.config import Config
+from app.services.face_tracker import FaceTracker
+from app.utils.frame_buffers import FramePool
+from app.utils.metrics import metrics
+from app.utils.video_utils import get_video_capture
+
+
+class CameraSource:
+    """Capture state and counters of one camera"""
+
+    def __init__(self, index, source, priority=0):
+        self.index = index
+        self.source = source
+        self.priority = priority
+        self.frames = deque()
+        self.cap = None
+        self.thread = None
+        self.busy = False
+        self.tracker = FaceTracker() if Config.TRACKING_ENABLED else None
+        # Set when the gallery is swapped; the worker holding the camera resets the tracker
+        self.gallery_changed = False
+        self.pool = FramePool()
+
+        self.captured_frames = 0
+        self.processed_frames = 0
+        self.dropped_frames = 0
+        self.processed_times = deque(maxlen=30)
+        self.error = None
+
+
+class MultiCameraPipeline:
+    """
+    Captures from several cameras and recognizes faces on a shared worker pool.
+
+    Every camera has a capture thread filling a short buffer that drops its
+    oldest frame when full. Workers take the next frame either round-robin
+    over the cameras or by camera priority. A camera is handled by one worker
+    at a time, so its tracker sees frames in order. Recognitions from all
+    cameras are merged into one stream of observations keyed by
+    (camera, track), for voting into a single session's attendance. They
+    are stamped with the capture time on one clock, so the vote window is
+    the same for fast and slow cameras. Each
+    camera captures into its own recycled frame buffers, which the consumer
+    hands back with `release`.
+    """
+
+    def __init__(self, face_service, known_embeddings, known_names, sources=None,
+                 num_workers=None, priorities=None, queue_size=None, capture_factory=get_video_capture):
+        """
+        Initialize the pipeline
+
+        Args:
+            face_service: FaceService shared by the workers
+            known_embeddings: Array of known embeddings
+            known_names: List of corresponding names
+            sources: Camera indices, file paths or URLs; defaults to Config.CAMERA_SOURCES
+            num_workers: Number of inference threads; defaults to Config.INFERENCE_WORKERS
+            priorities: Optional per-source priorities; defaults to Config.CAMERA_PRIORITIES
+            queue_size: Frames buffered per camera; defaults to Config.CAMERA_QUEUE_SIZE
+            capture_factory: Callable(source) returning a cv2.VideoCapture
+        """
+        sources = Config.CAMERA_SOURCES if sources is None else sources
+        priorities = priorities if priorities is not None else Config.CAMERA_PRIORITIES
+        self.use_priorities = priorities is not None
+        priorities = priorities or [0] * len(sources)
+
+        self.face_service = face_service
+        self.gallery = (known_embeddings, known_names)
+        self.capture_factory = capture_factory
+        self.num_workers = num_workers or Config.INFERENCE_WORKERS
+        self.queue_size = queue_size or Config.CAMERA_QUEUE_SIZE
+        self.sources = [CameraSource(i, source, priority)
+                        for i, (source, priority) in enumerate(zip(sources, priorities))]
+
+        self.condition = threading.Condition()
+        self.running = threading.Event()
+        self.threads = []
+        self.next_source = 0
+        self.error = None
+
+        # Results not yet collected by the consumer
+        self.latest_frames = {}
+        self.observations = []
+        self.has_results = False
+
+    def start(self):
+        """
+        Open all cameras and start capture and worker threads
+
+        Returns:
+            bool: True if at least one camera could be opened
+        """
+        for source in self.sources:
+            source.cap = self.capture_factory(source.source)
+            if not source.cap.isOpened():
+                source.cap.release()
+                source.cap = None
+                source.error = f"Unable to open camera {source.source}"
+
+        active = [source for source in self.sources if source.cap is not None]
+        if not active:
+            return False
+
+        self.running.set()
+        for source in active:
+            source.thread = threading.Thread(target=self._capture_loop, args=(source, source.cap),
+                                             name=f"capture-{source.index}", daemon=True)
+            self.threads.append(source.thread)
+        for i in range(self.num_workers):
+            self.threads.append(threading.Thread(target=self._worker_loop, name=f"inference-{i}", daemon=True))
+
+        for thread in self.threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        """Stop all threads; each capture thread releases its camera once its last read returns"""
+        self.running.clear()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+            if thread.is_alive():
+                print(f"Thread {thread.name} did not stop in time; it exits after its current step")
+        self.threads = []
+        for source in self.sources:
+            source.cap = None
+
+    @property
+    def is_running(self):
+        return self.running.is_set()
+
+    def update_gallery(self, known_embeddings, known_names):
+        """Swap the gallery used for recognition and forget tracked identities"""
+        with self.condition:
+            self.gallery = (known_embeddings, known_names)
+            for source in self.sources:
+                source.gallery_changed = True
+
+    def get_result(self, timeout=1.0):
+        """
+        Wait for results from any camera
+
+        Args:
+            timeout: Seconds to wait
+
+        Returns:
+            tuple: (frames, observations) - the latest processed frame per
+                camera index, and (timestamp, (camera, track_id), name, score)
+                observations since the previous call, where the timestamp is
+                the time.monotonic() capture time; None if nothing arrived
+        """
+        with self.condition:
+            if not self.has_results:
+                self.condition.wait_for(lambda: self.has_results or not self.running.is_set(), timeout)
+            if not self.has_results:
+                return None
+
+            frames, observations = self.latest_frames, self.observations
+            self.latest_frames, self.observations, self.has_results = {}, [], False
+            return frames, observations
+
+    def release(self, frame, source_index):
+        """Hand a frame returned by get_result back to its camera for reuse"""
+        self.sources[source_index].pool.release(frame)
+
+    def stats(self):
+        """
+        Per-camera throughput and buffering
+
+        Returns:
+            list: Dicts with source, fps, queue_depth, captured, processed and dropped
+        """
+        with self.condition:
+            report = []
+            for source in self.sources:
+                times = source.processed_times
+                fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+                report.append({
+                    "source": str(source.source),
+                    "fps": fps,
+                    "queue_depth": len(source.frames),
+                    "captured": source.captured_frames,
+                    "processed": source.processed_frames,
+                    "dropped": source.dropped_frames,
+                    "error": source.error,
+                })
+            return report
+
+    def _capture_loop(self, source, cap):
+        """Read frames from one camera into its bounded buffer, and release the camera on exit"""
+        camera = str(source.index)
+        try:
+            while self.running.is_set():
+                with metrics.timer("capture_read", camera=camera):
+                    ret, frame = source.pool.read(cap)
+                with self.condition:
+                    if not ret:
+                        source.error = f"Failed to grab frame from camera {source.source}"
+                        break
+
+                    if len(source.frames) >= self.queue_size:
+                        _, dropped_frame = source.frames.popleft()
+                        source.pool.release(dropped_frame)
+                        source.dropped_frames += 1
+                        metrics.inc("frames_dropped_total", camera=camera)
+                    source.frames.append((time.monotonic(), frame))
+                    source.captured_frames += 1
+                    metrics.set_gauge("queue_depth", len(source.frames), queue=f"camera_{camera}")
+                    self.condition.notify()
+        finally:
+            # No read is running anymore, so the camera can be released
+            cap.release()
+
+        # Stop the pipeline once no camera is left
+        with self.condition:
+            source.thread = None
+            if all(s.thread is None or s.error for s in self.sources):
+                self.error = "; ".join(s.error for s in self.sources if s.error) or None
+                self.running.clear()
+                self.condition.notify_all()
+
+    def _next_source(self):
+        """Pick the next camera with a buffered frame that no worker is handling"""
+        ready = [source for source in self.sources if source.frames and not source.busy]
+        if not ready:
+            return None
+
+        if self.use_priorities:
+            top = max(source.priority for source in ready)
+            ready = [source for source in ready if source.priority == top]
+
+        # Round-robin among the candidates, starting after the last camera served
+        source = min(ready, key=lambda s: (s.index - self.next_source) % len(self.sources))
+        self.next_source = source.index + 1
+        return source
+
+    def _worker_loop(self):
+        """Recognize faces in frames from any camera"""
+        while self.running.is_set():
+            with self.condition:
+                source = None
+                while self.running.is_set():
+                    source = self._next_source()
+                    if source is not None:
+                        break
+                    self.condition.wait(timeout=0.1)
+                if source is None:
+                    break
+
+                captured_at, frame = source.frames.popleft()
+                source.busy = True
+                known_embeddings, known_names = self.gallery
+                gallery_changed, source.gallery_changed = source.gallery_changed, False
+
+            # Only the worker that marked the camera busy touches its tracker
+            if gallery_changed and source.tracker is not None:
+                source.tracker.reset()
+
+            try:
+                faces = self.face_service.recognize_frame(frame, known_embeddings, known_names, source.tracker)
+                with metrics.timer("draw"):
+                    processed_frame = self.face_service.draw_faces(frame, faces)
+            except Exception as e:
+                with self.condition:
+                    source.busy = False
+                    self.error = f"Face recognition failed: {str(e)}"
+                    self.running.clear()
+                    self.condition.notify_all()
+                break
+
+            with self.condition:
+                source.busy = False
+                source.processed_frames += 1
+                source.processed_times.append(time.perf_counter())
+                source.pool.release(self.latest_frames.get(source.index))
+                self.latest_frames[source.index] = processed_frame
+                self.observations.extend(
+                    (captured_at, None if face.track_id is None else (source.index, face.track_id),
+                     face.name, face.score)
+                    for face in faces if face.recognized_now
+                )
+                self.has_results = True
+                self.condition.notify_all()
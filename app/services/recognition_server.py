@@ -0,0 +1,381 @@
+"""
+Headless recognition server for edge devices
+
+Usage:
+    python -m app.services.recognition_server [--host 0.0.0.0] [--port 8600]
+
+A small asyncio HTTP/1.1 server (keep-alive, no chunked uploads) wrapping
+FaceService:
+
+    POST /v1/recognize          body: one JPEG frame
+    POST /v1/recognize/batch    body: {"frames": [base64 JPEG, ...]}
+    POST /v1/identify           body: {"faces": [base64 JPEG face crop, ...]}
+    POST /v1/reload             reload the gallery after enrollment
+    GET  /healthz               liveness and gallery size
+    GET  /metrics               Prometheus metrics, see app.utils.metrics
+
+Frames are answered with {"faces": [{"box", "det_score", "name", "score"}]}
+(one such object per frame for batches). Face crops that are already
+aligned to the recognition input size (112x112) are embedded as they are,
+other crops are aligned first.
+
+Decoding and detection run on a thread pool. Aligned faces from all
+in-flight requests are collected into shared recognition batches of up to
+Config.REC_BATCH_SIZE, waiting at most Config.SERVER_BATCH_DELAY_MS for a
+batch to fill. Requests beyond Config.SERVER_MAX_CONCURRENCY are answered
+with 503 right away instead of queueing.
+"""
+
+import json
+import base64
+import asyncio
+import argparse
+import binascii
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import cv2
+import numpy as np
+
+from app.config.config import Config
+from app.services.face_service import FaceService
+from app.utils.metrics import metrics
+
+
+class RequestError(Exception):
+    """Error answered to the client with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Groups aligned faces from concurrent requests into recognition batches.
+
+    A batch runs as soon as `max_batch` faces are waiting, or `max_delay`
+    seconds after the first face of a partial batch arrived.
+    """
+
+    def __init__(self, face_service, executor, gallery, max_batch=None, max_delay=None):
+        """
+        Initialize the batcher
+
+        Args:
+            face_service: FaceService with loaded models
+            executor: Executor the recognition model runs on
+            gallery: Callable returning the current (known_embeddings, known_names)
+            max_batch: Faces per recognition batch; defaults to Config.REC_BATCH_SIZE
+            max_delay: Seconds to wait for a partial batch; defaults to Config.SERVER_BATCH_DELAY_MS
+        """
+        self.face_service = face_service
+        self.executor = executor
+        self.gallery = gallery
+        self.max_batch = max(1, max_batch or Config.REC_BATCH_SIZE)
+        self.max_delay = (max_delay if max_delay is not None else Config.SERVER_BATCH_DELAY_MS) / 1000
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+
+    async def identify(self, crops):
+        """
+        Identify aligned faces
+
+        Args:
+            crops: Aligned BGR face crops
+
+        Returns:
+            list: (name, score) per crop
+        """
+        if not crops:
+            return []
+
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in crops]
+        self.pending.extend(zip(crops, futures))
+
+        if len(self.pending) >= self.max_batch:
+            self._flush(partial=False)
+        if self.pending and self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self._flush)
+
+        return await asyncio.gather(*futures)
+
+    def _flush(self, partial=True):
+        """Start full batches, and the remaining partial batch when `partial` is set"""
+        if partial and self.timer is not None:
+            self.timer.cancel()
+        if partial:
+            self.timer = None
+
+        while len(self.pending) >= self.max_batch or (partial and self.pending):
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            # The event loop only keeps weak references to tasks
+            task = asyncio.ensure_future(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        known_embeddings, known_names = self.gallery()
+        metrics.observe("server_batch_faces", len(batch), (1, 2, 4, 8, 16, 32, 64))
+
+        error = None
+        try:
+            matches = await loop.run_in_executor(
+                self.executor, self._recognize, [crop for crop, _ in batch], known_embeddings, known_names
+            )
+            for (_, future), candidates in zip(batch, matches):
+                if not future.done():
+                    future.set_result(candidates[0] if candidates else ('Unknown', 0.0))
+        except asyncio.CancelledError as e:
+            error = e
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            # Never leave a request waiting, whatever happened above
+            for _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(('Unknown', 0.0))
+                elif isinstance(error, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+    def _recognize(self, crops, known_embeddings, known_names):
+        embeddings = self.face_service.embed_crops(crops)
+        return self.face_service.match_faces(embeddings, known_embeddings, known_names)
+
+
+class RecognitionServer:
+    """Routes HTTP requests to detection on a thread pool and the micro-batcher"""
+
+    def __init__(self, face_service, num_workers=None, max_concurrency=None, max_body_mb=None):
+        self.face_service = face_service
+        self.gallery = face_service.load_embeddings()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers or Config.SERVER_WORKERS,
+                                           thread_name_prefix="recognition")
+        self.batcher = MicroBatcher(face_service, self.executor, lambda: self.gallery)
+        self.max_concurrency = max_concurrency or Config.SERVER_MAX_CONCURRENCY
+        self.max_body = int((max_body_mb or Config.SERVER_MAX_BODY_MB) * 2**20)
+        self.in_flight = 0
+
+        self.routes = {
+            ("POST", "/v1/recognize"): self.recognize,
+            ("POST", "/v1/recognize/batch"): self.recognize_batch,
+            ("POST", "/v1/identify"): self.identify,
+            ("POST", "/v1/reload"): self.reload,
+            ("GET", "/healthz"): self.health,
+        }
+
+    async def serve(self, host=None, port=None):
+        """Accept connections until cancelled"""
+        server = await asyncio.start_server(self.handle_connection, host or Config.SERVER_HOST,
+                                            port or Config.SERVER_PORT)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Recognition server listening on {addresses}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, content_type, body = await self.handle_request(method, target, headers, reader)
+                if status in (HTTPStatus.LENGTH_REQUIRED, HTTPStatus.REQUEST_ENTITY_TOO_LARGE):
+                    # The unread body is still on the connection
+                    keep_alive = False
+
+                head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+                if status == HTTPStatus.SERVICE_UNAVAILABLE:
+                    head += "Retry-After: 1\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, method, target, headers, reader):
+        """
+        Read the body and dispatch one request
+
+        Returns:
+            tuple: (HTTPStatus, content type, body bytes)
+        """
+        path = target.split("?", 1)[0]
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return _error(HTTPStatus.LENGTH_REQUIRED, "Chunked uploads are not supported")
+        length = int(headers.get("content-length") or 0)
+        if length > self.max_body:
+            return _error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        if (method, path) == ("GET", "/metrics"):
+            return HTTPStatus.OK, "text/plain; version=0.0.4", metrics.render_prometheus().encode("utf-8")
+
+        handler = self.routes.get((method, path))
+        if handler is None:
+            return _error(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+        # Shed load instead of queueing behind a saturated pool
+        if self.in_flight >= self.max_concurrency:
+            metrics.inc("server_rejected_total")
+            return _error(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy")
+
+        self.in_flight += 1
+        metrics.set_gauge("queue_depth", self.in_flight, queue="server_requests")
+        try:
+            with metrics.timer("server_request", endpoint=path):
+                result = await handler(body)
+            return HTTPStatus.OK, "application/json", json.dumps(result).encode("utf-8")
+        except RequestError as e:
+            return _error(e.status, str(e))
+        except Exception as e:
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Recognition failed: {str(e)}")
+        finally:
+            self.in_flight -= 1
+            metrics.set_gauge("queue_depth", self.in_flight, queue="server_requests")
+
+    async def recognize(self, body):
+        return (await self._recognize_frames([body]))[0]
+
+    async def recognize_batch(self, body):
+        return {"results": await self._recognize_frames(_decode_images(body, "frames"))}
+
+    async def identify(self, body):
+        """Identify pre-cropped faces, aligning crops that are not aligned yet"""
+        loop = asyncio.get_running_loop()
+        crops = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, self._align_crop, data)
+            for data in _decode_images(body, "faces")
+        ))
+
+        found = [crop for crop in crops if crop is not None]
+        matches = iter(await self.batcher.identify(found))
+        faces = []
+        for crop in crops:
+            if crop is None:
+                faces.append({"name": "Unknown", "score": 0.0, "error": "No face found"})
+            else:
+                name, score = next(matches)
+                faces.append({"name": name, "score": score})
+        return {"faces": faces}
+
+    async def reload(self, body):
+        """Reload the gallery, e.g. after people were enrolled"""
+        loop = asyncio.get_running_loop()
+        self.gallery = await loop.run_in_executor(self.executor, self.face_service.load_embeddings)
+        return await self.health(body)
+
+    async def health(self, body):
+        known_embeddings, known_names = self.gallery
+        return {"status": "ok", "gallery_size": 0 if known_names is None else len(known_names),
+                "in_flight": self.in_flight}
+
+    async def _recognize_frames(self, frames):
+        """Detect on the pool, then identify all faces of all frames through the batcher"""
+        loop = asyncio.get_running_loop()
+        detections = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, self._detect_frame, data) for data in frames
+        ))
+
+        crops = [crop for _, frame_crops in detections for crop in frame_crops]
+        matches = iter(await self.batcher.identify(crops))
+
+        results = []
+        for faces, _ in detections:
+            results.append({"faces": [
+                {"box": [round(float(v), 1) for v in face.bbox], "det_score": round(float(face.det_score), 4),
+                 "name": name, "score": round(float(score), 4)}
+                for face, (name, score) in zip(faces, matches)
+            ]})
+        return results
+
+    def _detect_frame(self, data):
+        """Decode a frame, detect its faces and align them"""
+        img = _decode_jpeg(data)
+        faces = self.face_service.detect_faces(img)
+        return faces, [self.face_service.align_face(img, face) for face in faces]
+
+    def _align_crop(self, data):
+        """Decode a face crop and align it, or None if no face is found in it"""
+        img = _decode_jpeg(data)
+        size = self.face_service.rec_model.input_size
+        if (img.shape[1], img.shape[0]) == tuple(size):
+            return img
+
+        face = self.face_service._detect_enrollment_face(img)
+        return None if face is None else self.face_service.align_face(img, face)
+
+
+def _decode_images(body, key):
+    """Decode a JSON body holding a list of base64 images under `key`"""
+    try:
+        items = json.loads(body)[key]
+        if not isinstance(items, list):
+            raise TypeError(key)
+        return [base64.b64decode(item, validate=True) for item in items]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise RequestError(HTTPStatus.BAD_REQUEST, f'Expected a JSON body {{"{key}": [base64 JPEG, ...]}}')
+
+
+def _decode_jpeg(data):
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Could not decode image")
+    return img
+
+
+def _error(status, message):
+    return status, "application/json", json.dumps({"error": message}).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless face recognition server")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=Config.SERVER_WORKERS)
+    parser.add_argument("--max-concurrency", type=int, default=Config.SERVER_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    face_service = FaceService()
+    face_service.load_models()
+    server = RecognitionServer(face_service, args.workers, args.max_concurrency)
+    if server.gallery[0] is None:
+        raise SystemExit("No face embeddings found. Please ensure the dataset is properly prepared.")
+
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Process-wide cache of models, gallery and services
+
+Streamlit re-executes main.py on every interaction, but imported modules stay
+loaded, so resources held here are created once per process and shared by
+every browser session.
+"""
+
+import threading
+import time
+
+from app.models import init_db
+from app.services.attendance_service import AttendanceService
+from app.services.attendance_writer import AttendanceWriter
+from app.services.enrollment_quality import is_enrolled
+from app.services.face_service import FaceService
+from app.utils.metrics import metrics
+
+
+class ResourceManager:
+    """
+    Loads the ONNX models, the gallery and the services once.
+
+    The gallery is held as an immutable (known_embeddings, known_names)
+    tuple that is replaced atomically on enrollment; readers take a
+    reference with `gallery` and compare `gallery_version` to notice a swap.
+    Enrollments and gallery reloads from different browser sessions run one
+    at a time, so two of them never rebuild the gallery files concurrently
+    and an older gallery is never swapped in over a newer one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Reentrant because enroll reloads the gallery while holding it
+        self._enroll_lock = threading.RLock()
+        self.initialized = False
+
+        self.face_service = None
+        self.attendance_service = None
+        self.attendance_writer = None
+
+        self.gallery = (None, None)
+        self.gallery_version = 0
+
+        # Latency measurements in seconds
+        self.startup_timings = {}
+        self.last_rerun = None
+
+    def initialize(self):
+        """Create all resources on the first call; later calls return immediately"""
+        if self.initialized:
+            return
+
+        with self._lock:
+            if self.initialized:
+                return
+
+            start = time.perf_counter()
+            init_db()
+            self.startup_timings["database"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.attendance_service = AttendanceService()
+            self.attendance_writer = AttendanceWriter(self.attendance_service)
+            self.attendance_writer.start()
+            self.startup_timings["services"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.face_service = FaceService()
+            self.face_service.load_models()
+            self.startup_timings["models"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.gallery = self.face_service.load_embeddings()
+            self.gallery_version += 1
+            self.startup_timings["gallery"] = time.perf_counter() - start
+
+            # Local /metrics endpoint and periodic JSON log line, if enabled
+            metrics.start()
+
+            self.initialized = True
+
+    def reload_gallery(self):
+        """
+        Reload the gallery after enrollment and swap it in atomically
+
+        Returns:
+            tuple: The new (known_embeddings, known_names)
+        """
+        with self._enroll_lock:
+            gallery = self.face_service.load_embeddings()
+            with self._lock:
+                self.gallery = gallery
+                self.gallery_version += 1
+            return gallery
+
+    def enroll(self, person_name, images):
+        """
+        Save enrollment images for a person and publish the updated gallery
+
+        Args:
+            person_name: Name of the person
+            images: List of image contents in bytes
+
+        Returns:
+            list: Status of each image, or None if the person already exists;
+                see FaceService.save_face_images
+        """
+        with self._enroll_lock:
+            statuses = self.face_service.save_face_images(person_name, images)
+            if statuses is None or not any(is_enrolled(status) for status in statuses):
+                return statuses
+
+            self.reload_gallery()
+        self.attendance_service.invalidate_view()
+        return statuses
+
+    def record_rerun(self, seconds):
+        """Record how long a script rerun took to render the page"""
+        self.last_rerun = seconds
+
+    def report(self):
+        """
+        Latency report for display
+
+        Returns:
+            dict: Startup time per stage and of the last rerun, in milliseconds
+        """
+        report = {f"startup_{stage}_ms": seconds * 1000 for stage, seconds in self.startup_timings.items()}
+        report["startup_total_ms"] = sum(self.startup_timings.values()) * 1000
+        if self.last_rerun is not None:
+            report["last_rerun_ms"] = self.last_rerun * 1000
+        return report
+
+
+_manager = ResourceManager()
+
+
+def get_resource_manager():
+    """
+    Get the process-wide resource manager, initializing it on first use
+
+    Returns:
+        ResourceManager: The shared instance
+    """
+    _manager.initialize()
+    return _manager
@@ -0,0 +1,214 @@
+"""
+Threaded capture / inference pipeline for the live video feed
+"""
+
+import queue
+import threading
+import time
+
+from app.config.config import Config
+from app.services.face_tracker import FaceTracker
+from app.utils.frame_buffers import FramePool
+from app.utils.metrics import metrics
+from app.utils.video_utils import get_video_capture
+
+
+def put_latest(q, item):
+    """
+    Put an item on a bounded queue, discarding the oldest entries if it is full
+
+    Args:
+        q: queue.Queue with a maxsize
+        item: Item to enqueue
+
+    Returns:
+        list: Items that were discarded to make room
+    """
+    dropped = []
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                dropped.append(q.get_nowait())
+            except queue.Empty:
+                pass
+
+
+class VideoPipeline:
+    """
+    Runs capture and face recognition on background threads.
+
+    The capture thread keeps only the most recent frame, so a slow inference
+    step never lets the camera buffer back up. The inference thread processes
+    the latest frame and publishes the result; results the consumer has not
+    picked up yet are replaced, but their recognitions are carried over so
+    no vote is lost when frames are dropped for display. Frames are captured
+    into recycled buffers; the consumer hands each displayed frame back with
+    `release`.
+    """
+
+    def __init__(self, face_service, known_embeddings, known_names,
+                 capture_factory=get_video_capture, queue_size=1):
+        """
+        Initialize the pipeline
+
+        Args:
+            face_service: FaceService used for recognition
+            known_embeddings: Array of known embeddings
+            known_names: List of corresponding names
+            capture_factory: Callable returning an opened cv2.VideoCapture
+            queue_size: Capacity of the frame and result queues
+        """
+        self.face_service = face_service
+        self.gallery = (known_embeddings, known_names)
+        self.tracker = FaceTracker() if Config.TRACKING_ENABLED else None
+        self.capture_factory = capture_factory
+        self.pool = FramePool()
+
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue(maxsize=queue_size)
+        self.running = threading.Event()
+        self.threads = []
+        self.cap = None
+        self.error = None
+
+        # Counters for monitoring
+        self.captured_frames = 0
+        self.processed_frames = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        """
+        Open the capture device and start the background threads
+
+        Returns:
+            bool: True if the capture device could be opened
+        """
+        self.cap = self.capture_factory()
+        if not self.cap.isOpened():
+            self.cap.release()
+            return False
+
+        self.running.set()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, args=(self.cap,), name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        """
+        Stop the background threads and release the capture device.
+
+        The capture thread releases the device itself once its last read
+        returns, so the device is never released under a running read, even
+        when a read blocks longer than the join timeout.
+        """
+        self.running.clear()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+            if thread.is_alive():
+                print(f"Thread {thread.name} did not stop in time; it exits after its current step")
+        self.threads = []
+        self.cap = None
+
+    def update_gallery(self, known_embeddings, known_names):
+        """Swap the gallery used for recognition, e.g. after enrollment"""
+        self.gallery = (known_embeddings, known_names)
+
+    @property
+    def is_running(self):
+        return self.running.is_set()
+
+    def get_result(self, timeout=1.0):
+        """
+        Wait for the next processed frame
+
+        Args:
+            timeout: Seconds to wait
+
+        Returns:
+            tuple: (processed_frame, observations), or None if nothing arrived in
+                time. Observations are (timestamp, track_id, name, score) for
+                every face identified since the previous result, where the
+                timestamp is the time.monotonic() capture time of the frame.
+        """
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def release(self, frame, source_index=0):
+        """Hand a frame returned by get_result back for reuse once it is displayed"""
+        self.pool.release(frame)
+
+    def _capture_loop(self, cap):
+        """Read frames continuously, keeping only the latest one queued, and release the device on exit"""
+        try:
+            while self.running.is_set():
+                with metrics.timer("capture_read", camera="0"):
+                    ret, frame = self.pool.read(cap)
+                if not ret:
+                    self.error = "Failed to grab frame from camera."
+                    self.running.clear()
+                    break
+
+                dropped_items = put_latest(self.frames, (time.monotonic(), frame))
+                for _, dropped_frame in dropped_items:
+                    self.pool.release(dropped_frame)
+                dropped = len(dropped_items)
+                self.dropped_frames += dropped
+                self.captured_frames += 1
+                if dropped:
+                    metrics.inc("frames_dropped_total", dropped, camera="0")
+                metrics.set_gauge("queue_depth", self.frames.qsize(), queue="camera_0")
+        finally:
+            cap.release()
+
+    def _inference_loop(self):
+        """Recognize faces in the latest frame and publish the result"""
+        active_gallery = None
+        while self.running.is_set():
+            try:
+                captured_at, frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Identities carried by the tracker are stale once the gallery changes
+            gallery = self.gallery
+            if gallery is not active_gallery:
+                if self.tracker is not None and active_gallery is not None:
+                    self.tracker.reset()
+                active_gallery = gallery
+            known_embeddings, known_names = gallery
+
+            try:
+                faces = self.face_service.recognize_frame(frame, known_embeddings, known_names, self.tracker)
+                with metrics.timer("draw"):
+                    processed_frame = self.face_service.draw_faces(frame, faces)
+            except Exception as e:
+                self.error = f"Face recognition failed: {str(e)}"
+                self.running.clear()
+                break
+
+            self.processed_frames += 1
+            observations = [(captured_at, face.track_id, face.name, face.score)
+                            for face in faces if face.recognized_now]
+
+            # Replace results the consumer never picked up, carrying over their recognitions
+            while True:
+                try:
+                    stale_frame, stale_observations = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pool.release(stale_frame)
+                self.dropped_frames += 1
+                metrics.inc("results_dropped_total", camera="0")
+                observations = stale_observations + observations
+
+            for dropped_frame, _ in put_latest(self.results, (processed_frame, observations)):
+                self.pool.release(dropped_frame)
@@ -0,0 +1,120 @@
+"""
+Reusable buffers for capture, detector preprocessing and the preview
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.config.config import Config
+
+
+class FramePool:
+    """
+    Recycles frame arrays between capture and display.
+
+    `read` captures into a previously released frame with cap.read(frame),
+    which OpenCV fills in place when the size matches, so a steady stream
+    stops allocating a new array per frame. Frames are handed back with
+    `release` once they are displayed or dropped; at most `size` are kept.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or Config.FRAME_POOL_SIZE
+        self.free = []
+        self.lock = threading.Lock()
+
+    def read(self, cap):
+        """
+        Read the next frame, reusing a released buffer if there is one
+
+        Returns:
+            tuple: (ret, frame) as returned by cap.read
+        """
+        with self.lock:
+            buffer = self.free.pop() if self.free else None
+        if buffer is None:
+            return cap.read()
+        return cap.read(buffer)
+
+    def release(self, frame):
+        """Return a frame nobody references anymore to the pool"""
+        if frame is None:
+            return
+        with self.lock:
+            if len(self.free) < self.size:
+                self.free.append(frame)
+
+
+class BufferCache:
+    """
+    Small LRU cache of arrays by shape, for preprocessing outputs whose
+    size changes from call to call (e.g. detector inputs of ROI crops).
+    Not thread-safe; use one cache per thread.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.buffers = OrderedDict()
+
+    def get(self, shape, dtype=np.uint8):
+        """
+        Get an uninitialized array of the given shape
+
+        Returns:
+            ndarray: A buffer reused from an earlier call when possible
+        """
+        key = (tuple(shape), np.dtype(dtype).str)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = np.empty(shape, dtype=dtype)
+            self.buffers[key] = buffer
+            if len(self.buffers) > self.max_entries:
+                self.buffers.popitem(last=False)
+        else:
+            self.buffers.move_to_end(key)
+        return buffer
+
+
+class PreviewEncoder:
+    """
+    Encodes frames for display as downscaled JPEGs at a capped rate.
+
+    The browser then receives a small JPEG a few times per second instead
+    of every full-resolution raw frame, and BGR frames are encoded directly
+    without a colour conversion.
+    """
+
+    def __init__(self, max_width=None, quality=None, max_fps=None):
+        self.max_width = max_width or Config.PREVIEW_MAX_WIDTH
+        self.quality = quality or Config.PREVIEW_JPEG_QUALITY
+        self.interval = 1.0 / (max_fps or Config.PREVIEW_MAX_FPS)
+        self.buffer = None
+        self.last_encoded = None
+
+    def due(self):
+        """Check whether the preview rate allows showing another frame now"""
+        return self.last_encoded is None or time.monotonic() - self.last_encoded >= self.interval
+
+    def encode(self, frame):
+        """
+        Downscale a BGR frame into the reused preview buffer and encode it
+
+        Returns:
+            bytes: JPEG data, or None if encoding failed
+        """
+        height, width = frame.shape[:2]
+        image = frame
+        if width > self.max_width:
+            size = (self.max_width, max(1, round(height * self.max_width / width)))
+            if self.buffer is None or self.buffer.shape[:2] != (size[1], size[0]):
+                self.buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            cv2.resize(frame, size, dst=self.buffer, interpolation=cv2.INTER_AREA)
+            image = self.buffer
+
+        self.last_encoded = time.monotonic()
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return jpeg.tobytes() if ok else None
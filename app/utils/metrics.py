@@ -0,0 +1,264 @@
+"""
+Process-wide metrics for the recognition loop
+
+Stage timings and faces per frame are kept as histograms, frame and drop
+counts as counters, and queue depths as gauges. Metrics are served in the
+Prometheus text format on a local HTTP endpoint and printed as a JSON line
+every few seconds. When Config.METRICS_ENABLED is False every call returns
+immediately, so instrumented code pays only a function call.
+"""
+
+import json
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.config.config import Config
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FACES_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target and count:
+                return bound
+        return 0.0
+
+
+class _Timer:
+    """Context manager adding its elapsed time to a stage histogram"""
+
+    __slots__ = ("metrics", "stage", "labels", "start")
+
+    def __init__(self, metrics, stage, labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe("stage_seconds", time.perf_counter() - self.start,
+                             SECONDS_BUCKETS, stage=self.stage, **self.labels)
+        return False
+
+
+class Metrics:
+    """
+    Registry of histograms, counters and gauges.
+
+    Series are identified by a metric name plus keyword labels, e.g.
+    `metrics.inc("frames_dropped_total", camera="0")`.
+    """
+
+    def __init__(self, enabled=None, prefix=None):
+        self.enabled = Config.METRICS_ENABLED if enabled is None else enabled
+        self.prefix = prefix or Config.METRICS_PREFIX
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+        self.server = None
+        self.log_thread = None
+        self.stopping = threading.Event()
+
+    def timer(self, stage, **labels):
+        """
+        Time a block of code as a stage
+
+        Usage:
+            with metrics.timer("detect"):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, labels)
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        """Add a value to a histogram"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        """Set a gauge to its current value"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def render_prometheus(self):
+        """
+        Render all series in the Prometheus text exposition format
+
+        Returns:
+            str: The exposition text
+        """
+        lines = []
+        with self.lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in series}):
+                    lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+                    for (series_name, labels), value in series.items():
+                        if series_name == name:
+                            lines.append(f"{self.prefix}_{name}{_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {self.prefix}_{name} histogram")
+                for (series_name, labels), histogram in self.histograms.items():
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{self.prefix}_{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{self.prefix}_{name}_sum{_labels(labels)} {histogram.sum}")
+                    lines.append(f"{self.prefix}_{name}_count{_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Summarize all series for logging
+
+        Returns:
+            dict: Histograms with count, mean, p50 and p95, plus counters and gauges
+        """
+        def series_name(name, labels):
+            return name + "".join(f".{value}" for _, value in labels)
+
+        with self.lock:
+            return {
+                "time": time.time(),
+                "histograms": {
+                    series_name(name, labels): {
+                        "count": h.count,
+                        "mean": h.sum / h.count if h.count else 0.0,
+                        "p50": h.quantile(0.5),
+                        "p95": h.quantile(0.95),
+                    }
+                    for (name, labels), h in self.histograms.items()
+                },
+                "counters": {series_name(*key): value for key, value in self.counters.items()},
+                "gauges": {series_name(*key): value for key, value in self.gauges.items()},
+            }
+
+    def start(self, port=None, log_interval=None):
+        """
+        Start the HTTP endpoint and the periodic JSON log line, if enabled
+
+        Args:
+            port: Local port of the /metrics endpoint; defaults to Config.METRICS_PORT, 0 disables it
+            log_interval: Seconds between JSON log lines; defaults to Config.METRICS_LOG_INTERVAL, 0 disables it
+        """
+        if not self.enabled:
+            return
+        port = Config.METRICS_PORT if port is None else port
+        log_interval = Config.METRICS_LOG_INTERVAL if log_interval is None else log_interval
+
+        with self.lock:
+            if port and self.server is None:
+                try:
+                    self.server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+                except OSError as e:
+                    # e.g. another instance already serves this port; keep recording without the endpoint
+                    print(f"Metrics endpoint disabled, cannot listen on port {port}: {str(e)}")
+                else:
+                    self.server.daemon_threads = True
+                    threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+            if log_interval and self.log_thread is None:
+                self.log_thread = threading.Thread(target=self._log_loop, args=(log_interval,),
+                                                   name="metrics-log", daemon=True)
+                self.log_thread.start()
+
+    def stop(self):
+        """Stop the HTTP endpoint and the log thread"""
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.log_thread is not None:
+            self.log_thread.join(timeout=1.0)
+            self.log_thread = None
+        self.stopping.clear()
+
+    def _log_loop(self, interval):
+        while not self.stopping.wait(interval):
+            print(json.dumps({"metrics": self.snapshot()}), flush=True)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def _handler(metrics):
+    """Request handler class serving the metrics of a registry at /metrics"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep scrapes out of the application log
+            pass
+
+    return MetricsHandler
+
+
+metrics = Metrics()
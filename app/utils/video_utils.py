@@ -5,14 +5,17 @@ Utility functions for video capture and processing
 import cv2
 from app.config.config import Config
 
-def get_video_capture():
+def get_video_capture(source=None):
     """
     Initialize video capture with proper settings
     
+    Args:
+        source: Camera index, file path or stream URL; defaults to Config.CAMERA_INDEX
+
     Returns:
         cv2.VideoCapture: Initialized video capture object
     """
-    cap = cv2.VideoCapture(Config.CAMERA_INDEX)
+    cap = cv2.VideoCapture(Config.CAMERA_INDEX if source is None else source)
     
     # Set resolution
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, Config.FRAME_WIDTH)
@@ -0,0 +1,165 @@
+"""
+Headless attendance from recorded lecture videos
+
+Usage:
+    python batch_attendance.py --session "May 19, 2025 - Class 6" lecture.mp4 [more.mp4 ...]
+
+Frames are decoded as fast as the CPU allows, optionally skipping ahead with
+--start and sampling every --stride-th frame. Recognitions go through the
+same tracking and temporal voting as the live feed, and confirmed students
+are marked through AttendanceService. Throughput and per-stage timings are
+printed at the end.
+"""
+
+import argparse
+import time
+
+import cv2
+
+from app.config.config import Config
+from app.models import init_db
+from app.services.attendance_service import AttendanceService
+from app.services.attendance_vote import AttendanceVoter
+from app.services.face_service import FaceService
+from app.services.face_tracker import FaceTracker
+from app.utils.metrics import metrics
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute attendance from recorded videos")
+    parser.add_argument("videos", nargs="+", help="Video files or stream recordings to process")
+    parser.add_argument("--session", required=True, help="Name of the attendance session")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Process every N-th frame; skipped frames are not decoded")
+    parser.add_argument("--start", type=float, default=0.0, help="Seconds to skip at the start of each video")
+    parser.add_argument("--end", type=float, default=None, help="Stop at this many seconds into each video")
+    parser.add_argument("--no-tracking", action="store_true",
+                        help="Run detection and recognition on every processed frame")
+    return parser.parse_args()
+
+
+def process_video(video_index, path, args, face_service, gallery, voter, timings, time_offset=0.0):
+    """
+    Run recognition over one video
+
+    Args:
+        video_index: Position of the video on the command line, keeps track ids apart
+        path: Video file path or URL
+        args: Parsed command line arguments
+        face_service: FaceService with loaded models
+        gallery: (known_embeddings, known_names)
+        voter: AttendanceVoter of the session
+        timings: Dict of stage -> seconds, updated in place
+        time_offset: Seconds of earlier videos, keeps the vote timestamps increasing
+
+    Returns:
+        tuple: (processed_frames, confirmed_names, end_time) - end_time is the
+            vote timestamp reached, the time_offset of the next video
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Unable to open video: {path}")
+        return 0, [], time_offset
+
+    if args.start:
+        cap.set(cv2.CAP_PROP_POS_MSEC, args.start * 1000)
+
+    tracker = None if args.no_tracking or not Config.TRACKING_ENABLED else FaceTracker()
+    known_embeddings, known_names = gallery
+    processed, confirmed = 0, []
+    frame = None
+    timestamp = time_offset
+
+    try:
+        while True:
+            start = time.perf_counter()
+
+            # Skip frames without decoding them
+            for _ in range(args.stride - 1):
+                if not cap.grab():
+                    break
+            # Decode into the previous frame's array instead of allocating a new one
+            ret, frame = cap.read(frame)
+            timings["decode"] += time.perf_counter() - start
+            if not ret:
+                break
+            # Votes are windowed on video time, not on wall-clock processing time
+            position = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            if args.end is not None and position > args.end:
+                break
+            timestamp = time_offset + position
+
+            start = time.perf_counter()
+            faces = face_service.recognize_frame(frame, known_embeddings, known_names, tracker)
+            timings["recognize"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            confirmed.extend(voter.update(
+                (timestamp,
+                 None if face.track_id is None else (video_index, face.track_id),
+                 face.name, face.score)
+                for face in faces if face.recognized_now
+            ))
+            timings["vote"] += time.perf_counter() - start
+
+            processed += 1
+    finally:
+        cap.release()
+
+    return processed, confirmed, timestamp
+
+
+def main():
+    args = parse_args()
+    args.stride = max(1, args.stride)
+    timings = {"startup": 0.0, "decode": 0.0, "recognize": 0.0, "vote": 0.0, "database": 0.0}
+
+    metrics.start()
+    start = time.perf_counter()
+    init_db()
+    attendance_service = AttendanceService()
+    face_service = FaceService()
+    face_service.load_models()
+    gallery = face_service.load_embeddings()
+    timings["startup"] = time.perf_counter() - start
+
+    if gallery[0] is None:
+        raise SystemExit("No face embeddings found. Please ensure the dataset is properly prepared.")
+
+    start = time.perf_counter()
+    session_id = attendance_service.create_session(args.session)
+    timings["database"] += time.perf_counter() - start
+
+    voter = AttendanceVoter()
+    total_frames = 0
+    video_time = 0.0
+    run_start = time.perf_counter()
+
+    for video_index, path in enumerate(args.videos):
+        processed, confirmed, video_time = process_video(
+            video_index, path, args, face_service, gallery, voter, timings, video_time
+        )
+        total_frames += processed
+
+        start = time.perf_counter()
+        for name in confirmed:
+            attendance_service.mark_attendance(session_id, name)
+        timings["database"] += time.perf_counter() - start
+
+        print(f"{path}: {processed} frames, {len(confirmed)} new students marked")
+
+    elapsed = time.perf_counter() - run_start
+
+    # Report
+    print(f"\nSession: {args.session} (#{session_id})")
+    print(f"Students present: {', '.join(sorted(voter.confirmed)) or 'none'}")
+    print(f"Frames processed: {total_frames} in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed else 0.0:.1f} FPS)")
+    print(f"{'stage':>10} {'total s':>9} {'ms/frame':>9}")
+    for stage, seconds in timings.items():
+        per_frame = seconds * 1000 / total_frames if total_frames and stage != "startup" else 0.0
+        print(f"{stage:>10} {seconds:>9.2f} {per_frame:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Benchmark suite for detection, recognition, matching and database paths
+"""
@@ -0,0 +1,73 @@
+"""
+Run the whole benchmark suite
+
+Usage:
+    python -m benchmarks [--only matching database] [--output results.json] [--quick]
+
+Each benchmark runs in its own process, so model sessions, the database
+engine and Config overrides of one cannot affect another. The reports are
+combined into one JSON file, by default benchmarks/results/run-<time>.json.
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+from benchmarks.common import RESULTS_DIR, environment
+
+BENCHMARKS = {
+    "frames": "benchmarks.bench_frames",
+    "matching": "benchmarks.bench_matching",
+    "extraction": "benchmarks.bench_extraction",
+    "database": "benchmarks.bench_database",
+}
+
+# Smaller settings for a fast smoke run
+QUICK_ARGS = {
+    "frames": ["--faces", "1", "4", "--frames", "10"],
+    "matching": ["--sizes", "1000", "10000", "--queries", "64"],
+    "extraction": ["--copies", "1"],
+    "database": ["--users", "100", "1000", "--sessions", "10", "100", "--repeat", "3"],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument("--quick", action="store_true", help="Use smaller settings")
+    parser.add_argument("--output", help="Combined JSON report path")
+    args = parser.parse_args()
+
+    created = datetime.now()
+    run = {"created": created.isoformat(timespec="seconds"), "environment": environment(), "benchmarks": {}}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.only or BENCHMARKS:
+            print(f"== {name}", flush=True)
+            output = os.path.join(directory, f"{name}.json")
+            command = [sys.executable, "-m", BENCHMARKS[name], "--output", output]
+            command += QUICK_ARGS[name] if args.quick else []
+
+            if subprocess.run(command).returncode != 0 or not os.path.exists(output):
+                run["benchmarks"][name] = {"error": "benchmark failed"}
+                continue
+            with open(output) as f:
+                run["benchmarks"][name] = json.load(f)
+
+    output = args.output or str(RESULTS_DIR / f"run-{created:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2, default=str)
+    print(f"Wrote {output}")
+
+    failed = [name for name, report in run["benchmarks"].items() if "error" in report]
+    if failed:
+        raise SystemExit(f"Failed benchmarks: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
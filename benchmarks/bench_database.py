@@ -0,0 +1,120 @@
+"""
+get_attendance_dataframe latency versus users x sessions
+
+Usage:
+    python -m benchmarks.bench_database --users 100 1000 --sessions 10 100
+
+Runs against a synthetic SQLite database in a temporary directory, created
+with the application migrations. DATABASE_URL is set before the application
+modules are imported, so the real attendance database is never opened.
+"""
+
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="attendance-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'attendance.db')}"
+
+import shutil
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, insert
+
+from app.db.base import engine
+from app.models import init_db, User, Session, Attendance
+from app.services.attendance_service import AttendanceService
+from benchmarks.common import time_calls, write_results, print_row
+
+
+def populate(num_users, num_sessions, rate, seed=0):
+    """
+    Replace the database contents with synthetic users, sessions and attendance
+
+    Args:
+        num_users: Number of students
+        num_sessions: Number of sessions, one per day
+        rate: Probability that a student attended a session
+
+    Returns:
+        int: Number of attendance rows
+    """
+    rng = np.random.default_rng(seed)
+    first_day = datetime(2025, 1, 1, 9, 0)
+
+    with engine.begin() as conn:
+        conn.execute(delete(Attendance.__table__))
+        conn.execute(delete(Session.__table__))
+        conn.execute(delete(User.__table__))
+
+        conn.execute(insert(User.__table__), [{"id": i + 1, "name": f"student_{i:06d}"} for i in range(num_users)])
+        conn.execute(insert(Session.__table__), [
+            {"id": j + 1, "name": f"Session {j:05d}", "created_at": first_day + timedelta(days=j)}
+            for j in range(num_sessions)
+        ])
+
+        present = np.argwhere(rng.random((num_users, num_sessions)) < rate)
+        rows = [{"user_id": int(u) + 1, "session_id": int(s) + 1,
+                 "marked_at": first_day + timedelta(days=int(s), minutes=5)} for u, s in present]
+        for i in range(0, len(rows), 50000):
+            conn.execute(insert(Attendance.__table__), rows[i:i + 50000])
+
+    return len(rows)
+
+
+def run(users_list, sessions_list, rate, repeat):
+    init_db()
+    attendance_service = AttendanceService()
+    results = []
+
+    for num_users in users_list:
+        for num_sessions in sessions_list:
+            rows = populate(num_users, num_sessions, rate)
+            last_week = datetime(2025, 1, 1) + timedelta(days=max(0, num_sessions - 7))
+            students = [f"student_{i:06d}" for i in range(min(10, num_users))]
+
+            def rebuild_view():
+                attendance_service.invalidate_view()
+                attendance_service.get_attendance_view()
+
+            cases = {
+                "all": lambda: attendance_service.get_attendance_dataframe(),
+                "last_week": lambda: attendance_service.get_attendance_dataframe(start_date=last_week),
+                "ten_students": lambda: attendance_service.get_attendance_dataframe(student_names=students),
+                "view_rebuild": rebuild_view,
+            }
+
+            for query, fn in cases.items():
+                params = {"users": num_users, "sessions": num_sessions, "query": query}
+                metrics = {**time_calls(fn, repeat), "attendance_rows": rows}
+                print_row(params, metrics)
+                results.append({"params": params, "metrics": metrics})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance query latency benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 365])
+    parser.add_argument("--rate", type=float, default=0.8, help="Fraction of students present per session")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per query")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic database")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    try:
+        results = run(args.users, args.sessions, args.rate, args.repeat)
+    finally:
+        engine.dispose()
+        if args.keep:
+            print(f"Database kept at {os.environ['DATABASE_URL']}")
+        else:
+            shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+    write_results("database", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Dataset embedding throughput of extract_face_embeddings
+
+Usage:
+    python -m benchmarks.bench_extraction --copies 1 4 --workers 1 4
+
+The dataset is linked into a temporary directory, optionally several times
+over to get a larger workload, and the gallery, manifest and index are
+written there too, so the stored gallery is left alone. Model loading is
+not included in the timings.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+
+from app.config.config import Config
+from app.services.face_service import FaceService
+from benchmarks.common import dataset_images, write_results, print_row
+
+# Config paths redirected into the temporary directory
+_PATHS = {
+    "GALLERY_DIR": "gallery",
+    "EMBEDDINGS_PATH": "known_embeddings.npy",
+    "NAMES_PATH": "known_names.pkl",
+    "MANIFEST_PATH": "embeddings_manifest.json",
+    "INDEX_PATH": "gallery_index.npz",
+    "PROTOTYPES_PATH": "known_prototypes.npz",
+}
+
+
+def link_dataset(directory, copies, limit=0):
+    """
+    Link every dataset image `copies` times into a dataset directory
+
+    Returns:
+        int: Number of linked images
+    """
+    count = 0
+    for name, path in dataset_images(limit):
+        person_dir = os.path.join(directory, name)
+        os.makedirs(person_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for copy in range(copies):
+            os.symlink(os.path.abspath(path), os.path.join(person_dir, f"{stem}_{copy}.jpg"))
+            count += 1
+    return count
+
+
+def run(copies_list, workers_list, limit=0):
+    results = []
+    original = {name: getattr(Config, name) for name in ["DATASET_PATH", "EMBEDDING_WORKERS", *_PATHS]}
+
+    try:
+        for copies in copies_list:
+            for workers in workers_list:
+                with tempfile.TemporaryDirectory(prefix="attendance-bench-") as directory:
+                    Config.DATASET_PATH = os.path.join(directory, "dataset")
+                    num_images = link_dataset(Config.DATASET_PATH, copies, limit)
+                    for name, filename in _PATHS.items():
+                        setattr(Config, name, os.path.join(directory, filename))
+                    Config.EMBEDDING_WORKERS = workers
+
+                    face_service = FaceService()
+                    face_service.load_models()
+
+                    # What extract_face_embeddings runs, without the progress output
+                    start = time.perf_counter()
+                    embeddings, _ = face_service.update_face_embeddings(rebuild=True, progress=lambda done, total: None)
+                    elapsed = time.perf_counter() - start
+
+                params = {"images": num_images, "copies": copies, "workers": workers,
+                          "chunk_size": Config.EMBEDDING_CHUNK_SIZE}
+                metrics = {
+                    "total_ms": elapsed * 1000,
+                    "images_per_s": num_images / elapsed if elapsed else 0.0,
+                    "embedded": 0 if embeddings is None else len(embeddings),
+                }
+                print_row(params, metrics)
+                results.append({"params": params, "metrics": metrics})
+    finally:
+        for name, value in original.items():
+            setattr(Config, name, value)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset embedding throughput benchmark")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4],
+                        help="Times each dataset image is repeated")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, Config.EMBEDDING_WORKERS}),
+                        help="Embedding worker process counts")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of dataset images")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    write_results("extraction", run(args.copies, args.workers, args.limit), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+process_frame throughput at different numbers of faces per frame
+
+Usage:
+    python -m benchmarks.bench_frames --faces 1 2 4 8 16 --frames 50
+
+Synthetic frames are built by pasting face crops from the dataset in a grid
+onto a gray canvas, so every run sees the same frames. The gallery is built
+from the same crops. Each setting is timed once with detection and
+recognition on every frame, and once with a FaceTracker as in the live feed.
+"""
+
+import math
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+from app.services.face_service import FaceService
+from app.services.face_tracker import FaceTracker
+from benchmarks.common import dataset_images, summarize, write_results, print_row
+
+
+def face_crops(face_service, limit=0, margin=0.4):
+    """
+    Cut the enrollment face out of each dataset image, with some context
+
+    Returns:
+        tuple: (crops, names, aligned) - context crops to paste, person
+            names and aligned faces for the gallery
+    """
+    crops, names, aligned = [], [], []
+    for name, path in dataset_images(limit):
+        img = cv2.imread(path)
+        face = face_service._detect_enrollment_face(img)
+        if face is None:
+            continue
+
+        x1, y1, x2, y2 = face.bbox
+        pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+        x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        x2, y2 = min(img.shape[1], int(x2 + pad_x)), min(img.shape[0], int(y2 + pad_y))
+        crops.append(img[y1:y2, x1:x2].copy())
+        names.append(name)
+        aligned.append(face_service.align_face(img, face))
+    return crops, names, aligned
+
+
+def make_frame(crops, count, width, height):
+    """Paste `count` crops in a grid onto a gray frame"""
+    frame = np.full((height, width, 3), 127, dtype=np.uint8)
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    cell_w, cell_h = width // cols, height // rows
+
+    for i in range(count):
+        crop = crops[i % len(crops)]
+        scale = 0.8 * min(cell_w / crop.shape[1], cell_h / crop.shape[0])
+        crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        x = (i % cols) * cell_w + (cell_w - crop.shape[1]) // 2
+        y = (i // cols) * cell_h + (cell_h - crop.shape[0]) // 2
+        frame[y:y + crop.shape[0], x:x + crop.shape[1]] = crop
+    return frame
+
+
+def run(face_service, crops, gallery, face_counts, num_frames, width, height):
+    known_embeddings, known_names = gallery
+    results = []
+
+    for count in face_counts:
+        frame = make_frame(crops, count, width, height)
+
+        for tracking in (False, True):
+            tracker = FaceTracker() if tracking else None
+            face_service.process_frame(frame.copy(), known_embeddings, known_names, tracker)
+
+            samples, recognized = [], 0
+            for _ in range(num_frames):
+                # draw_faces writes onto the frame, so every call gets a fresh copy
+                image = frame.copy()
+                start = time.perf_counter()
+                _, names = face_service.process_frame(image, known_embeddings, known_names, tracker)
+                samples.append(time.perf_counter() - start)
+                recognized = len(names)
+
+            total = sum(samples)
+            params = {"faces": count, "tracking": tracking, "width": width, "height": height}
+            metrics = {**summarize(samples), "fps": num_frames / total if total else 0.0,
+                       "recognized": recognized}
+            print_row(params, metrics)
+            results.append({"params": params, "metrics": metrics})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="process_frame throughput benchmark")
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--frames", type=int, default=50, help="Timed frames per setting")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of dataset images")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    face_service = FaceService()
+    face_service.load_models()
+
+    crops, names, aligned = face_crops(face_service, args.limit)
+    if not crops:
+        raise SystemExit("No faces found in the dataset")
+
+    # Gallery of the pasted people, without touching the stored gallery
+    gallery = (face_service.embed_crops(aligned), names)
+
+    results = run(face_service, crops, gallery, args.faces, args.frames, args.width, args.height)
+    write_results("frames", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Load test for the recognition server
+
+Usage:
+    python -m app.services.recognition_server &
+    python -m benchmarks.bench_load --concurrency 1 4 16 --duration 20
+
+Each client keeps one HTTP connection open and sends dataset images back to
+back for the given duration, as single frames, frame batches or face crops.
+Throughput and latency percentiles per concurrency level are printed and
+written as a JSON report. Busy (503) answers are counted separately and
+not included in the latencies.
+"""
+
+import json
+import time
+import base64
+import argparse
+import http.client
+import threading
+from collections import Counter
+
+from app.config.config import Config
+from benchmarks.common import dataset_images, summarize, write_results, print_row
+
+
+def load_payloads(mode, batch_size, limit):
+    """
+    Request bodies built from the dataset images
+
+    Returns:
+        tuple: (path, content type, list of bodies, images per request)
+    """
+    images = []
+    for _, path in dataset_images(limit):
+        with open(path, "rb") as f:
+            images.append(f.read())
+    if not images:
+        raise SystemExit(f"No images found in {Config.DATASET_PATH}")
+
+    if mode == "frame":
+        return "/v1/recognize", "image/jpeg", images, 1
+
+    key, path = ("frames", "/v1/recognize/batch") if mode == "batch" else ("faces", "/v1/identify")
+    encoded = [base64.b64encode(image).decode("ascii") for image in images]
+    bodies = [
+        json.dumps({key: [encoded[(i + j) % len(encoded)] for j in range(batch_size)]}).encode("utf-8")
+        for i in range(len(encoded))
+    ]
+    return path, "application/json", bodies, batch_size
+
+
+def client(host, port, path, content_type, bodies, deadline, offset, latencies, statuses, lock):
+    """Send requests on one keep-alive connection until the deadline"""
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            body = bodies[i % len(bodies)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                connection.request("POST", path, body=body, headers={"Content-Type": content_type})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = "error"
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(elapsed)
+    finally:
+        connection.close()
+
+
+def run(host, port, mode, batch_size, concurrency_levels, duration, limit):
+    path, content_type, bodies, images_per_request = load_payloads(mode, batch_size, limit)
+    results = []
+
+    for concurrency in concurrency_levels:
+        latencies, statuses, lock = [], Counter(), threading.Lock()
+        deadline = time.perf_counter() + duration
+        threads = [
+            threading.Thread(target=client, args=(host, port, path, content_type, bodies, deadline, i,
+                                                  latencies, statuses, lock), daemon=True)
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stats = summarize(latencies)
+        ms = sorted(latency * 1000 for latency in latencies)
+        params = {"mode": mode, "batch_size": images_per_request, "concurrency": concurrency}
+        metrics = {
+            "requests_per_s": len(latencies) / elapsed,
+            "images_per_s": len(latencies) * images_per_request / elapsed,
+            **stats,
+            "p99_ms": ms[min(len(ms) - 1, int(0.99 * len(ms)))] if ms else 0.0,
+            "ok": statuses[200],
+            "busy": statuses[503],
+            "errors": sum(count for status, count in statuses.items() if status not in (200, 503)),
+        }
+        print_row(params, metrics)
+        results.append({"params": params, "metrics": metrics})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognition server load test")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--mode", choices=["frame", "batch", "faces"], default="frame",
+                        help="Single JPEG frames, JSON frame batches or JSON face crops")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per batch or faces request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of dataset images")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    results = run(args.host, args.port, args.mode, args.batch_size, args.concurrency, args.duration, args.limit)
+    write_results(f"server_{args.mode}", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
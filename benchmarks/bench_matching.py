@@ -0,0 +1,77 @@
+"""
+find_match and match_faces latency versus gallery size
+
+Usage:
+    python -m benchmarks.bench_matching --sizes 1000 10000 100000 --index flat ivf
+
+Galleries are random unit vectors and queries are perturbed gallery rows.
+A batch size of 1 times find_match, larger batches time match_faces with
+that many faces per call, as for a crowded frame.
+"""
+
+import time
+import argparse
+
+from app.config.config import Config
+from app.services.face_service import FaceService
+from app.services.gallery_index import create_index
+from benchmarks.common import random_gallery, perturbed_queries, summarize, write_results, print_row
+
+
+def run(sizes, kinds, batch_sizes, queries_per_run):
+    face_service = FaceService()
+    results = []
+
+    for size in sizes:
+        embeddings, names = random_gallery(size)
+        queries = perturbed_queries(embeddings, queries_per_run)
+
+        for kind in kinds:
+            build_ms = 0.0
+            face_service.gallery_index = None
+            if kind != "flat":
+                start = time.perf_counter()
+                face_service.gallery_index = create_index(kind, dim=embeddings.shape[1]).build(embeddings)
+                build_ms = (time.perf_counter() - start) * 1000
+
+            for batch_size in batch_sizes:
+                samples = []
+                for i in range(0, len(queries), batch_size):
+                    batch = queries[i:i + batch_size]
+                    start = time.perf_counter()
+                    if batch_size == 1:
+                        face_service.find_match(batch[0], embeddings, names)
+                    else:
+                        face_service.match_faces(batch, embeddings, names)
+                    samples.append(time.perf_counter() - start)
+
+                stats = summarize(samples)
+                total = sum(samples)
+                params = {"gallery_size": size, "index": kind, "batch_size": batch_size}
+                metrics = {
+                    **stats,
+                    "per_face_ms": total * 1000 / len(queries),
+                    "faces_per_s": len(queries) / total if total else 0.0,
+                    "build_ms": build_ms,
+                }
+                print_row(params, metrics)
+                results.append({"params": params, "metrics": metrics})
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery matching latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--index", nargs="+", default=["flat", "ivf"], choices=["flat", "ivf"])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--queries", type=int, default=256, help="Faces matched per setting")
+    parser.add_argument("--output", help="JSON report path")
+    args = parser.parse_args()
+
+    print(f"nprobe={Config.IVF_NPROBE} nlist={Config.IVF_NLIST}")
+    write_results("matching", run(args.sizes, args.index, args.batch_sizes, args.queries), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Helpers shared by the benchmark scripts
+
+Every benchmark writes a JSON report of the form
+
+    {"benchmark": name, "created": ..., "environment": {...},
+     "results": [{"params": {...}, "metrics": {...}}, ...]}
+
+so runs on different commits or machines can be compared with
+`python -m benchmarks.compare`.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime
+from glob import glob
+
+import numpy as np
+
+from app.config.config import Config
+
+RESULTS_DIR = Config.BASE_DIR / "benchmarks" / "results"
+
+
+def summarize(samples):
+    """
+    Latency statistics of timed samples
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        dict: mean_ms, p50_ms, p95_ms and min_ms
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if ms.size == 0:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "min_ms": 0.0}
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+    }
+
+
+def time_calls(fn, repeat, warmup=1):
+    """
+    Time repeated calls of a function
+
+    Args:
+        fn: Callable without arguments
+        repeat: Number of timed calls
+        warmup: Untimed calls made first
+
+    Returns:
+        dict: Latency statistics, see summarize
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def random_gallery(size, dim=512, images_per_person=5, seed=0):
+    """
+    Synthetic gallery of random unit vectors
+
+    Args:
+        size: Number of rows
+        dim: Embedding dimension
+        images_per_person: Rows sharing a name
+        seed: Random seed
+
+    Returns:
+        tuple: (embeddings, names)
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, dim), dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    names = [f"person_{i // images_per_person}" for i in range(size)]
+    return embeddings, names
+
+
+def perturbed_queries(embeddings, count, noise=0.05, seed=1):
+    """Queries near random gallery rows, like new photos of enrolled people"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), count)
+    queries = embeddings[picks] + noise * rng.standard_normal((count, embeddings.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def dataset_images(limit=0):
+    """
+    Enrollment images of the bundled dataset
+
+    Returns:
+        list: (person_name, image path) pairs
+    """
+    images = [(os.path.basename(os.path.dirname(path)), path)
+              for path in sorted(glob(os.path.join(str(Config.DATASET_PATH), "*", "*.jpg")))]
+    return images[:limit] if limit else images
+
+
+def environment():
+    """Machine, library versions, commit and the Config settings that affect speed"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Config.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    try:
+        import onnxruntime
+        onnxruntime_version = onnxruntime.__version__
+    except ImportError:
+        onnxruntime_version = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "onnxruntime": onnxruntime_version,
+        "config": {
+            name: getattr(Config, name) for name in (
+                "MODEL_PRECISION", "ORT_INTRA_OP_THREADS", "ORT_GRAPH_OPTIMIZATION", "ADAPTIVE_DET_SIZE",
+                "ROI_DETECTION", "REC_BATCH_SIZE", "GALLERY_INDEX", "GALLERY_MODE", "TRACKING_ENABLED",
+                "EMBEDDING_WORKERS",
+            )
+        },
+    }
+
+
+def write_results(name, results, output=None):
+    """
+    Write a benchmark report as JSON
+
+    Args:
+        name: Benchmark name
+        results: List of {"params": ..., "metrics": ...} rows
+        output: Output path; defaults to benchmarks/results/<name>.json
+
+    Returns:
+        dict: The written report
+    """
+    report = {
+        "benchmark": name,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "results": results,
+    }
+
+    output = str(output or RESULTS_DIR / f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {output}", file=sys.stderr)
+    return report
+
+
+def print_row(params, metrics):
+    """Print one result row on a single line"""
+    values = [f"{key}={value}" for key, value in params.items()]
+    values += [f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+               for key, value in metrics.items()]
+    print("  ".join(values), flush=True)
@@ -0,0 +1,88 @@
+"""
+Compare two benchmark reports
+
+Usage:
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.1]
+
+Accepts single benchmark reports and combined suite runs. Rows are matched
+by benchmark and parameters; a metric counts as a regression when it is
+worse than the baseline by more than the threshold. Exits with status 1
+if any regression is found.
+"""
+
+import json
+import argparse
+
+# Metric name suffixes and whether higher values are better
+_DIRECTIONS = (("_per_s", True), ("fps", True), ("recall", True), ("accuracy", True), ("_ms", False))
+
+
+def higher_is_better(metric):
+    """True or False for timing and throughput metrics, None for informational ones"""
+    for suffix, higher in _DIRECTIONS:
+        if metric.endswith(suffix):
+            return higher
+    return None
+
+
+def load_metrics(path):
+    """
+    Flatten a report into {(benchmark, params, metric): value}
+
+    Returns:
+        dict: Numeric metrics keyed by benchmark name, parameters and metric name
+    """
+    with open(path) as f:
+        report = json.load(f)
+
+    reports = report["benchmarks"].values() if "benchmarks" in report else [report]
+    metrics = {}
+    for single in reports:
+        for row in single.get("results", []):
+            params = json.dumps(row["params"], sort_keys=True)
+            for metric, value in row["metrics"].items():
+                if isinstance(value, (int, float)):
+                    metrics[(single["benchmark"], params, metric)] = value
+    return metrics
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Compare shared metrics of two flattened reports
+
+    Returns:
+        list: (key, baseline value, candidate value, relative change, regression) tuples
+    """
+    rows = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        change = (new - old) / abs(old) if old else 0.0
+        higher = higher_is_better(key[2])
+        regression = higher is not None and (change < -threshold if higher else change > threshold)
+        rows.append((key, old, new, change, regression))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument("--all", action="store_true", help="Also print metrics that did not regress")
+    args = parser.parse_args()
+
+    rows = compare(load_metrics(args.baseline), load_metrics(args.candidate), args.threshold)
+    regressions = 0
+    for (benchmark, params, metric), old, new, change, regression in rows:
+        regressions += regression
+        if regression or args.all:
+            flag = "REGRESSION" if regression else ""
+            print(f"{benchmark:<11} {params} {metric:<14} {old:>12.3f} -> {new:>12.3f} {change:>+8.1%} {flag}")
+
+    print(f"{len(rows)} metrics compared, {regressions} regressions above {args.threshold:.0%}")
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
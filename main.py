@@ -1,25 +1,46 @@
 import os
 import streamlit as st
-import cv2
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import time
+from datetime import datetime
 
 # Import modules from the application
 from app.config.config import Config
-from app.models import init_db, User, Session, Attendance
-from app.services.attendance_service import AttendanceService
-from app.services.face_service import FaceService
-from app.utils.constants import ABSENT_MARK, PRESENT_MARK
-from app.utils.video_utils import get_video_capture
-
-# Initialize the database
-init_db()
-
-# Initialize services
-attendance_service = AttendanceService()
-face_service = FaceService()
+from app.models import User, Session, Attendance
+from app.services.attendance_vote import AttendanceVoter
+from app.services.enrollment_quality import is_enrolled
+from app.services.resource_manager import get_resource_manager
+from app.services.multi_camera import MultiCameraPipeline
+from app.services.video_pipeline import VideoPipeline
+from app.utils.frame_buffers import PreviewEncoder
+from app.utils.metrics import metrics
+
+# Time the whole rerun, including loading resources on the first one
+rerun_start = time.perf_counter()
+
+# Database, models, gallery and services are loaded once per process
+resources = get_resource_manager()
+attendance_service = resources.attendance_service
+attendance_writer = resources.attendance_writer
+face_service = resources.face_service
+
+def render_attendance_table(placeholder):
+    """
+    Render the cached attendance view into a placeholder
+
+    Returns:
+        int: Version of the rendered view
+    """
+    version, attendance_view = attendance_service.get_attendance_view()
+
+    if attendance_view is not None and not attendance_view.empty:
+        # Display the table with checkmarks and X marks
+        placeholder.dataframe(attendance_view, use_container_width=True)
+    else:
+        placeholder.info("No attendance records found yet. Start capturing attendance to see records.")
+
+    return version
 
 def main():
     # Set page configuration
@@ -40,6 +61,8 @@ def main():
         st.session_state.current_session_id = None
     if 'recognized_students' not in st.session_state:
         st.session_state.recognized_students = set()
+    if 'attendance_voter' not in st.session_state:
+        st.session_state.attendance_voter = AttendanceVoter()
 
     # Sidebar for session control
     with st.sidebar:
@@ -60,6 +83,7 @@ def main():
                     st.session_state.current_session_id = session_id
                     st.session_state.is_capturing = True
                     st.session_state.recognized_students = set()
+                    st.session_state.attendance_voter.reset()
                     st.success(f"Started attendance for: {session_name}")
                     st.experimental_rerun()
                 else:
@@ -69,12 +93,24 @@ def main():
 
             # Stop capture button
             if st.button("Stop Attendance Capture"):
-                # Finalize the session
+                # Finalize the session once all pending marks are written
+                attendance_writer.end_session(st.session_state.current_session_id)
+                flushed = attendance_writer.flush(timeout=Config.ATTENDANCE_FLUSH_TIMEOUT)
                 st.session_state.is_capturing = False
                 st.session_state.current_session_id = None
                 st.session_state.recognized_students = set()
-                st.success("Attendance capture stopped")
-                st.experimental_rerun()
+                st.session_state.attendance_voter.reset()
+                if flushed:
+                    st.success("Attendance capture stopped")
+                    st.experimental_rerun()
+                else:
+                    # Keep the message on screen instead of rerunning
+                    st.error("Attendance capture stopped, but some marks could not be written yet; "
+                             "check the log for lost marks")
+
+        # Startup and rerun latency of the shared resources
+        with st.expander("Performance"):
+            st.json({name: round(ms, 1) for name, ms in resources.report().items()})
 
     # Main content area - split into two columns
     col1, col2 = st.columns([3, 2])
@@ -83,22 +119,9 @@ def main():
     with col1:
         st.header("Attendance Records")
 
-        # Get all attendance data
-        attendance_df = attendance_service.get_attendance_dataframe()
-
-        if attendance_df is not None and not attendance_df.empty:
-            # Style the dataframe to show checkmarks and X marks
-            styled_df = attendance_df.copy()
-
-            # Replace 1s with ✅ and 0s with ❌
-            for col in styled_df.columns:
-                if col != 'Student':
-                    styled_df[col] = styled_df[col].map({1: PRESENT_MARK, 0: ABSENT_MARK})
-
-            # Display the styled dataframe
-            st.dataframe(styled_df, use_container_width=True)
-        else:
-            st.info("No attendance records found yet. Start capturing attendance to see records.")
+        # Placeholder for the attendance table, refreshed when the view changes
+        table_placeholder = st.empty()
+        rendered_version = render_attendance_table(table_placeholder)
 
         # Currently recognized students during this session
         if st.session_state.is_capturing and st.session_state.recognized_students:
@@ -120,15 +143,21 @@ def main():
                 elif not uploaded_images:
                     st.warning("Please upload at least one image.")
                 else:
-                    # Process and save each image
-                    for img_file in uploaded_images:
-                        image_bytes = img_file.read()
-
-                        # Save image using face service
-                        face_service.save_face_image(person_name.strip(), image_bytes)
+                    # Save the images and swap in the updated gallery for all sessions
+                    statuses = resources.enroll(person_name.strip(), [img_file.read() for img_file in uploaded_images])
+                    rejected = [f"{img_file.name} ({status.replace('_', ' ')})"
+                                for img_file, status in zip(uploaded_images, statuses or [])
+                                if not is_enrolled(status)]
+                    accepted = len(uploaded_images) - len(rejected)
 
-                    st.success(f"Person '{person_name}' with {len(uploaded_images)} image(s) added successfully!")
-                    st.rerun()
+                    if statuses is None:
+                        st.error(f"Person '{person_name}' already exists.")
+                    elif not accepted:
+                        st.error(f"Person '{person_name}' was not added, no image was usable: {', '.join(rejected)}")
+                    else:
+                        if rejected:
+                            st.warning(f"Images not used: {', '.join(rejected)}")
+                        st.success(f"Person '{person_name}' with {accepted} image(s) added successfully!")
 
 
 
@@ -136,55 +165,85 @@ def main():
     with col2:
         st.header("Live Camera Feed")
 
-        # Placeholder for the video feed
-        video_placeholder = st.empty()
+        # One placeholder per camera, plus camera statistics when there are several
+        multi_camera = len(Config.CAMERA_SOURCES) > 1
+        video_placeholders = [st.empty() for _ in Config.CAMERA_SOURCES]
+        previews = [PreviewEncoder() for _ in Config.CAMERA_SOURCES]
+        stats_placeholder = st.empty() if multi_camera else None
 
-        # Load face recognition models and data
-        face_service.load_models()
-        known_embeddings, known_names = face_service.load_embeddings()
+        # The page is laid out; record before any early return or the endless capture loop
+        resources.record_rerun(time.perf_counter() - rerun_start)
+
+        # Face recognition models and data are shared by all sessions
+        known_embeddings, known_names = resources.gallery
+        gallery_version = resources.gallery_version
 
         if known_embeddings is None or known_names is None:
             st.error("No face embeddings found. Please ensure the dataset is properly prepared.")
             return
 
-        # Start video capture
-        cap = get_video_capture()
-        if not cap.isOpened():
+        # Start capture and recognition on background threads
+        if multi_camera:
+            pipeline = MultiCameraPipeline(face_service, known_embeddings, known_names)
+        else:
+            pipeline = VideoPipeline(face_service, known_embeddings, known_names)
+        if not pipeline.start():
             st.error("Unable to open camera. Please check your camera connection.")
             return
 
         try:
-            # Process frames
+            # Render processed frames as they arrive; waiting here is the only pacing
             while True:
-                ret, frame = cap.read()
-                if not ret:
-                    st.error("Failed to grab frame from camera.")
-                    break
+                result = pipeline.get_result(timeout=1.0)
+                if result is None:
+                    if not pipeline.is_running:
+                        st.error(pipeline.error or "Video pipeline stopped.")
+                        break
+                    continue
+
+                if multi_camera:
+                    processed_frames, observations = result
+                else:
+                    processed_frame, observations = result
+                    processed_frames = {0: processed_frame}
 
-                # Process the frame with face recognition
-                processed_frame, detected_names = face_service.process_frame(
-                    frame, known_embeddings, known_names
-                )
+                # Pick up a gallery updated by enrollment in any session
+                if resources.gallery_version != gallery_version:
+                    gallery_version = resources.gallery_version
+                    pipeline.update_gallery(*resources.gallery)
 
-                # Record attendance if capturing is active
+                # Record attendance for faces confirmed over several frames
                 if st.session_state.is_capturing:
-                    for name in detected_names:
-                        if name != 'Unknown' and name not in st.session_state.recognized_students:
-                            attendance_service.mark_attendance(
+                    with metrics.timer("vote"):
+                        confirmed = st.session_state.attendance_voter.update(observations)
+                    for name in confirmed:
+                        if name not in st.session_state.recognized_students:
+                            attendance_writer.submit(
                                 st.session_state.current_session_id,
                                 name
                             )
                             st.session_state.recognized_students.add(name)
 
-                # Display the processed frame
-                video_placeholder.image(
-                    cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB),
-                    channels="RGB",
-                    use_column_width=True
-                )
+                # Refresh the attendance table only when it changed
+                if attendance_service.version != rendered_version:
+                    with metrics.timer("render_table"):
+                        rendered_version = render_attendance_table(table_placeholder)
+
+                # Display the processed frames as downscaled JPEGs at a capped rate
+                with metrics.timer("display"):
+                    for source_index, processed_frame in processed_frames.items():
+                        preview = previews[source_index]
+                        jpeg = preview.encode(processed_frame) if preview.due() else None
+                        pipeline.release(processed_frame, source_index)
+                        if jpeg is not None:
+                            video_placeholders[source_index].image(
+                                jpeg,
+                                output_format="JPEG",
+                                use_column_width=True
+                            )
 
-                # Small delay to prevent high CPU usage
-                time.sleep(0.01)
+                if multi_camera:
+                    stats_placeholder.dataframe(pd.DataFrame(pipeline.stats()), use_container_width=True)
 
                 # Check if app state has changed
                 if not st.session_state.is_capturing and len(st.session_state.recognized_students) > 0:
@@ -193,8 +252,8 @@ def main():
         except Exception as e:
             st.error(f"An error occurred: {str(e)}")
         finally:
-            # Release camera when app is closed
-            cap.release()
+            # Stop the pipeline and release the camera when app is closed
+            pipeline.stop()
 
 if __name__ == "__main__":
     main()
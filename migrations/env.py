@@ -0,0 +1,52 @@
+"""
+Alembic environment for the attendance database
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.db.base import Base, engine
+import app.models  # noqa: F401 - registers the models with Base.metadata
+
+config = context.config
+
+# Configure logging when run from the alembic command line
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emit the migration SQL without connecting to the database"""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run the migrations against the application database"""
+    with engine.connect() as connection:
+        # SQLite cannot alter most constraints in place, so batch mode
+        # recreates tables with their data when needed
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,58 @@
+"""Initial schema
+
+Creates the users, sessions and attendance tables as they existed before
+migrations were introduced. Tables that already exist are left untouched,
+so databases created by the old create_all start are adopted in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-05-19 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_name', 'users', ['name'], unique=True)
+
+    if 'sessions' not in existing:
+        op.create_table(
+            'sessions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('name', sa.String(), nullable=False, unique=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index('ix_sessions_id', 'sessions', ['id'])
+
+    if 'attendance' not in existing:
+        op.create_table(
+            'attendance',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+            sa.Column('session_id', sa.Integer(), sa.ForeignKey('sessions.id'), nullable=False),
+            sa.UniqueConstraint('user_id', 'session_id', name='uix_user_session'),
+        )
+        op.create_index('ix_attendance_id', 'attendance', ['id'])
+
+
+def downgrade():
+    op.drop_table('attendance')
+    op.drop_table('sessions')
+    op.drop_table('users')
@@ -0,0 +1,47 @@
+"""Index attendance by session and sessions by date, record mark time
+
+Adds ix_attendance_session_id for per-session rollups, ix_sessions_created_at
+for date range queries and attendance.marked_at. Existing attendance rows
+take the creation time of their session as mark time.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-06-02 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite cannot add a column with a non-constant default, so the table
+    # is recreated and its rows copied over
+    with op.batch_alter_table('attendance', recreate='always') as batch_op:
+        batch_op.add_column(
+            sa.Column('marked_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True)
+        )
+        batch_op.create_index('ix_attendance_session_id', ['session_id'])
+
+    op.execute(
+        "UPDATE attendance SET marked_at = "
+        "(SELECT sessions.created_at FROM sessions WHERE sessions.id = attendance.session_id) "
+        "WHERE EXISTS (SELECT 1 FROM sessions WHERE sessions.id = attendance.session_id "
+        "AND sessions.created_at IS NOT NULL)"
+    )
+
+    op.create_index('ix_sessions_created_at', 'sessions', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_sessions_created_at', table_name='sessions')
+
+    with op.batch_alter_table('attendance', recreate='always') as batch_op:
+        batch_op.drop_index('ix_attendance_session_id')
+        batch_op.drop_column('marked_at')
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+import pytest
+
+# Never touch the real attendance.db; must be set before the app is imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+
+from app.config.config import Config  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Point the dataset and every gallery file at a temporary directory"""
+    uploads = tmp_path / "uploads"
+    monkeypatch.setattr(Config, "DATASET_PATH", tmp_path / "dataset")
+    monkeypatch.setattr(Config, "GALLERY_DIR", uploads / "gallery")
+    monkeypatch.setattr(Config, "EMBEDDINGS_PATH", uploads / "known_embeddings.npy")
+    monkeypatch.setattr(Config, "NAMES_PATH", uploads / "known_names.pkl")
+    monkeypatch.setattr(Config, "MANIFEST_PATH", uploads / "embeddings_manifest.json")
+    monkeypatch.setattr(Config, "INDEX_PATH", uploads / "gallery_index.npz")
+    monkeypatch.setattr(Config, "PROTOTYPES_PATH", uploads / "known_prototypes.npz")
+    monkeypatch.setattr(Config, "GALLERY_INDEX", "flat")
+    monkeypatch.setattr(Config, "GALLERY_MODE", "full")
+    monkeypatch.setattr(Config, "EMBEDDING_WORKERS", 1)
+    uploads.mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def database():
+    """Empty tables in the test database"""
+    from app.models import Base
+    from app.db.base import engine
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine
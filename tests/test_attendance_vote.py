@@ -0,0 +1,66 @@
+from app.services.attendance_vote import AttendanceVoter
+
+
+def recognitions(key, name, start, interval, count, score=0.6):
+    return [(start + i * interval, key, name, score) for i in range(count)]
+
+
+def test_confirms_after_min_hits_within_window():
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+
+    assert voter.update(recognitions(1, "Ada", 0.0, 1.0, 2)) == []
+    assert voter.update(recognitions(1, "Ada", 2.0, 1.0, 1)) == ["Ada"]
+    # Confirmed once per session
+    assert voter.update(recognitions(1, "Ada", 3.0, 1.0, 3)) == []
+
+
+def test_slow_inference_still_confirms():
+    # 30 FPS capture, 4 FPS inference and detection every 5th processed
+    # frame: one recognition every 1.25 s, with ~90% of captured frames dropped
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+    confirmed = []
+    for timestamp, key, name, score in recognitions(7, "Ada", 10.0, 1.25, 4):
+        confirmed += voter.update([(timestamp, key, name, score)])
+
+    assert confirmed == ["Ada"]
+
+
+def test_votes_outside_window_expire():
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+
+    assert voter.update(recognitions(1, "Ada", 0.0, 3.0, 3)) == []
+    assert [timestamp for timestamp, _, _ in voter.votes[1]] == [3.0, 6.0]
+
+
+def test_score_weighted_majority():
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+    observations = recognitions(1, "Ada", 0.0, 0.5, 3, score=0.7) + [(1.5, 1, "Grace", 0.4)]
+
+    assert voter.update(observations) == ["Ada"]
+
+
+def test_unknown_is_never_confirmed():
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+
+    assert voter.update(recognitions(1, "Unknown", 0.0, 0.5, 5)) == []
+    assert voter.update(recognitions(None, "Unknown", 0.0, 0.5, 5)) == []
+
+
+def test_cameras_share_the_clock():
+    # A fast camera must not expire the votes of a slow one
+    voter = AttendanceVoter(window=5.0, min_hits=3)
+    confirmed = []
+    for second in range(4):
+        confirmed += voter.update(recognitions((0, 1), "Grace", second, 0.1, 10))
+        confirmed += voter.update([(second + 0.5, (1, 1), "Ada", 0.6)])
+
+    assert sorted(confirmed) == ["Ada", "Grace"]
+
+
+def test_reset_forgets_confirmations():
+    voter = AttendanceVoter(window=5.0, min_hits=1)
+    assert voter.update([(0.0, None, "Ada", 0.6)]) == ["Ada"]
+
+    voter.reset()
+
+    assert voter.update([(1.0, None, "Ada", 0.6)]) == ["Ada"]
@@ -0,0 +1,75 @@
+import time
+
+from sqlalchemy import func, select
+
+from app.models import Attendance, Session
+from app.services.attendance_writer import AttendanceWriter
+
+
+def attendance_count(engine):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Attendance)).scalar()
+
+
+def create_session(engine, name):
+    with engine.begin() as conn:
+        return conn.execute(Session.__table__.insert().values(name=name)).inserted_primary_key[0]
+
+
+def test_marks_are_written_once_and_forgotten_with_the_session(database):
+    session_id = create_session(database, "Class 1")
+    writer = AttendanceWriter(flush_interval=0.01)
+    writer.start()
+    try:
+        writer.submit(session_id, "Ada")
+        writer.submit(session_id, "Ada")
+        writer.submit(session_id, "Grace")
+        assert writer.flush(timeout=5)
+        assert attendance_count(database) == 2
+        assert writer.written == {session_id: {"Ada", "Grace"}}
+
+        writer.end_session(session_id)
+        assert writer.flush(timeout=5)
+        assert writer.written == {}
+    finally:
+        writer.stop()
+
+
+def test_failed_last_batch_is_retried_then_logged(database, monkeypatch, capsys):
+    session_id = create_session(database, "Class 2")
+    writer = AttendanceWriter(flush_interval=60)
+    writer.start()
+    attempts = []
+    monkeypatch.setattr(writer, "_write", lambda events: attempts.append(events) and False)
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    writer.submit(session_id, "Ada")
+    writer.stop()
+
+    assert len(attempts) > 1
+    assert f"Attendance mark lost: session {session_id}, Ada" in capsys.readouterr().out
+
+
+def test_stop_writes_pending_marks(database):
+    session_id = create_session(database, "Class 3")
+    writer = AttendanceWriter(flush_interval=60)
+    writer.start()
+
+    writer.submit(session_id, "Ada")
+    writer.stop()
+
+    assert attendance_count(database) == 1
+
+
+def test_flush_returns_when_writes_keep_failing(database, monkeypatch, capsys):
+    session_id = create_session(database, "Class 4")
+    writer = AttendanceWriter(flush_interval=0.01)
+    writer.start()
+    monkeypatch.setattr(writer, "_write", lambda events: False)
+    try:
+        writer.submit(session_id, "Ada")
+
+        assert writer.flush(timeout=5)
+        assert f"Attendance mark lost: session {session_id}, Ada" in capsys.readouterr().out
+    finally:
+        writer.stop()
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from app.config.config import Config
+from app.services.enrollment_quality import estimate_pose, is_enrolled, quality_issue, select_rows
+
+# ArcFace alignment template: a frontal face
+FRONTAL = np.array([[38.29, 51.69], [73.53, 51.50], [56.03, 71.74], [41.55, 92.37], [70.73, 92.20]])
+
+
+def rotate(kps, degrees):
+    angle = np.radians(degrees)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    center = kps.mean(axis=0)
+    return (kps - center) @ rotation.T + center
+
+
+def unit(*components, dim=8):
+    vector = np.zeros(dim)
+    for axis, value in components:
+        vector[axis] = value
+    return vector / np.linalg.norm(vector)
+
+
+def test_frontal_pose():
+    yaw, pitch = estimate_pose(FRONTAL)
+
+    assert yaw == pytest.approx(0.0, abs=0.02)
+    assert pitch == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.parametrize("degrees", [-30, 15, 45])
+def test_pose_ignores_in_plane_rotation(degrees):
+    np.testing.assert_allclose(estimate_pose(rotate(FRONTAL, degrees)), estimate_pose(FRONTAL), atol=1e-9)
+
+
+def test_profile_pose():
+    profile = FRONTAL.copy()
+    profile[2, 0] = profile[1, 0]  # nose level with one eye
+
+    yaw, _ = estimate_pose(profile)
+
+    assert yaw == pytest.approx(1.0, abs=0.02)
+
+
+def test_quality_issue():
+    good = {"det_score": 0.9, "size": 120.0, "blur": 100.0, "yaw": 0.1, "pitch": 0.5}
+
+    assert quality_issue(good) is None
+    assert quality_issue({**good, "det_score": 0.5}) == "low_score"
+    assert quality_issue({**good, "size": 32.0}) == "small"
+    assert quality_issue({**good, "blur": 5.0}) == "blurry"
+    assert quality_issue({**good, "yaw": 0.9}) == "pose"
+    assert quality_issue({**good, "pitch": 0.1}) == "pose"
+
+
+def test_duplicates_keep_the_best_scoring_row():
+    embeddings = np.array([unit((0, 1.0)), unit((0, 1.0), (1, 0.1))])
+
+    keep, status = select_rows(embeddings, ["Ada", "Ada"], [0.2, 0.9], np.empty((0, 8)), [])
+
+    assert status == ["duplicate", "ok"]
+    assert keep.tolist() == [False, True]
+
+
+def test_existing_rows_count_as_duplicates_for_the_same_person_only():
+    known = np.array([unit((0, 1.0)), unit((1, 1.0))])
+    embeddings = np.array([unit((0, 1.0)), unit((1, 1.0))])
+
+    keep, status = select_rows(embeddings, ["Ada", "Grace"], [0.9, 0.9], known, ["Ada", "Linus"])
+
+    assert status == ["duplicate", "ok"]
+    assert keep.tolist() == [False, True]
+
+
+@pytest.mark.parametrize("drop", [False, True])
+def test_outliers_are_flagged(monkeypatch, drop):
+    monkeypatch.setattr(Config, "ENROLLMENT_DROP_OUTLIERS", drop)
+    # Three similar, but not duplicate, images and one of somebody else
+    embeddings = np.array([unit((0, 1.0), (2, 0.5)), unit((0, 1.0), (3, 0.5)),
+                           unit((0, 1.0), (4, 0.5)), unit((1, 1.0))])
+
+    keep, status = select_rows(embeddings, ["Ada"] * 4, [0.9, 0.8, 0.7, 0.6], np.empty((0, 8)), [])
+
+    assert status == ["ok", "ok", "ok", "outlier"]
+    assert keep.tolist() == [True, True, True, not drop]
+    assert is_enrolled("outlier") is not drop
+
+
+def test_outliers_need_three_rows():
+    embeddings = np.array([unit((0, 1.0)), unit((1, 1.0))])
+
+    _, status = select_rows(embeddings, ["Ada", "Ada"], [0.9, 0.8], np.empty((0, 8)), [])
+
+    assert status == ["ok", "ok"]
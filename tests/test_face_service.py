@@ -0,0 +1,155 @@
+import os
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+import pytest
+from insightface.app.common import Face
+
+from app.services import face_service
+from app.services.face_service import FaceService
+
+
+class StubFaceService(FaceService):
+    """
+    FaceService with the models replaced: every image has one frontal face
+    covering it, and the embedding is derived from the image pixels
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.det_model = self.rec_model = object()
+        self.embedded = 0
+
+    def _detect_enrollment_face(self, img):
+        if img is None:
+            return None
+        height, width = img.shape[:2]
+        kps = np.array([[0.3, 0.4], [0.7, 0.4], [0.5, 0.6], [0.35, 0.8], [0.65, 0.8]]) * [width, height]
+        return Face(bbox=np.array([0, 0, width, height], dtype=np.float32), kps=kps, det_score=0.9)
+
+    def align_face(self, img, face):
+        return cv2.resize(img, (112, 112))
+
+    def embed_crops(self, crops):
+        self.embedded += len(crops)
+        embeddings = np.array([crop[:32, :16].ravel()[:512] for crop in crops], dtype=np.float32) - 127.5
+        return (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)).reshape(-1, 512)
+
+
+def write_image(dataset, person, name, seed):
+    directory = os.path.join(dataset, person)
+    os.makedirs(directory, exist_ok=True)
+    img = np.random.default_rng(seed).integers(0, 256, (160, 160, 3), dtype=np.uint8)
+    cv2.imwrite(os.path.join(directory, name), img)
+
+
+@pytest.fixture
+def service(storage):
+    return StubFaceService()
+
+
+def test_update_face_embeddings_builds_gallery_and_manifest(storage, service):
+    dataset = str(storage / "dataset")
+    write_image(dataset, "Ada", "1.jpg", 1)
+
+    embeddings, names = service.update_face_embeddings()
+
+    assert embeddings.shape == (1, 512)
+    assert names == ["Ada"]
+    assert service._load_manifest()["sources"] == [os.path.join("Ada", "1.jpg")]
+
+
+def test_update_face_embeddings_only_embeds_changes(storage, service):
+    dataset = str(storage / "dataset")
+    write_image(dataset, "Ada", "1.jpg", 1)
+    write_image(dataset, "Grace", "1.jpg", 2)
+    service.update_face_embeddings()
+    assert service.embedded == 2
+
+    # Nothing changed: nothing is embedded again
+    embeddings, names = service.update_face_embeddings()
+    assert service.embedded == 2
+    assert sorted(names) == ["Ada", "Grace"]
+
+    # A new image is embedded and a deleted one drops its row
+    write_image(dataset, "Ada", "2.jpg", 3)
+    os.remove(os.path.join(dataset, "Grace", "1.jpg"))
+    embeddings, names = service.update_face_embeddings()
+    assert service.embedded == 3
+    assert names == ["Ada", "Ada"]
+    assert len(embeddings) == 2
+
+    # A fresh service reads the same gallery back
+    embeddings, names = StubFaceService().update_face_embeddings()
+    assert list(names) == ["Ada", "Ada"]
+
+
+def test_update_face_embeddings_without_faces(storage, monkeypatch):
+    service = StubFaceService()
+    monkeypatch.setattr(service, "_detect_enrollment_face", lambda img: None)
+    write_image(str(storage / "dataset"), "Ada", "1.jpg", 1)
+
+    embeddings, names = service.update_face_embeddings()
+
+    assert embeddings.shape == (0, 512)
+    assert names == []
+
+
+class FakeSession:
+    """Stands in for the database session used by save_face_images"""
+
+    def __init__(self, users):
+        self.users = users
+        self.name = None
+
+    def query(self, *columns):
+        return self
+
+    def filter_by(self, name):
+        self.name = name
+        return self
+
+    def first(self):
+        return (1,) if self.name in self.users else None
+
+    def add(self, user):
+        self.users.append(user.name)
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = []
+
+    @contextmanager
+    def session_scope():
+        yield FakeSession(users)
+
+    monkeypatch.setattr(face_service, "session_scope", session_scope)
+    return users
+
+
+def encoded_image(seed, blur=False):
+    img = np.random.default_rng(seed).integers(0, 256, (160, 160, 3), dtype=np.uint8)
+    if blur:
+        img = cv2.GaussianBlur(img, (31, 31), 10)
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+
+def test_save_face_images_reports_each_upload(storage, service, users):
+    statuses = service.save_face_images("Ada", [encoded_image(1), b"not an image", encoded_image(2, blur=True)])
+
+    assert statuses == ["ok", "unreadable", "blurry"]
+    assert users == ["Ada"]
+    assert list(service.load_embeddings()[1]) == ["Ada"]
+    # A second enrollment under the same name is refused
+    assert service.save_face_images("Ada", [encoded_image(3)]) is None
+
+
+def test_save_face_images_without_usable_images(storage, service, users):
+    statuses = service.save_face_images("Ada", [encoded_image(1, blur=True)])
+
+    assert statuses == ["blurry"]
+    assert users == []
+    assert not os.path.exists(os.path.join(storage / "dataset", "Ada"))
+    assert len(service.load_embeddings()[1]) == 0
@@ -0,0 +1,28 @@
+import numpy as np
+from insightface.app.common import Face
+
+from app.services.face_tracker import Track
+
+
+def face_at(x, y, size=40):
+    return Face(bbox=np.array([x, y, x + size, y + size], dtype=np.float32), kps=None, det_score=0.9)
+
+
+def test_velocity_is_measured_between_detections():
+    # A face moving 4 px per frame, detected every 5th frame
+    track = Track(0, face_at(100, 50), frame_index=0)
+    for detection in range(1, 4):
+        for _ in range(4):
+            track.predict()
+        track.update(face_at(100 + 20 * detection, 50), frame_index=5 * detection)
+
+        np.testing.assert_allclose(track.velocity, [4.0, 0.0])
+
+
+def test_prediction_follows_the_velocity():
+    track = Track(0, face_at(0, 0), frame_index=0)
+    track.update(face_at(10, 20), frame_index=5)
+
+    track.predict()
+
+    np.testing.assert_allclose(track.face.bbox, [12, 24, 52, 64])
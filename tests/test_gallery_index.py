@@ -0,0 +1,74 @@
+import numpy as np
+
+from app.config.config import Config
+from app.services.gallery_index import IVFIndex, FlatIndex, exact_search, load_index
+
+
+def random_gallery(count, dim=64, seed=0):
+    embeddings = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def test_ivf_matches_exact_search_when_probing_every_list():
+    gallery = random_gallery(500)
+    index = IVFIndex(dim=64, nlist=8, nprobe=8).build(gallery)
+
+    scores, ids = index.search(gallery[:20], k=3)
+    exact_scores, exact_ids = exact_search(gallery[:20], gallery, k=3)
+
+    np.testing.assert_array_equal(ids, exact_ids)
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+def test_ivf_remove_keeps_ids_aligned():
+    gallery = random_gallery(100)
+    index = IVFIndex(dim=64, nlist=4, nprobe=4).build(gallery)
+
+    index.remove([0, 10])
+    _, ids = index.search(gallery[11:12])
+
+    assert index.ntotal == 98
+    assert ids[0, 0] == 9
+
+
+def test_ivf_retrains_after_growth():
+    index = IVFIndex(dim=64, nlist=8, nprobe=2).build(random_gallery(100))
+    assert not index.needs_retraining(growth=2.0)
+
+    index.add(random_gallery(150, seed=1))
+
+    assert index.needs_retraining(growth=2.0)
+
+
+def test_ivf_retrains_when_lists_are_unbalanced():
+    index = IVFIndex(dim=64, nlist=8, nprobe=2).build(random_gallery(400))
+
+    # New enrollments all land near one centroid
+    crowd = index.centroids[0] + 0.01 * random_gallery(300, seed=2)
+    index.add(crowd / np.linalg.norm(crowd, axis=1, keepdims=True))
+
+    assert index.needs_retraining(growth=10.0, max_imbalance=3.0)
+
+
+def test_trained_size_survives_save(tmp_path):
+    index = IVFIndex(dim=64, nlist=4, nprobe=2).build(random_gallery(50))
+    index.add(random_gallery(10, seed=1))
+    path = str(tmp_path / "index.npz")
+
+    index.save(path)
+    loaded = load_index(path)
+
+    assert loaded.trained_size == 50
+    assert loaded.ntotal == 60
+
+
+def test_nprobe_comes_from_config_on_load(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.npz")
+    IVFIndex(dim=64, nlist=4, nprobe=1).build(random_gallery(50)).save(path)
+    monkeypatch.setattr(Config, "IVF_NPROBE", 3)
+
+    assert load_index(path).nprobe == 3
+
+
+def test_flat_index_never_retrains():
+    assert not FlatIndex(dim=64).build(random_gallery(10)).needs_retraining()
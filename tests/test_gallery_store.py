@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from app.config.config import Config
+from app.services.gallery_store import GalleryStore
+
+
+def random_gallery(count, dim=512, seed=0):
+    embeddings = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def test_round_trip(tmp_path):
+    store = GalleryStore(tmp_path, model_id="test")
+    embeddings = random_gallery(5)
+    names = ["Grace", "Ada", "Grace", "Linus", "Ada"]
+
+    store.write_gallery(embeddings, names)
+    read_embeddings, read_names = store.read_gallery()
+
+    np.testing.assert_array_equal(read_embeddings, embeddings)
+    assert list(read_names) == names
+    assert read_names[1] == "Ada" and read_names[-1] == "Ada" and read_names[2:4] == ["Grace", "Linus"]
+
+
+def test_float16_round_trip(tmp_path):
+    store = GalleryStore(tmp_path, model_id="test", dtype="float16")
+    embeddings = random_gallery(3)
+
+    store.write_gallery(embeddings, ["Ada", "Ada", "Grace"])
+    read_embeddings, _ = store.read_gallery()
+
+    assert read_embeddings.dtype == np.float16
+    np.testing.assert_allclose(read_embeddings, embeddings, atol=1e-3)
+
+
+@pytest.mark.parametrize("empty", [np.empty((0, 512), dtype=np.float32), np.empty(0), []])
+def test_empty_gallery(tmp_path, empty):
+    store = GalleryStore(tmp_path, model_id="test")
+
+    store.write_gallery(empty, [])
+    embeddings, names = store.read_gallery()
+
+    assert embeddings.shape == (0, 512)
+    assert len(names) == 0
+
+
+def test_other_model_is_ignored(tmp_path):
+    GalleryStore(tmp_path, model_id="test").write_gallery(random_gallery(2), ["Ada", "Grace"])
+
+    assert GalleryStore(tmp_path, model_id="other").read_gallery() == (None, None)
+
+
+def test_model_directory_follows_precision(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "GALLERY_DIR", tmp_path)
+    store = GalleryStore()
+    monkeypatch.setattr(Config, "MODEL_PRECISION", "fp32")
+    fp32_directory = store.directory
+    store.write_gallery(random_gallery(2), ["Ada", "Grace"])
+
+    monkeypatch.setattr(Config, "MODEL_PRECISION", "int8")
+
+    assert store.directory != fp32_directory
+    assert store.read_gallery() == (None, None)
+
+
+def test_versions_continue_across_models(tmp_path):
+    GalleryStore(tmp_path, model_id="test").write_gallery(random_gallery(2), ["Ada", "Grace"])
+
+    assert GalleryStore(tmp_path, model_id="other").write_gallery(random_gallery(1), ["Ada"]) == 2
+
+
+def test_rewrite_replaces_rows(tmp_path):
+    store = GalleryStore(tmp_path, model_id="test")
+    store.write_gallery(random_gallery(4), ["Ada"] * 4)
+
+    version = store.write_gallery(random_gallery(2, seed=1), ["Grace"] * 2)
+    embeddings, names = store.read_gallery()
+
+    assert version == 2
+    assert list(names) == ["Grace", "Grace"]
+    np.testing.assert_array_equal(embeddings, random_gallery(2, seed=1))
+
+
+def test_previous_version_is_kept_until_the_next_write(tmp_path):
+    store = GalleryStore(tmp_path, model_id="test")
+    store.write_gallery(random_gallery(2), ["Ada", "Grace"])
+    old_header = store.read_header()
+
+    store.write_gallery(random_gallery(3), ["Ada"] * 3)
+    # A reader holding the old header can still open its files
+    assert (tmp_path / old_header["embeddings_file"]).exists()
+
+    store.write_gallery(random_gallery(1), ["Ada"])
+    assert not (tmp_path / old_header["embeddings_file"]).exists()
+
+
+def test_rewriting_row_names_keeps_labels(tmp_path):
+    store = GalleryStore(tmp_path, model_id="test")
+    store.write_gallery(random_gallery(3), ["Grace", "Ada", "Grace"])
+    embeddings, names = store.read_gallery()
+
+    store.write_gallery(np.array(embeddings), names)
+
+    assert list(store.read_gallery()[1]) == ["Grace", "Ada", "Grace"]
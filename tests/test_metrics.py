@@ -0,0 +1,18 @@
+import socket
+
+from app.utils.metrics import Metrics
+
+
+def test_start_survives_a_busy_port():
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        metrics = Metrics(enabled=True)
+
+        metrics.start(port=busy.getsockname()[1], log_interval=0)
+
+        assert metrics.server is None
+        with metrics.timer("detect"):
+            pass
+        assert "detect" in metrics.render_prometheus()
+        metrics.stop()
@@ -0,0 +1,48 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services.recognition_server import MicroBatcher
+
+
+class FakeFaceService:
+    def __init__(self, matches):
+        self.matches = matches
+
+    def embed_crops(self, crops):
+        return crops
+
+    def match_faces(self, embeddings, known_embeddings, known_names):
+        if isinstance(self.matches, Exception):
+            raise self.matches
+        return self.matches(embeddings)
+
+
+def identify(matches, crops, max_batch=4):
+    async def run():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = MicroBatcher(FakeFaceService(matches), executor, lambda: (None, []),
+                                   max_batch=max_batch, max_delay=1)
+            return await asyncio.wait_for(batcher.identify(crops), timeout=5)
+
+    return asyncio.run(run())
+
+
+def test_batches_resolve_in_order():
+    results = identify(lambda crops: [[(f"face-{crop}", 0.9)] for crop in crops], list(range(6)))
+
+    assert results == [(f"face-{i}", 0.9) for i in range(6)]
+
+
+def test_empty_candidates_are_unknown():
+    assert identify(lambda crops: [[] for _ in crops], [0, 1]) == [("Unknown", 0.0)] * 2
+
+
+def test_missing_matches_do_not_hang():
+    assert identify(lambda crops: [[("Ada", 0.8)]], [0, 1, 2]) == [("Ada", 0.8), ("Unknown", 0.0), ("Unknown", 0.0)]
+
+
+def test_errors_reach_every_request():
+    with pytest.raises(RuntimeError):
+        identify(RuntimeError("model failed"), [0, 1, 2])